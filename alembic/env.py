@@ -20,8 +20,19 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 from app.database import Base
 from app import models
+from app.config import settings
 target_metadata = Base.metadata
 
+# Migrate the same database the application uses
+config.set_main_option("sqlalchemy.url", settings.database_url)
+
+
+# The search index and its shadow tables are maintained by hand written migrations
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return not name.startswith("items_fts")
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -44,6 +55,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -67,7 +79,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
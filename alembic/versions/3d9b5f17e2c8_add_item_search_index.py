@@ -0,0 +1,49 @@
+"""Add item search index
+
+Revision ID: 3d9b5f17e2c8
+Revises: f2a6d8c41b93
+Create Date: 2026-10-18 15:20:46.118903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9b5f17e2c8'
+down_revision: Union[str, None] = 'f2a6d8c41b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE VIRTUAL TABLE items_fts USING fts5(name, path, content='items', tokenize='trigram')")
+    op.execute("""
+        CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts(rowid, name, path) VALUES (new.rowid, new.name, new.path);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, name, path) VALUES ('delete', old.rowid, old.name, old.path);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER items_fts_update AFTER UPDATE OF name, path ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, name, path) VALUES ('delete', old.rowid, old.name, old.path);
+            INSERT INTO items_fts(rowid, name, path) VALUES (new.rowid, new.name, new.path);
+        END
+    """)
+    # Index the existing items
+    op.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS items_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS items_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS items_fts_insert")
+    op.execute("DROP TABLE IF EXISTS items_fts")
@@ -0,0 +1,46 @@
+"""Add upload sessions
+
+Revision ID: 4b6f0a2c9d1e
+Revises: 28d199d61979
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b6f0a2c9d1e'
+down_revision: Union[str, None] = '28d199d61979'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('upload_sessions',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('parent_id', sa.String(), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_sessions_id'), 'upload_sessions', ['id'], unique=False)
+    op.create_table('upload_chunks',
+    sa.Column('session_id', sa.String(), nullable=False),
+    sa.Column('index', sa.Integer(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['upload_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('session_id', 'index')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('upload_chunks')
+    op.drop_index(op.f('ix_upload_sessions_id'), table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,28 @@
+"""Add item hierarchy indexes
+
+Revision ID: 5e0a94c7b3d2
+Revises: d81f3b6e2a07
+Create Date: 2026-10-18 12:20:44.671902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a94c7b3d2'
+down_revision: Union[str, None] = 'd81f3b6e2a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_items_parent_id_name', 'items', ['parent_id', 'name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_items_parent_id_name', table_name='items')
@@ -0,0 +1,40 @@
+"""Add change journal
+
+Revision ID: 7c41e0b9d3a5
+Revises: a6e3c9d2f418
+Create Date: 2026-10-18 17:32:48.205913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41e0b9d3a5'
+down_revision: Union[str, None] = 'a6e3c9d2f418'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.String(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('is_dir', sa.Boolean(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('old_path', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_changes_created_at'), 'changes', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_changes_created_at'), table_name='changes')
+    op.drop_table('changes')
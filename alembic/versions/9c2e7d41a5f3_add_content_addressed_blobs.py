@@ -0,0 +1,42 @@
+"""Add content addressed blobs
+
+Revision ID: 9c2e7d41a5f3
+Revises: 4b6f0a2c9d1e
+Create Date: 2026-10-18 11:02:17.884120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2e7d41a5f3'
+down_revision: Union[str, None] = '4b6f0a2c9d1e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blobs',
+    sa.Column('hash', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.add_column(sa.Column('blob_hash', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_items_blob_hash'), ['blob_hash'], unique=False)
+        batch_op.create_foreign_key('fk_items_blob_hash_blobs', 'blobs', ['blob_hash'], ['hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.drop_constraint('fk_items_blob_hash_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_items_blob_hash'))
+        batch_op.drop_column('blob_hash')
+    op.drop_table('blobs')
@@ -0,0 +1,50 @@
+"""Add processing jobs
+
+Revision ID: a6e3c9d2f418
+Revises: 3d9b5f17e2c8
+Create Date: 2026-10-18 16:41:05.372219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3c9d2f418'
+down_revision: Union[str, None] = '3d9b5f17e2c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.String(), nullable=False),
+    sa.Column('processor', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_item_id'), 'jobs', ['item_id'], unique=False)
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+    # Plain column additions, the items table keeps its rowids and search triggers
+    op.add_column('items', sa.Column('content_hash', sa.String(), nullable=True))
+    op.add_column('items', sa.Column('preview', sa.String(), nullable=True))
+    op.add_column('items', sa.Column('processing_status', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('items', 'processing_status')
+    op.drop_column('items', 'preview')
+    op.drop_column('items', 'content_hash')
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_item_id'), table_name='jobs')
+    op.drop_table('jobs')
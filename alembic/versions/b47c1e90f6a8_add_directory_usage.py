@@ -0,0 +1,44 @@
+"""Add directory usage
+
+Revision ID: b47c1e90f6a8
+Revises: 5e0a94c7b3d2
+Create Date: 2026-10-18 13:05:32.918376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b47c1e90f6a8'
+down_revision: Union[str, None] = '5e0a94c7b3d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('items', sa.Column('file_count', sa.Integer(), nullable=True))
+    op.create_index('ix_items_is_dir_size', 'items', ['is_dir', 'size'], unique=False)
+    # Roll up the existing trees once, later changes are applied as deltas
+    op.execute("""
+        UPDATE items SET
+            size = (
+                SELECT COALESCE(SUM(f.size), 0) FROM items AS f
+                WHERE f.is_dir = 0 AND f.path >= items.path || '/' AND f.path < items.path || '0'
+            ),
+            file_count = (
+                SELECT COUNT(*) FROM items AS f
+                WHERE f.is_dir = 0 AND f.path >= items.path || '/' AND f.path < items.path || '0'
+            )
+        WHERE is_dir = 1
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE items SET size = NULL WHERE is_dir = 1")
+    op.drop_index('ix_items_is_dir_size', table_name='items')
+    op.drop_column('items', 'file_count')
@@ -0,0 +1,33 @@
+"""Add pending removals
+
+Revision ID: d81f3b6e2a07
+Revises: 9c2e7d41a5f3
+Create Date: 2026-10-18 11:47:05.129634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3b6e2a07'
+down_revision: Union[str, None] = '9c2e7d41a5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pending_removals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('pending_removals')
@@ -0,0 +1,39 @@
+"""Add tokens
+
+Revision ID: e3b8a1f5c7d2
+Revises: 7c41e0b9d3a5
+Create Date: 2026-10-18 19:12:05.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b8a1f5c7d2'
+down_revision: Union[str, None] = '7c41e0b9d3a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tokens',
+    sa.Column('hash', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_index(op.f('ix_tokens_expires_at'), 'tokens', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_tokens_user_id'), 'tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tokens_user_id'), table_name='tokens')
+    op.drop_index(op.f('ix_tokens_expires_at'), table_name='tokens')
+    op.drop_table('tokens')
@@ -0,0 +1,28 @@
+"""Add item encoding
+
+Revision ID: f2a6d8c41b93
+Revises: b47c1e90f6a8
+Create Date: 2026-10-18 14:02:11.604215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6d8c41b93'
+down_revision: Union[str, None] = 'b47c1e90f6a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('items', sa.Column('encoding', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('items', 'encoding')
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+from app.schemas import UserCreate, UserPublic, AccessToken
+from app.database import SessionLocal
+from app.dependencies import get_db, get_token_dao, get_password_hasher, get_current_user_id, oauth2_scheme
+from app.crud import user as user_crud
+from app.crud.token import TokenDAO
+from app.security import PasswordHasher, DUMMY_HASH
+from app.config import settings
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Annotated
+from datetime import datetime, timedelta
+
+router = APIRouter(prefix="/auth", tags=["Auth"])
+
+# Password hashing runs in worker processes, see app.security. The database is
+# used from the thread pool with short sessions, the event loop only awaits.
+def username_taken(username: str) -> bool:
+    with SessionLocal() as db:
+        return user_crud.username_exists(db, username)
+
+def create_account(username: str, hashed_password: str) -> UserPublic | None:
+    with SessionLocal() as db:
+        try:
+            return UserPublic.model_validate(user_crud.create_user(db, username, hashed_password))
+        except IntegrityError:
+            return None
+
+def read_credentials(username: str) -> tuple[int, str] | None:
+    with SessionLocal() as db:
+        user = user_crud.read_user_by_username(db, username)
+        return None if user is None else (user.id, user.password)
+
+def issue_token(token_dao: TokenDAO, user_id: int) -> tuple[str, datetime]:
+    with SessionLocal() as db:
+        token_dao.prune_expired(db)
+        return token_dao.create_token(db, user_id, timedelta(hours=settings.token_ttl_hours))
+
+@router.post("/register", response_model=UserPublic)
+async def register(user: UserCreate, hasher: PasswordHasher = Depends(get_password_hasher)):
+    if not settings.allow_registration:
+        raise HTTPException(status_code=403, detail="Registration is closed")
+    if await run_in_threadpool(username_taken, user.username):
+        raise HTTPException(status_code=400, detail="Username already taken")
+    hashed_password = await hasher.hash(user.password)
+    created = await run_in_threadpool(create_account, user.username, hashed_password)
+    if created is None:
+        raise HTTPException(status_code=400, detail="Username already taken")
+    return created
+
+@router.post("/login", response_model=AccessToken)
+async def login(
+    form: Annotated[OAuth2PasswordRequestForm, Depends()],
+    token_dao: TokenDAO = Depends(get_token_dao),
+    hasher: PasswordHasher = Depends(get_password_hasher)
+):
+    credentials = await run_in_threadpool(read_credentials, form.username)
+    # Unknown users are verified against a dummy hash, they answer as slowly
+    hashed_password = credentials[1] if credentials is not None else DUMMY_HASH
+    if not await hasher.verify(form.password, hashed_password) or credentials is None:
+        raise HTTPException(status_code=401, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
+    
+    token, expires_at = await run_in_threadpool(issue_token, token_dao, credentials[0])
+    return AccessToken(access_token=token, expires_at=expires_at)
+
+@router.post("/logout", status_code=204, dependencies=[Depends(get_current_user_id)])
+def logout(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    token_dao: TokenDAO = Depends(get_token_dao)
+):
+    token_dao.delete_token(db, token)
+    return Response(status_code=204)
+
+@router.get("/me", response_model=UserPublic)
+def read_me(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    user = user_crud.read_user(db, user_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return user
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.schemas import ChangeBase, ChangePage
+from app.database import SessionLocal
+from app.dependencies import get_change_dao, get_change_notifier
+from app.crud.change import ChangeDAO
+from app.notifier import ChangeNotifier
+from app.config import settings
+from typing import Annotated
+import asyncio
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+def read_page(change_dao: ChangeDAO, since: int, limit: int) -> ChangePage:
+    # A short session per check, waiting requests hold no connection
+    with SessionLocal() as db:
+        if change_dao.is_expired(db, since):
+            raise HTTPException(status_code=410, detail="Changes since this cursor were pruned, list all items again")
+        rows = change_dao.read_changes(db, since, limit + 1)
+        changes = [
+            ChangeBase(
+                id=change.id,
+                item_id=change.item_id,
+                action=change.action,
+                is_dir=change.is_dir,
+                path=change.path,
+                old_path=change.old_path,
+                created_at=change.created_at,
+                item=item,
+            )
+            for change, item in rows[:limit]
+        ]
+    cursor = changes[-1].id if changes else since
+    return ChangePage(changes=changes, cursor=str(cursor), has_more=len(rows) > limit)
+
+def read_latest(change_dao: ChangeDAO) -> ChangePage:
+    with SessionLocal() as db:
+        return ChangePage(changes=[], cursor=str(change_dao.latest_id(db)), has_more=False)
+
+# Without a cursor, returns the current one: list the items, then follow the
+# changes from there. With wait, an empty answer is held back until a change
+# is committed or the wait is over.
+@router.get("", response_model=ChangePage)
+async def read_changes(
+    since: str | None = None,
+    limit: Annotated[int, Query(gt=0, le=1000)] = 100,
+    wait: Annotated[float, Query(ge=0, le=60, description="Seconds to wait for a change")] = 0,
+    change_dao: ChangeDAO = Depends(get_change_dao),
+    notifier: ChangeNotifier = Depends(get_change_notifier)
+):
+    if since is None:
+        return await run_in_threadpool(read_latest, change_dao)
+    try:
+        cursor = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    with notifier.subscribe() as changed:
+        page = await run_in_threadpool(read_page, change_dao, cursor, limit)
+        while not page.changes and (remaining := deadline - loop.time()) > 0:
+            try:
+                # Changes committed by other processes are only seen by polling
+                await asyncio.wait_for(changed.wait(), min(remaining, settings.change_poll_interval))
+            except TimeoutError:
+                pass
+            changed.clear()
+            page = await run_in_threadpool(read_page, change_dao, cursor, limit)
+    return page
@@ -1,28 +1,288 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from fastapi.responses import FileResponse
-from app.schemas import ItemBase, ItemCreate, ItemUpdate
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Form, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from app.schemas import ItemName, ItemBase, ItemCreate, ItemUpdate, ItemSummary, ItemTree, ItemPage, Usage, CacheStats, JobBase, DeltaSignatures
+from app.database import SessionLocal
 from app.models import Item
-from app.dependencies import get_db, get_item_dao, get_uploads_manager
-from app.crud.item import ItemDAO
-from app.uploads_manager import UploadsManager
+from app.dependencies import get_db, get_item_dao, get_item_cache, get_uploads_manager, get_async_uploads_manager, get_reclaimer, get_pipeline, get_job_dao
+from app.crud.item import ItemDAO, SUMMARY_COLUMNS
+from app.crud.job import JobDAO
+from app.uploads_manager import UploadsManager, AsyncUploadsManager
+from app.downloads import build_file_response, item_etag, etag_matches
+from app.delta import DeltaError, ThreadStreamReader, block_signatures, DEFAULT_BLOCK_SIZE, MIN_BLOCK_SIZE, MAX_BLOCK_SIZE
+from app.archive import zip_stream, tar_stream
+from app import serializers
+from app.storage import QuotaExceeded, store_item_file, apply_item_delta, exceeds_quota, normalize_relative_path, stage_file, import_entries, import_tar
+from app.config import settings
+from app.reclaimer import Reclaimer
+from app.cache import ItemCache
+from app.pipeline import JobPipeline
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import Annotated
+from typing import Annotated, Literal
+import asyncio
+import tarfile
+from itertools import islice
+from urllib.parse import quote
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
+# Queues the post-upload processing of the files among freshly created rows
+def enqueue_files(db: Session, pipeline: JobPipeline, rows: list[dict]) -> list[dict]:
+    file_rows = [row for row in rows if not row["is_dir"]]
+    pipeline.enqueue(db, [row["id"] for row in file_rows])
+    if pipeline.enabled:
+        for row in file_rows:
+            row["processing_status"] = "pending"
+    return rows
+
+# The async routes only await the uploads, their database work runs in the
+# thread pool. Responses are built there too, the attributes of committed rows
+# are loaded again on access.
+def check_upload(db: Session, item_dao: ItemDAO, parent_id: str | None, size: int | None):
+    if parent_id is not None and item_dao.read_item_metadata(db, parent_id) is None:
+        raise HTTPException(status_code=404, detail="Specified parent does not exist")
+    if exceeds_quota(db, item_dao, size):
+        raise HTTPException(status_code=507, detail="Storage quota exceeded")
+
+def enqueue_item(db: Session, pipeline: JobPipeline, db_item: Item, response_model: type[ItemSummary]) -> ItemSummary:
+    pipeline.enqueue(db, [db_item.id])
+    return response_model.model_validate(db_item)
+
+def read_delta_target(db: Session, item_dao: ItemDAO, id: str, if_match: str | None, size: int | None) -> Item:
+    db_item = item_dao.read_item(db, id)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    if db_item.is_dir:
+        raise HTTPException(status_code=400, detail="Item is a directory")
+    # Copies refer to the version the signatures were computed from
+    if if_match is not None and not etag_matches(if_match, item_etag(db_item)):
+        raise HTTPException(status_code=412, detail="The file changed since its signatures were read")
+    if size is not None and exceeds_quota(db, item_dao, size - (db_item.size or 0)):
+        raise HTTPException(status_code=507, detail="Storage quota exceeded")
+    return db_item
+
+def read_file_item(db: Session, item_dao: ItemDAO, id: str) -> Item:
+    db_item = item_dao.read_item_metadata(db, id)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    if db_item.is_dir:
+        raise HTTPException(status_code=400, detail="Item is a directory")
+    return db_item
+
+# Listings are encoded from plain rows by app.serializers, the response models
+# only document them
 @router.get("", response_model=list[ItemBase])
 def read_all_items(db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
-    return item_dao.read_all_items(db)
+    return serializers.json_response(serializers.nested_items(item_dao.read_all_items(db, SUMMARY_COLUMNS)))
+
+# The top level, or the children of a directory, nested down to depth levels
+@router.get("/tree", response_model=list[ItemTree])
+def read_tree(
+    id: Annotated[str | None, Query(description="Directory to list, the top level by default")] = None,
+    depth: Annotated[int, Query(gt=0, le=64)] = 1,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao)
+):
+    parent = None
+    if id is not None:
+        parent = item_dao.read_item_metadata(db, id)
+        if parent is None:
+            raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+        if not parent.is_dir:
+            raise HTTPException(status_code=400, detail="Item is not a directory")
+    rows = item_dao.read_tree(db, parent, depth, SUMMARY_COLUMNS)
+    return serializers.json_response(serializers.tree(rows, id, depth))
+
+@router.get("/page", response_model=ItemPage)
+def read_items_page(
+    limit: Annotated[int, Query(gt=0, le=1000)] = 100,
+    cursor: str | None = None,
+    parent_id: str | None = None,
+    is_dir: bool | None = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao)
+):
+    rows, next_cursor = item_dao.read_items_page(db, limit, cursor, parent_id, is_dir, SUMMARY_COLUMNS)
+    return serializers.json_response(serializers.page(rows, next_cursor))
+
+@router.get("/usage", response_model=Usage)
+def read_usage(id: str | None = None, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
+    usage = item_dao.read_usage(db, id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    size, file_count = usage
+    return Usage(id=id, size=size, file_count=file_count, quota=settings.storage_quota)
+
+@router.get("/largest", response_model=list[ItemSummary])
+def read_largest_dirs(limit: Annotated[int, Query(gt=0, le=1000)] = 20, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
+    return item_dao.read_largest_dirs(db, limit)
+
+@router.get("/search", response_model=ItemPage)
+def search_items(
+    q: Annotated[str, Query(min_length=1, max_length=256, description="Text to look for")],
+    mode: Literal["substring", "prefix"] = "substring",
+    field: Literal["name", "path"] = "name",
+    mimetype: Annotated[str | None, Query(description="Exact mimetype, or a type followed by /*")] = None,
+    folder_id: Annotated[str | None, Query(description="Only search below this directory")] = None,
+    limit: Annotated[int, Query(gt=0, le=1000)] = 100,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao)
+):
+    try:
+        offset = int(cursor) if cursor is not None else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    folder = None
+    if folder_id is not None:
+        folder = item_dao.read_item_metadata(db, folder_id)
+        if folder is None:
+            raise HTTPException(status_code=404, detail="Specified folder does not exist")
+    rows, next_cursor = item_dao.search_items(db, q, limit, max(offset, 0), mode == "prefix", field, mimetype, folder, SUMMARY_COLUMNS)
+    return serializers.json_response(serializers.page(rows, next_cursor))
+
+@router.get("/jobs", response_model=list[JobBase])
+def read_item_jobs(id: str, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao), job_dao: JobDAO = Depends(get_job_dao)):
+    if item_dao.read_item_metadata(db, id) is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    return job_dao.read_item_jobs(db, id)
+
+@router.get("/cache", response_model=CacheStats)
+def read_cache_stats(cache: ItemCache | None = Depends(get_item_cache)):
+    if cache is None:
+        return CacheStats(enabled=False)
+    return CacheStats(enabled=True, **cache.stats())
+
+@router.get("/signatures", response_model=DeltaSignatures)
+def read_signatures(
+    id: str,
+    block_size: Annotated[int, Query(ge=MIN_BLOCK_SIZE, le=MAX_BLOCK_SIZE)] = DEFAULT_BLOCK_SIZE,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager)
+):
+    db_item = read_file_item(db, item_dao, id)
+    try:
+        with u_manager.open_item(db_item) as f:
+            weak, strong = [], []
+            for checksum, digest in block_signatures(f, block_size):
+                weak.append(checksum)
+                strong.append(digest)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="The content of the file is missing")
+    return DeltaSignatures(id=id, size=db_item.size or 0, etag=item_etag(db_item), block_size=block_size, weak=weak, strong=strong)
+
+# Rewrites the content of a file from a delta against its current content,
+# see app.delta for the format. The delta is read as it arrives.
+@router.patch("/delta", response_model=ItemSummary)
+async def update_file_delta(
+    id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    size: Annotated[int | None, Query(ge=0, description="Expected size of the new content")] = None,
+    sha256: Annotated[str | None, Query(pattern="^[0-9a-fA-F]{64}$", description="Expected SHA-256 of the new content")] = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: AsyncUploadsManager = Depends(get_async_uploads_manager),
+    reclaimer: Reclaimer = Depends(get_reclaimer),
+    pipeline: JobPipeline = Depends(get_pipeline)
+):
+    db_item = await run_in_threadpool(read_delta_target, db, item_dao, id, request.headers.get("if-match"), size)
+    
+    delta = ThreadStreamReader(request.stream())
+    try:
+        await u_manager.run(apply_item_delta, db, item_dao, u_manager.sync, db_item, delta, size, sha256)
+    except DeltaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="The content of the file is missing")
+    
+    # The previous blob may be unreferenced now, or the previous file queued
+    # for removal when the storage mode was switched
+    background_tasks.add_task(reclaimer.reclaim_in_background)
+    return await run_in_threadpool(enqueue_item, db, pipeline, db_item, ItemSummary)
+
+@router.get("/by-path", response_model=ItemSummary)
+def read_item_by_path(path: str, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
+    db_item = item_dao.read_item_by_path(db, path)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that path doesn't exist")
+    return db_item
+
+@router.get("/ancestors", response_model=list[ItemSummary])
+def read_ancestors(id: str, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
+    db_item = item_dao.read_item_metadata(db, id)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    return item_dao.read_ancestors(db, db_item)
+
+@router.get("/descendants", response_model=ItemPage)
+def read_descendants(
+    id: str,
+    limit: Annotated[int, Query(gt=0, le=1000)] = 100,
+    cursor: str | None = None,
+    max_depth: Annotated[int | None, Query(gt=0)] = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao)
+):
+    db_item = item_dao.read_item_metadata(db, id)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    rows, next_cursor = item_dao.read_descendants(db, db_item, limit, cursor, max_depth, SUMMARY_COLUMNS)
+    return serializers.json_response(serializers.page(rows, next_cursor))
+
+@router.get("/archive")
+def download_archive(
+    id: str,
+    format: Literal["zip", "tar"] = "zip",
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager)
+):
+    db_item = item_dao.read_item_metadata(db, id)
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
+    if not db_item.is_dir:
+        raise HTTPException(status_code=400, detail="Item is not a directory")
+    
+    # Archive names are relative to the parent of the downloaded directory
+    prefix_length = len(db_item.path) - len(db_item.path.rsplit("/", 1)[-1])
+    name = db_item.name
+    
+    # The request session is closed before the body is sent, the stream owns its own
+    def entries():
+        with SessionLocal() as stream_db:
+            for row in item_dao.stream_subtree(stream_db, db_item):
+                yield row.path[prefix_length:], row
+    
+    stream = zip_stream if format == "zip" else tar_stream
+    media_type = "application/zip" if format == "zip" else "application/x-tar"
+    headers = {"content-disposition": f"attachment; filename*=utf-8''{quote(name)}.{format}"}
+    return StreamingResponse(stream(entries(), u_manager.open_item), media_type=media_type, headers=headers)
+
+@router.get("/stream")
+def stream_items(parent_id: str | None = None, is_dir: bool | None = None, item_dao: ItemDAO = Depends(get_item_dao)):
+    # The request session is closed before the body is sent, the stream owns its own.
+    # Lines are sent a batch at a time.
+    batch_size = 1000
+    def generate():
+        with SessionLocal() as db:
+            rows = item_dao.stream_items(db, parent_id, is_dir, batch_size, SUMMARY_COLUMNS)
+            while batch := list(islice(rows, batch_size)):
+                yield serializers.ndjson(batch)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @router.post("", response_model=ItemBase)
 async def create_item(
-    name: Annotated[str, Form()],
+    name: Annotated[ItemName, Form()],
     parent_id: Annotated[str | None, Form()] = None,
     file: Annotated[UploadFile, File()] = None,
     db: Session = Depends(get_db),
     item_dao: ItemDAO = Depends(get_item_dao),
-    u_manager: UploadsManager = Depends(get_uploads_manager)
+    u_manager: AsyncUploadsManager = Depends(get_async_uploads_manager),
+    pipeline: JobPipeline = Depends(get_pipeline)
 ):
     # Reconstruct the pydantic schema
     item = ItemCreate(
@@ -32,54 +292,118 @@ async def create_item(
         size=None if file is None else file.size
     )
     
+    await run_in_threadpool(check_upload, db, item_dao, None, item.size)
+    
     # Try to create the entry in the database
     try:
-        db_item = item_dao.create_item(db, item)
+        db_item = await run_in_threadpool(item_dao.create_item, db, item)
     except IntegrityError:
         raise HTTPException(status_code=400, detail="Resource already exists")
     except ValueError:
         raise HTTPException(status_code=404, detail="Specified parent does not exist")
     
-    # Store the actual file
+    # Store the actual file, streaming it to disk in chunks off the event loop
     if not item.is_dir:
-        file_content = await file.read()
-        u_manager.create_or_update_file(db_item.id, file_content)
+        item_id = db_item.id
+        try:
+            await u_manager.run(store_item_file, db, item_dao, u_manager.sync, db_item, file.file)
+        except OSError:
+            await run_in_threadpool(item_dao.delete_item, db, item_id)
+            raise HTTPException(status_code=500, detail="Could not store the file")
+        return await run_in_threadpool(enqueue_item, db, pipeline, db_item, ItemBase)
     
-    return db_item
+    return await run_in_threadpool(ItemBase.model_validate, db_item)
+
+@router.post("/batch", response_model=list[ItemSummary])
+async def create_items_batch(
+    files: Annotated[list[UploadFile], File()],
+    parent_id: Annotated[str | None, Form()] = None,
+    paths: Annotated[list[str] | None, Form(description="Relative path of every file, defaults to its filename")] = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: AsyncUploadsManager = Depends(get_async_uploads_manager),
+    pipeline: JobPipeline = Depends(get_pipeline)
+):
+    if paths is not None and len(paths) != len(files):
+        raise HTTPException(status_code=400, detail="One path is needed per file")
+    try:
+        relative_paths = [normalize_relative_path(path) for path in (paths or [file.filename or "" for file in files])]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(check_upload, db, item_dao, parent_id, sum(file.size or 0 for file in files))
+    
+    # Files are copied concurrently, the rows are then inserted in one transaction
+    staged = await asyncio.gather(*(u_manager.run(stage_file, u_manager.sync, file.file, item_dao.get_mimetype(path)) for file, path in zip(files, relative_paths)), return_exceptions=True)
+    failed = [result for result in staged if isinstance(result, BaseException)]
+    if failed:
+        for result in staged:
+            if not isinstance(result, BaseException):
+                u_manager.sync.remove_temp(result.tmp_path)
+        raise HTTPException(status_code=500, detail="Could not store the files")
+    
+    try:
+        rows = await u_manager.run(import_entries, db, item_dao, u_manager.sync, parent_id, list(zip(relative_paths, staged)))
+    except QuotaExceeded:
+        raise HTTPException(status_code=507, detail="Storage quota exceeded")
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Resource already exists")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_in_threadpool(enqueue_files, db, pipeline, rows)
+
+@router.post("/import", response_model=list[ItemSummary])
+async def import_archive(
+    archive: Annotated[UploadFile, File(description="Tar archive, optionally compressed")],
+    parent_id: Annotated[str | None, Form()] = None,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: AsyncUploadsManager = Depends(get_async_uploads_manager),
+    pipeline: JobPipeline = Depends(get_pipeline)
+):
+    await run_in_threadpool(check_upload, db, item_dao, parent_id, None)
+    
+    try:
+        rows = await u_manager.run(import_tar, db, item_dao, u_manager.sync, parent_id, archive.file)
+    except tarfile.TarError:
+        raise HTTPException(status_code=400, detail="Invalid tar archive")
+    except QuotaExceeded:
+        raise HTTPException(status_code=507, detail="Storage quota exceeded")
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Resource already exists")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_in_threadpool(enqueue_files, db, pipeline, rows)
 
 @router.delete("", response_model=ItemBase)
 def remove_item(
     id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     item_dao: ItemDAO = Depends(get_item_dao),
-    u_manager: UploadsManager = Depends(get_uploads_manager)
+    reclaimer: Reclaimer = Depends(get_reclaimer)
 ):
     
     db_item = item_dao.delete_item(db, id)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item with that id doesn't exist")
     
-    if not db_item.is_dir:
-        u_manager.remove_file(id)
-    else:
-        remove_children_files(db_item, u_manager)
+    # Files are removed once the response is sent
+    background_tasks.add_task(reclaimer.reclaim_in_background)
     return db_item
 
-def remove_children_files(parent: Item, u_manager: UploadsManager):
-    for child in parent.children:        
-        if child.is_dir:
-            remove_children_files(child, u_manager)
-        else:
-            u_manager.remove_file(child.id)
-
-@router.get("{id}", response_class=FileResponse)
-async def read_file(id: str, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
-    db_item = item_dao.read_item(db, id)
-    if db_item is None:
-        return None
-    return FileResponse(path=f"uploads/{db_item.id}", filename=db_item.name, media_type=db_item.mimetype)
+@router.api_route("{id}", methods=["GET", "HEAD"], response_class=FileResponse)
+async def read_file(
+    id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager)
+):
+    db_item = await run_in_threadpool(read_file_item, db, item_dao, id)
+    return build_file_response(request, db_item, u_manager.item_path(db_item))
 
-@router.put("", response_model=ItemBase)
+# A renamed or moved directory is returned without its subtree, see /items/tree
+@router.put("", response_model=ItemSummary)
 def update_item(updated_item: ItemUpdate, db: Session = Depends(get_db), item_dao: ItemDAO = Depends(get_item_dao)):
     try:
         db_item = item_dao.update_item(db, updated_item)
@@ -87,4 +411,6 @@ def update_item(updated_item: ItemUpdate, db: Session = Depends(get_db), item_da
             raise HTTPException(status_code=404, detail="Item with id provided not found")
         return db_item
     except IntegrityError:
-        raise HTTPException(status_code=400, detail="Resource already exists")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="Resource already exists")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="An item cannot be moved inside itself")
\ No newline at end of file
@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from app.metrics import registry, CONTENT_TYPE
 
 router = APIRouter()
 
 @router.get("/")
 def read_root():
-    return {"message": "Local cloud"}
\ No newline at end of file
+    return {"message": "Local cloud"}
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
\ No newline at end of file
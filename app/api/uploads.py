@@ -0,0 +1,136 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from app.schemas import ItemBase, ItemCreate, UploadSessionBase, UploadSessionCreate
+from app.models import UploadSession
+from app.dependencies import get_db, get_item_dao, get_upload_session_dao, get_uploads_manager, get_async_uploads_manager, get_pipeline
+from app.crud.item import ItemDAO
+from app.crud.upload_session import UploadSessionDAO
+from app.uploads_manager import UploadsManager, AsyncUploadsManager
+from app.storage import store_session_file, exceeds_quota
+from app.pipeline import JobPipeline
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+def session_response(db: Session, upload_session: UploadSession, session_dao: UploadSessionDAO) -> UploadSessionBase:
+    return UploadSessionBase(
+        id=upload_session.id,
+        name=upload_session.name,
+        parent_id=upload_session.parent_id,
+        size=upload_session.size,
+        chunk_size=upload_session.chunk_size,
+        chunk_count=upload_session.chunk_count,
+        received_chunks=session_dao.received_chunks(db, upload_session.id),
+        created_at=upload_session.created_at,
+    )
+
+def get_session_or_404(db: Session, id: str, session_dao: UploadSessionDAO) -> UploadSession:
+    upload_session = session_dao.read_session(db, id)
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session with that id doesn't exist")
+    return upload_session
+
+# upload_chunk only awaits the body and the write, the database is used from the thread pool
+def record_chunk(db: Session, upload_session: UploadSession, session_dao: UploadSessionDAO, index: int, size: int) -> UploadSessionBase:
+    session_dao.record_chunk(db, upload_session.id, index, size)
+    return session_response(db, upload_session, session_dao)
+
+@router.post("", response_model=UploadSessionBase)
+def create_upload_session(
+    new_session: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    session_dao: UploadSessionDAO = Depends(get_upload_session_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager)
+):
+    if new_session.parent_id is not None and item_dao.read_item_metadata(db, new_session.parent_id) is None:
+        raise HTTPException(status_code=404, detail="Specified parent does not exist")
+    if exceeds_quota(db, item_dao, new_session.size):
+        raise HTTPException(status_code=507, detail="Storage quota exceeded")
+    
+    upload_session = session_dao.create_session(db, new_session)
+    u_manager.create_session_file(upload_session.id, upload_session.size)
+    return session_response(db, upload_session, session_dao)
+
+@router.get("/{id}", response_model=UploadSessionBase)
+def read_upload_session(id: str, db: Session = Depends(get_db), session_dao: UploadSessionDAO = Depends(get_upload_session_dao)):
+    upload_session = get_session_or_404(db, id, session_dao)
+    return session_response(db, upload_session, session_dao)
+
+# Chunks can be sent in any order and in parallel, each one lands at its own offset
+@router.put("/{id}/chunks/{index}", response_model=UploadSessionBase)
+async def upload_chunk(
+    id: str,
+    index: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    session_dao: UploadSessionDAO = Depends(get_upload_session_dao),
+    u_manager: AsyncUploadsManager = Depends(get_async_uploads_manager)
+):
+    upload_session = await run_in_threadpool(get_session_or_404, db, id, session_dao)
+    if not 0 <= index < upload_session.chunk_count:
+        raise HTTPException(status_code=400, detail="Chunk index out of range")
+    
+    # Never buffer more than one chunk, whatever the client sends
+    expected = upload_session.chunk_length(index)
+    content = bytearray()
+    async for piece in request.stream():
+        content += piece
+        if len(content) > expected:
+            break
+    if len(content) != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes long")
+    
+    await u_manager.write_chunk(upload_session.id, index * upload_session.chunk_size, content)
+    return await run_in_threadpool(record_chunk, db, upload_session, session_dao, index, len(content))
+
+@router.post("/{id}/complete", response_model=ItemBase)
+def complete_upload_session(
+    id: str,
+    db: Session = Depends(get_db),
+    item_dao: ItemDAO = Depends(get_item_dao),
+    session_dao: UploadSessionDAO = Depends(get_upload_session_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager),
+    pipeline: JobPipeline = Depends(get_pipeline)
+):
+    upload_session = get_session_or_404(db, id, session_dao)
+    missing = set(range(upload_session.chunk_count)) - set(session_dao.received_chunks(db, upload_session.id))
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Missing chunks: {sorted(missing)}")
+    
+    item = ItemCreate(
+        name=upload_session.name,
+        is_dir=False,
+        parent_id=upload_session.parent_id,
+        size=upload_session.size,
+    )
+    try:
+        db_item = item_dao.create_item(db, item)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Resource already exists")
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Specified parent does not exist")
+    
+    try:
+        store_session_file(db, item_dao, u_manager, db_item, upload_session.id)
+    except OSError:
+        item_dao.delete_item(db, db_item.id)
+        raise HTTPException(status_code=500, detail="Could not store the file")
+    
+    session_dao.delete_session(db, upload_session.id)
+    pipeline.enqueue(db, [db_item.id])
+    return db_item
+
+@router.delete("/{id}", response_model=UploadSessionBase)
+def abort_upload_session(
+    id: str,
+    db: Session = Depends(get_db),
+    session_dao: UploadSessionDAO = Depends(get_upload_session_dao),
+    u_manager: UploadsManager = Depends(get_uploads_manager)
+):
+    upload_session = get_session_or_404(db, id, session_dao)
+    response = session_response(db, upload_session, session_dao)
+    session_dao.delete_session(db, upload_session.id)
+    u_manager.remove_session_file(upload_session.id)
+    return response
@@ -0,0 +1,112 @@
+import io
+import logging
+import tarfile
+import time
+import zipfile
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+# Already compressed content is stored as is, deflating it again only costs CPU
+COMPRESSED_MIMETYPE_PREFIXES = ("image/", "video/", "audio/")
+COMPRESSED_MIMETYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/zstd",
+    "application/pdf",
+    "application/epub+zip",
+    "application/java-archive",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+UNCOMPRESSED_IMAGE_MIMETYPES = {"image/svg+xml", "image/bmp", "image/x-ms-bmp", "image/tiff"}
+
+def is_compressed_mimetype(mimetype: str | None) -> bool:
+    if mimetype is None:
+        return False
+    if mimetype in UNCOMPRESSED_IMAGE_MIMETYPES:
+        return False
+    return mimetype in COMPRESSED_MIMETYPES or mimetype.startswith(COMPRESSED_MIMETYPE_PREFIXES)
+
+
+# Unseekable sink that zipfile writes into, drained after every chunk
+class StreamSink(io.RawIOBase):
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+# Entries are (arcname, item) pairs ordered so directories come before their content.
+# Files missing on disk are skipped rather than breaking the whole archive.
+def zip_stream(entries: Iterable[tuple[str, object]], open_file: Callable[[object], BinaryIO]) -> Iterator[bytes]:
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+        for arcname, item in entries:
+            date_time = time.localtime(item.updated_at.timestamp())[:6] if item.updated_at else (1980, 1, 1, 0, 0, 0)
+            if item.is_dir:
+                archive.writestr(zipfile.ZipInfo(f"{arcname}/", date_time), b"")
+            else:
+                try:
+                    source = open_file(item)
+                except FileNotFoundError:
+                    logger.warning("Skipping %s, its file is missing", item.id)
+                    continue
+                info = zipfile.ZipInfo(arcname, date_time)
+                info.file_size = item.size or 0
+                info.compress_type = zipfile.ZIP_STORED if is_compressed_mimetype(item.mimetype) else zipfile.ZIP_DEFLATED
+                with source, archive.open(info, "w") as target:
+                    while chunk := source.read(CHUNK_SIZE):
+                        target.write(chunk)
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+# Tar members are written by hand so file content can be yielded chunk by chunk
+def tar_stream(entries: Iterable[tuple[str, object]], open_file: Callable[[object], BinaryIO]) -> Iterator[bytes]:
+    for arcname, item in entries:
+        info = tarfile.TarInfo(arcname)
+        info.mtime = int(item.updated_at.timestamp()) if item.updated_at else 0
+        if item.is_dir:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            yield info.tobuf(tarfile.PAX_FORMAT)
+            continue
+        
+        try:
+            source = open_file(item)
+        except FileNotFoundError:
+            logger.warning("Skipping %s, its file is missing", item.id)
+            continue
+        info.size = item.size or 0
+        info.mode = 0o644
+        yield info.tobuf(tarfile.PAX_FORMAT)
+        
+        # The header announced item.size bytes, the content must match it exactly
+        remaining = info.size
+        with source:
+            while remaining > 0 and (chunk := source.read(min(CHUNK_SIZE, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+        yield tarfile.NUL * (remaining + (-info.size % tarfile.BLOCKSIZE))
+    
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+from app.config import settings
+
+
+# Bounded least recently used cache whose entries also expire after a fixed
+# time, which bounds the staleness of writes made by other processes
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation, a value read from the database before
+        # a concurrent invalidation must not be stored afterwards
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < self.clock():
+                if entry is not None:
+                    self.discard(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None):
+        with self.lock:
+            if generation is None or generation == self.generation:
+                self.store(key, value)
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            for key in list(self.entries):
+                self.discard(key)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    # Called with the lock held
+    def store(self, key: Hashable, value: Any):
+        if key in self.entries:
+            self.discard(key)
+        self.entries[key] = (self.clock() + self.ttl, value)
+        while len(self.entries) > self.maxsize:
+            oldest = next(iter(self.entries))
+            self.discard(oldest)
+
+    def discard(self, key: Hashable):
+        self.entries.pop(key, None)
+
+
+# Item metadata by id, with a path index so that ancestors and moved
+# subtrees can be invalidated without knowing their ids
+class ItemCache(LRUCache):
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        super().__init__(maxsize, ttl, clock)
+        self.ids_by_path: dict[str, Hashable] = {}
+
+    def store(self, key: Hashable, value: Any):
+        super().store(key, value)
+        self.ids_by_path[value.path] = key
+
+    def discard(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None and self.ids_by_path.get(entry[1].path) == key:
+            del self.ids_by_path[entry[1].path]
+
+    def invalidate_paths(self, paths: Iterable[str]):
+        with self.lock:
+            self.generation += 1
+            for path in paths:
+                key = self.ids_by_path.get(path)
+                if key is not None:
+                    self.discard(key)
+
+    # Drops the item at the path and everything cached below it
+    def invalidate_subtree(self, path: str):
+        prefix = f"{path}/"
+        with self.lock:
+            self.generation += 1
+            keys = [key for cached_path, key in self.ids_by_path.items() if cached_path == path or cached_path.startswith(prefix)]
+            for key in keys:
+                self.discard(key)
+
+
+# Shared by every request of the process, None when disabled
+item_cache = ItemCache(settings.item_cache_size, settings.item_cache_ttl) if settings.item_cache_size > 0 else None
+
+# Verified tokens by the SHA-256 of the token, None when disabled
+token_cache = LRUCache(settings.token_cache_size, settings.token_cache_ttl) if settings.token_cache_size > 0 else None
@@ -0,0 +1,54 @@
+import gzip
+import zlib
+from typing import BinaryIO, Iterator
+from app.archive import is_compressed_mimetype
+
+GZIP = "gzip"
+CHUNK_SIZE = 256 * 1024
+
+# Only the head of an upload is compressed to decide, the rest is never buffered
+SAMPLE_SIZE = 64 * 1024
+# Small files gain a few bytes at most and lose pass-through range reads
+MIN_COMPRESS_SIZE = 1024
+# Stored compressed only when the sample shrinks below this ratio
+MAX_COMPRESSED_RATIO = 0.8
+
+def should_compress(mimetype: str | None, sample: bytes) -> bool:
+    if is_compressed_mimetype(mimetype) or len(sample) < MIN_COMPRESS_SIZE:
+        return False
+    sample = sample[:SAMPLE_SIZE]
+    return len(zlib.compress(sample, 1)) < len(sample) * MAX_COMPRESSED_RATIO
+
+def open_compressed(fileobj: BinaryIO) -> BinaryIO:
+    # mtime is fixed so identical content always gives identical bytes on disk
+    return gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6, mtime=0)
+
+def open_decompressed(path: str) -> BinaryIO:
+    return gzip.open(path, "rb")
+
+def iter_decompressed(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open_decompressed(path) as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+# Parses Accept-Encoding, an explicit q=0 refuses the coding
+def accepts_gzip(header: str | None) -> bool:
+    if not header:
+        return False
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if GZIP in accepted:
+        return accepted[GZIP] > 0
+    if "x-gzip" in accepted:
+        return accepted["x-gzip"] > 0
+    return accepted.get("*", 0) > 0
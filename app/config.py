@@ -0,0 +1,69 @@
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return int(value)
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class Settings:
+    def __init__(self):
+        self.database_url = os.environ.get("LOCAL_CLOUD_DATABASE_URL", "sqlite:///./cloud.db")
+        # Connections kept open per process, plus the extra ones allowed under bursts
+        self.db_pool_size = env_int("LOCAL_CLOUD_DB_POOL_SIZE", 10)
+        self.db_max_overflow = env_int("LOCAL_CLOUD_DB_MAX_OVERFLOW", 20)
+        # NORMAL is durable in WAL mode except for the last commits on power loss
+        self.sqlite_synchronous = os.environ.get("LOCAL_CLOUD_SQLITE_SYNCHRONOUS", "NORMAL")
+        self.sqlite_cache_size_kib = env_int("LOCAL_CLOUD_SQLITE_CACHE_SIZE_KIB", 64 * 1024)
+        self.sqlite_mmap_size = env_int("LOCAL_CLOUD_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+        self.sqlite_busy_timeout_ms = env_int("LOCAL_CLOUD_SQLITE_BUSY_TIMEOUT_MS", 5000)
+        # Store each distinct content once, items reference blobs by SHA-256
+        self.content_addressed = env_bool("LOCAL_CLOUD_CONTENT_ADDRESSED", False)
+        # Gzip compressible uploads on disk, they are served as is to clients accepting gzip
+        self.compress_at_rest = env_bool("LOCAL_CLOUD_COMPRESS_AT_REST", False)
+        # "flat" keeps every file directly in uploads/, "sharded" fans them out in two directory levels
+        self.uploads_layout = os.environ.get("LOCAL_CLOUD_UPLOADS_LAYOUT", "flat")
+        # Item metadata kept in memory per process, 0 disables the cache. Entries expire
+        # after the TTL so that writes made by other processes show up eventually.
+        self.item_cache_size = env_int("LOCAL_CLOUD_ITEM_CACHE_SIZE", 10000)
+        self.item_cache_ttl = env_int("LOCAL_CLOUD_ITEM_CACHE_TTL", 30)
+        # Threads processing uploaded files in the background, 0 disables the pipeline
+        self.job_workers = env_int("LOCAL_CLOUD_JOB_WORKERS", 2)
+        self.job_max_attempts = env_int("LOCAL_CLOUD_JOB_MAX_ATTEMPTS", 5)
+        # Profile the SQL of every request: slow queries and statements repeated
+        # at least the threshold number of times are logged
+        self.sql_profiling = env_bool("LOCAL_CLOUD_SQL_PROFILING", False)
+        self.slow_query_ms = env_int("LOCAL_CLOUD_SLOW_QUERY_MS", 100)
+        self.n_plus_one_threshold = env_int("LOCAL_CLOUD_N_PLUS_ONE_THRESHOLD", 10)
+        # Adds the query count of each request to its response headers when profiling
+        self.debug = env_bool("LOCAL_CLOUD_DEBUG", False)
+        # Change journal entries are kept this long, clients with an older cursor list everything again
+        self.change_retention_days = env_int("LOCAL_CLOUD_CHANGE_RETENTION_DAYS", 30)
+        # Long-polling requests also check the journal this often for changes made by other processes
+        self.change_poll_interval = env_int("LOCAL_CLOUD_CHANGE_POLL_INTERVAL", 5)
+        # Require a bearer token from /auth/login for the items, uploads and changes
+        self.auth_required = env_bool("LOCAL_CLOUD_AUTH_REQUIRED", False)
+        self.token_ttl_hours = env_int("LOCAL_CLOUD_TOKEN_TTL_HOURS", 24)
+        # Anyone may create an account through /auth/register
+        self.allow_registration = env_bool("LOCAL_CLOUD_ALLOW_REGISTRATION", True)
+        # Processes hashing and verifying passwords, 0 hashes in a thread instead
+        self.password_hash_workers = env_int("LOCAL_CLOUD_PASSWORD_HASH_WORKERS", 2)
+        # Verified tokens kept in memory per process, 0 disables the cache. Revoking
+        # a token takes up to the TTL to reach the other processes.
+        self.token_cache_size = env_int("LOCAL_CLOUD_TOKEN_CACHE_SIZE", 10000)
+        self.token_cache_ttl = env_int("LOCAL_CLOUD_TOKEN_CACHE_TTL", 60)
+        # Total bytes that may be stored, 0 for no limit
+        self.storage_quota = env_int("LOCAL_CLOUD_STORAGE_QUOTA", 0) or None
+        # Threads available for disk writes, removes and fsyncs
+        self.io_concurrency = env_int("LOCAL_CLOUD_IO_CONCURRENCY", 8)
+
+
+settings = Settings()
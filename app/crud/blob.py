@@ -0,0 +1,52 @@
+from collections import Counter
+from typing import Callable
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.models import Blob
+
+
+# Reference counting for content addressed blobs. Methods that take part in
+# an item write don't commit, so references change in the same transaction.
+class BlobDAO:
+    def __init__(self):
+        pass
+    
+    def read_blob(self, db: Session, hash: str) -> Blob | None:
+        return db.get(Blob, hash)
+
+    # One upsert, a row dropped by a concurrent collect is created again
+    # instead of the increment matching no row
+    def add_reference(self, db: Session, hash: str, size: int, count: int = 1) -> Blob:
+        stmt = (
+            insert(Blob)
+            .values(hash=hash, size=size, ref_count=count)
+            .on_conflict_do_update(index_elements=[Blob.hash], set_={"ref_count": Blob.ref_count + count})
+            .returning(Blob)
+        )
+        return db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+    def release_references(self, db: Session, hashes: list[str]):
+        for hash, count in Counter(hashes).items():
+            stmt = update(Blob).where(Blob.hash == hash).values(ref_count=Blob.ref_count - count)
+            db.execute(stmt)
+
+    def unreferenced_blobs(self, db: Session, limit: int = 1000) -> list[str]:
+        stmt = select(Blob.hash).where(Blob.ref_count <= 0).limit(limit)
+        return list(db.execute(stmt).scalars().all())
+
+    # The file is removed inside the transaction that drops the row, so a
+    # concurrent upload either revives the row first or stores the file again
+    def collect(self, db: Session, remove_file: Callable[[str], None], limit: int = 1000) -> list[str]:
+        collected = []
+        for hash in self.unreferenced_blobs(db, limit):
+            stmt = delete(Blob).where(Blob.hash == hash, Blob.ref_count <= 0)
+            if db.execute(stmt).rowcount == 0:
+                continue
+            try:
+                remove_file(hash)
+            except FileNotFoundError:
+                pass
+            collected.append(hash)
+        db.commit()
+        return collected
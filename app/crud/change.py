@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.models import Change, Item
+
+
+# Methods that record changes don't commit, the entry belongs to the
+# transaction of the change itself
+class ChangeDAO:
+    def __init__(self):
+        pass
+    
+    def record(self, db: Session, item: Item, action: str, old_path: str | None = None):
+        db.add(Change(item_id=item.id, action=action, is_dir=item.is_dir, path=item.path, old_path=old_path))
+
+    # Rows as inserted by ItemDAO.create_items_bulk
+    def record_created(self, db: Session, rows: list[dict]):
+        if rows:
+            db.execute(insert(Change), [
+                {"item_id": row["id"], "action": "created", "is_dir": row["is_dir"], "path": row["path"]}
+                for row in rows
+            ])
+
+    # Changes after the cursor with the current state of their item, None once deleted
+    def read_changes(self, db: Session, since: int, limit: int) -> list[Row]:
+        stmt = (
+            select(Change, Item)
+            .outerjoin(Item, Item.id == Change.item_id)
+            .where(Change.id > since)
+            .order_by(Change.id)
+            .limit(limit)
+        )
+        return list(db.execute(stmt).all())
+
+    def latest_id(self, db: Session) -> int:
+        return db.execute(select(func.coalesce(func.max(Change.id), 0))).scalar()
+
+    def oldest_id(self, db: Session) -> int | None:
+        return db.execute(select(func.min(Change.id))).scalar()
+
+    # Whether entries after the cursor were pruned already, the client must list everything again
+    def is_expired(self, db: Session, since: int) -> bool:
+        oldest = self.oldest_id(db)
+        return oldest is not None and oldest > since + 1
+
+    # The latest entry is always kept so that expired cursors stay detectable
+    def prune(self, db: Session, before: datetime) -> int:
+        latest = select(func.max(Change.id)).scalar_subquery()
+        result = db.execute(delete(Change).where(Change.created_at < before, Change.id < latest))
+        db.commit()
+        return result.rowcount
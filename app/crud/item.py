@@ -1,20 +1,90 @@
-from sqlalchemy import select, insert
+from sqlalchemy import select, insert, update, delete, and_, or_, func, literal, literal_column, bindparam, table, column
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.exc import IntegrityError
-from app.models import User, Item
-from app.schemas import ItemCreate, ItemUpdate
+from app.models import User, Item, PendingRemoval, Job
+from app.schemas import ItemCreate, ItemUpdate, ItemSummary
+from app.crud.blob import BlobDAO
+from app.crud.change import ChangeDAO
+from app.cache import ItemCache
+from app.notifier import ChangeNotifier
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import NamedTuple
 import mimetypes
+import uuid
+
+
+# Descendants share the path prefix of their ancestor, "0" is the character after "/"
+def descendants_of(path: str):
+    return and_(Item.path >= f"{path}/", Item.path < f"{path}0")
+
+# Every ancestor path is a prefix of the item path, below the uploads/ root
+def ancestor_paths(path: str) -> list[str]:
+    parts = path.split("/")
+    return ["/".join(parts[:i]) for i in range(2, len(parts))]
+
+# Fills the children collections from rows already loaded, the nested item
+# responses then never lazy load them one item at a time
+def populate_children(items: list[Item]):
+    by_parent = defaultdict(list)
+    for item in items:
+        by_parent[item.parent_id].append(item)
+    for item in items:
+        set_committed_value(item, "children", by_parent[item.id])
+
+
+# External content FTS5 table, see SEARCH_INDEX_DDL
+items_fts = table("items_fts", column("rowid"), column("name"), column("path"))
+# Shortest term the trigram index can look up
+MIN_TRIGRAM_LENGTH = 3
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# A single quoted phrase matches the term as a substring of the column
+def match_phrase(column_name: str, term: str) -> str:
+    escaped = term.replace('"', '""')
+    return f'{column_name} : "{escaped}"'
+
+
+# Snapshot of the columns needed to locate and serve an item, not bound to any session
+class ItemMetadata(NamedTuple):
+    id: str
+    name: str
+    is_dir: bool
+    parent_id: str | None
+    path: str
+    size: int | None
+    mimetype: str | None
+    blob_hash: str | None
+    encoding: str | None
+    updated_at: datetime | None
+
+METADATA_COLUMNS = [getattr(Item, field) for field in ItemMetadata._fields]
+
+# Listings can fetch plain rows of these columns instead of ORM items, in the
+# order of the ItemSummary fields, see app.serializers
+SUMMARY_FIELDS = tuple(ItemSummary.model_fields)
+SUMMARY_COLUMNS = [getattr(Item, field) for field in SUMMARY_FIELDS]
+
+# Number of "/" in the path, top level items are at depth 1
+def path_depth():
+    return func.length(Item.path) - func.length(func.replace(Item.path, "/", ""))
 
 
 class ItemDAO:
-    def __init__(self):
-        pass
+    def __init__(self, cache: ItemCache | None = None, notifier: ChangeNotifier | None = None):
+        self.blob_dao = BlobDAO()
+        self.change_dao = ChangeDAO()
+        self.cache = cache
+        self.notifier = notifier
     
     def build_path(self, db: Session, filename: str, parent_id: str | None) -> str:
         if parent_id is None:
             return f"uploads/{filename}"
         
-        parent = db.get(Item, parent_id)
+        parent = self.read_item_metadata(db, parent_id)
         if parent is None:
             raise ValueError(f"Parent item with id {parent_id} does not exist")
         
@@ -28,6 +98,78 @@ class ItemDAO:
         item = db.get(Item, id)
         return item
 
+    # Served from the cache when one is configured
+    def read_item_metadata(self, db: Session, id: str) -> ItemMetadata | None:
+        if self.cache is not None:
+            metadata = self.cache.get(id)
+            if metadata is not None:
+                return metadata
+            generation = self.cache.generation
+        
+        row = db.execute(select(*METADATA_COLUMNS).where(Item.id == id)).first()
+        if row is None:
+            return None
+        metadata = ItemMetadata(*row)
+        if self.cache is not None:
+            self.cache.set(id, metadata, generation)
+        return metadata
+
+    # Drops the cached item at the path, or its whole subtree, along with its
+    # ancestors whose sizes changed. Called once the change is committed so
+    # that no concurrent reader can cache the previous state afterwards.
+    def invalidate_cached(self, path: str, subtree: bool = False):
+        if self.cache is None:
+            return
+        if subtree:
+            self.cache.invalidate_subtree(path)
+        self.cache.invalidate_paths([*ancestor_paths(path), path])
+
+    # Wakes the long-polling change feeds, once the change is committed
+    def notify_changes(self):
+        if self.notifier is not None:
+            self.notifier.notify()
+
+    def read_item_by_path(self, db: Session, path: str) -> Item | None:
+        stmt = select(Item).where(Item.path == path)
+        return db.execute(stmt).scalars().first()
+
+    # One lookup on the path index for the whole chain
+    def read_ancestors(self, db: Session, item: ItemMetadata | Item) -> list[Item]:
+        prefixes = ancestor_paths(item.path)
+        if not prefixes:
+            return []
+        stmt = select(Item).where(Item.path.in_(prefixes)).order_by(func.length(Item.path))
+        return list(db.execute(stmt).scalars().all())
+
+    # ORM items, or plain rows of the given columns that skip the identity map
+    def fetch(self, db: Session, stmt, columns: list | None = None) -> list:
+        if columns is None:
+            return db.execute(stmt).scalars().all()
+        return db.execute(stmt.with_only_columns(*columns)).all()
+
+    # Range scan on the path index, ordered by path so parents come before their children
+    def read_descendants(self, db: Session, item: ItemMetadata | Item, limit: int, after: str | None = None, max_depth: int | None = None, columns: list | None = None) -> tuple[list[Item], str | None]:
+        stmt = select(Item).where(descendants_of(item.path))
+        if after is not None:
+            stmt = stmt.where(Item.path > after)
+        if max_depth is not None:
+            stmt = stmt.where(path_depth() <= item.path.count("/") + max_depth)
+        stmt = stmt.order_by(Item.path).limit(limit + 1)
+        
+        items = self.fetch(db, stmt, columns)
+        if len(items) > limit:
+            return items[:limit], items[limit - 1].path
+        return items, None
+
+    # Plain rows of the item and its subtree, parents before their children
+    def stream_subtree(self, db: Session, item: ItemMetadata | Item, batch_size: int = 1000):
+        stmt = (
+            select(Item.id, Item.name, Item.is_dir, Item.path, Item.size, Item.mimetype, Item.blob_hash, Item.encoding, Item.updated_at)
+            .where(or_(Item.id == item.id, descendants_of(item.path)))
+            .order_by(Item.path)
+        )
+        yield from db.execute(stmt.execution_options(yield_per=batch_size))
+
     def read_children(self, db: Session, parent_id: str | None) -> list[Item]:
         if parent_id is None:
             stmt = select(Item).where(Item.parent_id.is_(None))
@@ -37,11 +179,130 @@ class ItemDAO:
         result = db.execute(stmt).scalars().all()
         return result
 
-    def read_all_items(self, db: Session) -> list[Item]:
-        stmt = select(Item)
-        result = db.execute(stmt).scalars().all()
+    def read_all_items(self, db: Session, columns: list | None = None) -> list[Item]:
+        result = self.fetch(db, select(Item), columns)
+        if columns is None:
+            populate_children(result)
         return result
 
+    # Rows below the parent, or from the top level, down to depth levels, parents first
+    def read_tree(self, db: Session, parent: ItemMetadata | Item | None, depth: int, columns: list | None = None) -> list:
+        base_depth = 0 if parent is None else parent.path.count("/")
+        stmt = select(Item).where(path_depth() <= base_depth + depth).order_by(Item.path)
+        if parent is not None:
+            stmt = stmt.where(descendants_of(parent.path))
+        return self.fetch(db, stmt, columns)
+
+    def filter_items(self, stmt, parent_id: str | None = None, is_dir: bool | None = None):
+        if parent_id is not None:
+            stmt = stmt.where(Item.parent_id == parent_id)
+        if is_dir is not None:
+            stmt = stmt.where(Item.is_dir == is_dir)
+        return stmt
+
+    # Keyset pagination on the primary key, every page costs the same whatever its position
+    def read_items_page(self, db: Session, limit: int, after: str | None = None, parent_id: str | None = None, is_dir: bool | None = None, columns: list | None = None) -> tuple[list[Item], str | None]:
+        stmt = self.filter_items(select(Item), parent_id, is_dir)
+        if after is not None:
+            stmt = stmt.where(Item.id > after)
+        stmt = stmt.order_by(Item.id).limit(limit + 1)
+        
+        items = self.fetch(db, stmt, columns)
+        if len(items) > limit:
+            return items[:limit], items[limit - 1].id
+        return items, None
+
+    # Substring or prefix search on names or relative paths, ranked by bm25 and
+    # paginated by offset. Terms long enough for the trigram index are looked up
+    # in it, shorter ones fall back to a LIKE scan ordered by path.
+    def search_items(
+        self,
+        db: Session,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        prefix: bool = False,
+        field: str = "name",
+        mimetype: str | None = None,
+        folder: ItemMetadata | Item | None = None,
+        columns: list | None = None,
+    ) -> tuple[list[Item], str | None]:
+        searched = Item.name if field == "name" else Item.path
+        pattern = escape_like(query)
+        if field == "path":
+            pattern = f"uploads/{pattern}" if prefix else pattern
+        pattern = f"{pattern}%" if prefix else f"%{pattern}%"
+        
+        stmt = select(Item).where(searched.like(pattern, escape="\\"))
+        if len(query) >= MIN_TRIGRAM_LENGTH:
+            fts = literal_column("items_fts")
+            stmt = (
+                stmt.join(items_fts, items_fts.c.rowid == literal_column("items.rowid"))
+                .where(fts.op("MATCH")(match_phrase(field, query)))
+                .order_by(func.bm25(fts), Item.path)
+            )
+        else:
+            stmt = stmt.order_by(Item.path)
+        
+        if mimetype is not None:
+            if mimetype.endswith("/*"):
+                stmt = stmt.where(Item.mimetype.like(f"{escape_like(mimetype[:-1])}%", escape="\\"))
+            else:
+                stmt = stmt.where(Item.mimetype == mimetype)
+        if folder is not None:
+            stmt = stmt.where(descendants_of(folder.path))
+        
+        items = self.fetch(db, stmt.offset(offset).limit(limit + 1), columns)
+        if len(items) > limit:
+            return items[:limit], str(offset + limit)
+        return items, None
+
+    # Yields plain rows in batches from the cursor, nothing is kept in the identity map.
+    # Mappings of every column by default, tuples of the given columns otherwise.
+    def stream_items(self, db: Session, parent_id: str | None = None, is_dir: bool | None = None, batch_size: int = 1000, columns: list | None = None):
+        stmt = self.filter_items(select(*(columns or Item.__table__.columns)), parent_id, is_dir).order_by(Item.id)
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        yield from result if columns is not None else result.mappings()
+
+    # Bytes and files an item accounts for in the size of its ancestors
+    def usage_of(self, item: Item) -> tuple[int, int]:
+        if item.is_dir:
+            return item.size or 0, item.file_count or 0
+        return item.size or 0, 1
+
+    # Applies a usage change to every ancestor of path, without rescanning anything
+    def update_ancestors_usage(self, db: Session, path: str, size_delta: int, count_delta: int):
+        prefixes = ancestor_paths(path)
+        if not prefixes or (size_delta == 0 and count_delta == 0):
+            return
+        stmt = (
+            update(Item)
+            .where(Item.path.in_(prefixes))
+            .values(
+                size=func.coalesce(Item.size, 0) + size_delta,
+                file_count=func.coalesce(Item.file_count, 0) + count_delta,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(stmt)
+
+    def read_usage(self, db: Session, id: str | None = None) -> tuple[int, int] | None:
+        if id is not None:
+            item = db.get(Item, id)
+            return None if item is None else self.usage_of(item)
+        
+        # Whole storage, summed over the top level items only
+        stmt = select(
+            func.coalesce(func.sum(Item.size), 0),
+            func.coalesce(func.sum(func.iif(Item.is_dir, Item.file_count, 1)), 0),
+        ).where(Item.parent_id.is_(None))
+        size, file_count = db.execute(stmt).one()
+        return size, file_count
+
+    def read_largest_dirs(self, db: Session, limit: int) -> list[Item]:
+        stmt = select(Item).where(Item.is_dir.is_(True)).order_by(Item.size.desc()).limit(limit)
+        return list(db.execute(stmt).scalars().all())
+
     def create_item(self, db: Session, new_item: ItemCreate) -> Item | None:
         new_path = self.build_path(db, new_item.name, new_item.parent_id)
         model_item = Item(
@@ -49,70 +310,282 @@ class ItemDAO:
             is_dir=new_item.is_dir,
             parent_id=new_item.parent_id,
             path=new_path,
-            size=new_item.size,
-            mimetype=self.get_mimetype(new_path),
+            size=0 if new_item.is_dir else new_item.size,
+            file_count=0 if new_item.is_dir else None,
+            mimetype=None if new_item.is_dir else self.get_mimetype(new_path),
         )
         
         db.add(model_item)
         try:
+            db.flush()
+            size, file_count = self.usage_of(model_item)
+            self.update_ancestors_usage(db, new_path, size, file_count)
+            self.change_dao.record(db, model_item, "created")
             db.commit()
             db.refresh(model_item)
         except IntegrityError:
             db.rollback()
             raise 
+        self.invalidate_cached(new_path)
+        self.notify_changes()
         return model_item
 
-    # Calculates and assigns the path of the children recursively
-    def update_children_paths(self, db: Session, parent_id: str):
-        children = self.read_children(db, parent_id)
-        for child in children:
-            child.path = self.build_path(db, child.name, child.parent_id)
-            try:
-                db.commit()
-                db.refresh(child)
-            except IntegrityError:
-                db.rollback()
-                raise
-            
-            if child.is_dir:
-                self.update_children_paths(db, child.id)
+    # Creates a whole tree with bulk statements in one transaction. Entries are
+    # (relative path, size, blob hash, encoding) with a None size for directories.
+    # Missing intermediate directories are created and existing ones are reused.
+    def create_items_bulk(self, db: Session, parent_id: str | None, entries: list[tuple[str, int | None, str | None, str | None]]) -> list[dict]:
+        if parent_id is None:
+            base_path = "uploads"
+        else:
+            parent = db.get(Item, parent_id)
+            if parent is None:
+                raise ValueError(f"Parent item with id {parent_id} does not exist")
+            base_path = parent.path
+        
+        dir_paths = set()
+        for relative_path, size, _, _ in entries:
+            parts = relative_path.split("/")
+            last = len(parts) + 1 if size is None else len(parts)
+            dir_paths.update(f"{base_path}/{'/'.join(parts[:i])}" for i in range(1, last))
+        
+        # Directories that already exist keep their id
+        ids = {base_path: parent_id}
+        sorted_paths = sorted(dir_paths)
+        for start in range(0, len(sorted_paths), 500):
+            stmt = select(Item.path, Item.id, Item.is_dir).where(Item.path.in_(sorted_paths[start:start + 500]))
+            for path, id, is_dir in db.execute(stmt):
+                if not is_dir:
+                    raise ValueError(f"{path} is not a directory")
+                ids[path] = id
+        
+        now = datetime.now(timezone.utc)
+        new_dirs = {}
+        for path in sorted_paths:
+            if path in ids:
+                continue
+            ids[path] = str(uuid.uuid4())
+            parent_path, name = path.rsplit("/", 1)
+            new_dirs[path] = dict(
+                id=ids[path], name=name, is_dir=True, parent_id=ids[parent_path], path=path,
+                size=0, file_count=0, mimetype=None, blob_hash=None, encoding=None, created_at=now, updated_at=now,
+            )
+        
+        files = []
+        existing_deltas = defaultdict(lambda: [0, 0])
+        for relative_path, size, blob_hash, encoding in entries:
+            if size is None:
+                continue
+            path = f"{base_path}/{relative_path}"
+            parent_path, name = path.rsplit("/", 1)
+            files.append(dict(
+                id=str(uuid.uuid4()), name=name, is_dir=False, parent_id=ids[parent_path], path=path,
+                size=size, file_count=None, mimetype=self.get_mimetype(path), blob_hash=blob_hash,
+                encoding=encoding, created_at=now, updated_at=now,
+            ))
+            for ancestor in ancestor_paths(path):
+                if ancestor in new_dirs:
+                    new_dirs[ancestor]["size"] += size
+                    new_dirs[ancestor]["file_count"] += 1
+                else:
+                    existing_deltas[ancestor][0] += size
+                    existing_deltas[ancestor][1] += 1
+        
+        rows = list(new_dirs.values()) + files
+        try:
+            if rows:
+                db.execute(insert(Item), rows)
+            if existing_deltas:
+                stmt = (
+                    update(Item)
+                    .where(Item.path == bindparam("ancestor"))
+                    .values(
+                        size=func.coalesce(Item.size, 0) + bindparam("size_delta"),
+                        file_count=func.coalesce(Item.file_count, 0) + bindparam("count_delta"),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.connection().execute(stmt, [
+                    {"ancestor": path, "size_delta": size, "count_delta": count}
+                    for path, (size, count) in existing_deltas.items()
+                ])
+            blob_counts = Counter(row["blob_hash"] for row in files if row["blob_hash"] is not None)
+            blob_sizes = {row["blob_hash"]: row["size"] for row in files}
+            for blob_hash, count in blob_counts.items():
+                self.blob_dao.add_reference(db, blob_hash, blob_sizes[blob_hash], count)
+            self.change_dao.record_created(db, rows)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise
+        if self.cache is not None:
+            self.cache.invalidate_paths(existing_deltas)
+        if rows:
+            self.notify_changes()
+        return rows
+
+    # Rewrites the path prefix of a whole subtree with a single statement
+    def move_subtree_paths(self, db: Session, old_path: str, new_path: str):
+        stmt = (
+            update(Item)
+            .where(descendants_of(old_path))
+            .values(path=literal(new_path) + func.substr(Item.path, len(old_path) + 1))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(stmt)
 
     def update_item(self, db: Session, item: ItemUpdate) -> Item | None:
         db_item = db.get(Item, item.id)
         if db_item is None:
             return None
+        original_path = db_item.path
         
         # Change name
         if item.name is not None:
             db_item.name = item.name
         
-        # Change parent - Update path, update childrens path
+        # Change parent
+        parent_path = original_path.rsplit("/", 1)[0]
         if item.parent_id is not None:
             # Check if new parent exists
             parent = db.get(Item, item.parent_id)
             if parent is None:
+                db.rollback()
                 return None
-            # Update parent and paths
-            db_item.parent_id = item.parent_id
-            db_item.path = self.build_path(db, db_item.name, db_item.parent_id)
-            try:
-                db.commit()
-                db.refresh(db_item)
-            except IntegrityError:
+            if parent.id == db_item.id or parent.path.startswith(f"{db_item.path}/"):
                 db.rollback()
-                raise
-            # Update children paths
-            self.update_children_paths(db, db_item.parent_id)
+                raise ValueError("An item cannot be moved inside itself")
+            db_item.parent_id = parent.id
+            parent_path = parent.path
+        
+        # A rename or a move changes the path of the item and of its whole subtree
+        db_item.path = f"{parent_path}/{db_item.name}"
+        moved = original_path != db_item.path
+        
+        # The item, its descendants and the sizes of both ancestries are updated in one transaction
+        try:
+            db.flush()
+            if moved:
+                self.move_subtree_paths(db, original_path, db_item.path)
+                size, file_count = self.usage_of(db_item)
+                self.update_ancestors_usage(db, original_path, -size, -file_count)
+                self.update_ancestors_usage(db, db_item.path, size, file_count)
+                self.change_dao.record(db, db_item, "moved", original_path)
+            else:
+                self.change_dao.record(db, db_item, "updated")
+            db.commit()
+            db.refresh(db_item)
+        except IntegrityError:
+            db.rollback()
+            raise
         
+        # A moved subtree is cached under its old paths
+        self.invalidate_cached(original_path, subtree=moved)
+        if moved:
+            self.invalidate_cached(db_item.path)
+        self.notify_changes()
         return db_item
 
+    # Records the measured size and the content coding of a stored file. New
+    # content of the same size still needs touch, so that its ETag changes.
+    def update_file_size(self, db: Session, item: Item, size: int, encoding: str | None = None, touch: bool = False) -> Item:
+        if item.size == size and item.encoding == encoding and item.blob_hash is None and not touch:
+            return item
+        self.update_ancestors_usage(db, item.path, size - (item.size or 0), 0)
+        # Stored in uploads/<id> from now on, the blob of a content addressed
+        # version is released and a queued removal of the file no longer applies
+        if item.blob_hash is not None:
+            self.blob_dao.release_references(db, [item.blob_hash])
+            item.blob_hash = None
+            db.execute(delete(PendingRemoval).where(PendingRemoval.item_id == item.id))
+        item.size = size
+        item.encoding = encoding
+        if touch:
+            item.updated_at = datetime.now(timezone.utc)
+        self.change_dao.record(db, item, "updated")
+        try:
+            db.commit()
+            db.refresh(item)
+        except IntegrityError:
+            db.rollback()
+            raise
+        self.invalidate_cached(item.path)
+        self.notify_changes()
+        return item
+
+    # Points a file item at its content addressed blob. With replaces_file, the
+    # file of a version stored in uploads/<id> is queued for removal.
+    def attach_blob(self, db: Session, item: Item, blob_hash: str, size: int, encoding: str | None = None, replaces_file: bool = False) -> Item:
+        if item.blob_hash is not None:
+            self.blob_dao.release_references(db, [item.blob_hash])
+        elif replaces_file:
+            db.add(PendingRemoval(item_id=item.id))
+        self.blob_dao.add_reference(db, blob_hash, size)
+        self.update_ancestors_usage(db, item.path, size - (item.size or 0), 0)
+        item.blob_hash = blob_hash
+        item.size = size
+        item.encoding = encoding
+        self.change_dao.record(db, item, "updated")
+        try:
+            db.commit()
+            db.refresh(item)
+        except IntegrityError:
+            db.rollback()
+            raise
+        self.invalidate_cached(item.path)
+        self.notify_changes()
+        return item
+
+    def set_processing_status(self, db: Session, ids: list[str], status: str):
+        db.execute(update(Item).where(Item.id.in_(ids)).values(processing_status=status, updated_at=Item.updated_at).execution_options(synchronize_session=False))
+
+    # Stores what a processor derived from the content. The content itself is
+    # unchanged, so updated_at and with it the ETag are kept.
+    def update_processing_result(self, db: Session, id: str, values: dict, status: str):
+        stmt = (
+            update(Item)
+            .where(Item.id == id)
+            .values(**values, processing_status=status, updated_at=Item.updated_at)
+            .returning(Item.path)
+            .execution_options(synchronize_session=False)
+        )
+        path = db.execute(stmt).scalar()
+        db.commit()
+        if path is not None:
+            self.invalidate_cached(path)
+
+    def subtree_ids(self, id: str):
+        subtree = select(Item.id).where(Item.id == id).cte("subtree", recursive=True)
+        subtree = subtree.union_all(select(Item.id).where(Item.parent_id == subtree.c.id))
+        return select(subtree.c.id)
+
+    # Deletes the whole subtree in bulk, files on disk are left to the reclaimer
     def delete_item(self, db: Session, id: str) -> User | None:
         item = db.get(Item, id)
         if item is None:
             return None
         
-        db.delete(item)
+        size, file_count = self.usage_of(item)
+        self.update_ancestors_usage(db, item.path, -size, -file_count)
+        
+        subtree = self.subtree_ids(id)
+        stmt = select(Item.blob_hash).where(Item.id.in_(subtree), Item.blob_hash.is_not(None))
+        self.blob_dao.release_references(db, db.execute(stmt).scalars().all())
+        
+        stmt = insert(PendingRemoval).from_select(
+            ["item_id"],
+            select(Item.id).where(Item.id.in_(subtree), Item.is_dir.is_(False), Item.blob_hash.is_(None)),
+        )
+        db.execute(stmt)
+        db.execute(delete(Job).where(Job.item_id.in_(subtree)))
+        db.execute(delete(Item).where(Item.id.in_(subtree)).execution_options(synchronize_session=False))
+        
+        # The returned snapshot stays readable once its rows are gone
+        set_committed_value(item, "children", [])
+        self.change_dao.record(db, item, "deleted")
+        db.expunge(item)
         db.commit()
+        self.invalidate_cached(item.path, subtree=True)
+        self.notify_changes()
         return item
         
     
\ No newline at end of file
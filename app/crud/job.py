@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, update, delete, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.models import Job
+
+
+class JobDAO:
+    def __init__(self):
+        pass
+    
+    def enqueue(self, db: Session, item_ids: list[str], processors: list[str]):
+        rows = [{"item_id": item_id, "processor": processor} for item_id in item_ids for processor in processors]
+        if rows:
+            db.execute(insert(Job), rows)
+
+    # Atomically marks the oldest runnable job as running. Jobs left running
+    # longer than the lease belong to a crashed worker and are taken over.
+    def claim(self, db: Session, lease: timedelta) -> Row | None:
+        now = datetime.now(timezone.utc)
+        runnable = (
+            select(Job.id)
+            .where(or_(
+                and_(Job.status == "pending", Job.run_after <= now),
+                and_(Job.status == "running", Job.claimed_at < now - lease),
+            ))
+            .order_by(Job.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id == runnable)
+            .values(status="running", attempts=Job.attempts + 1, claimed_at=now)
+            .returning(Job.id, Job.item_id, Job.processor, Job.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.execute(stmt).first()
+        db.commit()
+        return row
+
+    def complete(self, db: Session, id: int):
+        db.execute(delete(Job).where(Job.id == id))
+
+    # Puts the job back in the queue, or marks it failed for good without a retry date
+    def fail(self, db: Session, id: int, error: str, retry_at: datetime | None):
+        values = {"last_error": error[:1000], "claimed_at": None}
+        if retry_at is None:
+            values["status"] = "failed"
+        else:
+            values.update(status="pending", run_after=retry_at)
+        db.execute(update(Job).where(Job.id == id).values(**values).execution_options(synchronize_session=False))
+
+    def read_item_jobs(self, db: Session, item_id: str) -> list[Job]:
+        stmt = select(Job).where(Job.item_id == item_id).order_by(Job.id)
+        return list(db.execute(stmt).scalars().all())
+
+    # Overall status of the jobs left for an item
+    def item_status(self, db: Session, item_id: str) -> str:
+        statuses = set(db.execute(select(Job.status).where(Job.item_id == item_id)).scalars())
+        if statuses - {"failed"}:
+            return "pending"
+        return "failed" if statuses else "done"
@@ -0,0 +1,16 @@
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from app.models import PendingRemoval
+
+
+class PendingRemovalDAO:
+    def __init__(self):
+        pass
+    
+    def read_batch(self, db: Session, limit: int) -> list[PendingRemoval]:
+        stmt = select(PendingRemoval).order_by(PendingRemoval.id).limit(limit)
+        return list(db.execute(stmt).scalars().all())
+
+    def delete_batch(self, db: Session, ids: list[int]):
+        db.execute(delete(PendingRemoval).where(PendingRemoval.id.in_(ids)))
+        db.commit()
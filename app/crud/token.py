@@ -0,0 +1,71 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from app.models import Token
+from app.cache import LRUCache
+
+
+class TokenInfo(NamedTuple):
+    user_id: int
+    expires_at: datetime
+
+# Tokens are random, a plain hash is enough to keep them out of the database
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class TokenDAO:
+    def __init__(self, cache: LRUCache | None = None):
+        self.cache = cache
+
+    # Returns the token itself, it can't be recovered afterwards
+    def create_token(self, db: Session, user_id: int, ttl: timedelta) -> tuple[str, datetime]:
+        token = secrets.token_urlsafe(32)
+        expires_at = datetime.now(timezone.utc) + ttl
+        db.add(Token(hash=token_hash(token), user_id=user_id, expires_at=expires_at))
+        db.commit()
+        return token, expires_at
+
+    # Only the cache is looked up, None when the token isn't known to it
+    def read_cached_token(self, token: str) -> TokenInfo | None:
+        if self.cache is None:
+            return None
+        info = self.cache.get(token_hash(token))
+        if info is None or info.expires_at <= datetime.now(timezone.utc):
+            return None
+        return info
+
+    def read_token(self, db: Session, token: str) -> TokenInfo | None:
+        info = self.read_cached_token(token)
+        if info is not None:
+            return info
+        
+        key = token_hash(token)
+        generation = self.cache.generation if self.cache is not None else None
+        stmt = select(Token.user_id, Token.expires_at).where(Token.hash == key, Token.expires_at > datetime.now(timezone.utc))
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+        info = TokenInfo(row.user_id, as_utc(row.expires_at))
+        if self.cache is not None:
+            self.cache.set(key, info, generation)
+        return info
+
+    def delete_token(self, db: Session, token: str) -> bool:
+        key = token_hash(token)
+        result = db.execute(delete(Token).where(Token.hash == key))
+        db.commit()
+        if self.cache is not None:
+            self.cache.invalidate([key])
+        return result.rowcount > 0
+
+    def prune_expired(self, db: Session) -> int:
+        result = db.execute(delete(Token).where(Token.expires_at <= datetime.now(timezone.utc)))
+        db.commit()
+        return result.rowcount
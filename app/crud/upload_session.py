@@ -0,0 +1,42 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import UploadSession, UploadChunk
+from app.schemas import UploadSessionCreate
+
+
+class UploadSessionDAO:
+    def __init__(self):
+        pass
+    
+    def create_session(self, db: Session, new_session: UploadSessionCreate) -> UploadSession:
+        model_session = UploadSession(
+            name=new_session.name,
+            parent_id=new_session.parent_id,
+            size=new_session.size,
+            chunk_size=new_session.chunk_size,
+        )
+        db.add(model_session)
+        db.commit()
+        db.refresh(model_session)
+        return model_session
+
+    def read_session(self, db: Session, id: str) -> UploadSession | None:
+        return db.get(UploadSession, id)
+
+    def received_chunks(self, db: Session, id: str) -> list[int]:
+        stmt = select(UploadChunk.index).where(UploadChunk.session_id == id).order_by(UploadChunk.index)
+        return list(db.execute(stmt).scalars().all())
+
+    # Idempotent, a chunk may be sent again after a dropped connection
+    def record_chunk(self, db: Session, id: str, index: int, size: int):
+        db.merge(UploadChunk(session_id=id, index=index, size=size))
+        db.commit()
+
+    def delete_session(self, db: Session, id: str) -> UploadSession | None:
+        upload_session = db.get(UploadSession, id)
+        if upload_session is None:
+            return None
+        
+        db.delete(upload_session)
+        db.commit()
+        return upload_session
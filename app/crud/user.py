@@ -20,6 +20,10 @@ def read_user(db: Session, id: int) -> User | None:
         return None
     return result[0]
 
+def read_user_by_username(db: Session, username: str) -> User | None:
+    stmt = select(User).where(User.username == username)
+    return db.execute(stmt).scalars().first()
+
 def create_user(db: Session, username: str, hashed_password: str) -> User | None:
     new_user = User(username=username, password=hashed_password)
     db.add(new_user)
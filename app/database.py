@@ -1,8 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.config import settings
 
-DATABASE_URL = "sqlite:///./cloud.db"
+DATABASE_URL = settings.database_url
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def is_memory_database(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run while a write is in progress
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow, pool_pre_ping=True)
+    
+    connect_args = {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}
+    # An in-memory database only lives as long as its connection, keep the default pool
+    if is_memory_database(url):
+        return create_engine(url, connect_args=connect_args)
+    
+    db_engine = create_engine(url, connect_args=connect_args, pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    event.listen(db_engine, "connect", set_sqlite_pragmas)
+    return db_engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
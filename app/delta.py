@@ -0,0 +1,179 @@
+import hashlib
+import io
+import struct
+import zlib
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator
+import anyio
+
+# rsync style delta transfer. The server publishes a signature per block of the
+# current content, a weak Adler-32 checksum the client can roll over its new
+# version byte by byte, and a strong hash confirming a match. The client then
+# sends a delta: copies of ranges of the current content and literal data.
+#
+# Delta format, big endian: the magic, then instructions until the end of the body
+#   b"C" offset:u64 length:u32   copy length bytes of the current content from offset
+#   b"D" length:u32 data         literal data
+MAGIC = b"DLT1"
+COPY = b"C"
+DATA = b"D"
+COPY_HEADER = struct.Struct(">QI")
+DATA_HEADER = struct.Struct(">I")
+# Bounds a single instruction, longer runs are split
+MAX_INSTRUCTION_LENGTH = 64 * 1024 * 1024
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+ADLER_MOD = 65521
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def weak_checksum(block: bytes) -> int:
+    return zlib.adler32(block)
+
+def strong_hash(block: bytes) -> str:
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+def block_signatures(f: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[tuple[int, str]]:
+    while block := f.read(block_size):
+        yield weak_checksum(block), strong_hash(block)
+
+
+def read_exactly(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise DeltaError("Truncated delta")
+    return data
+
+# Yields the new content, reading the delta and the current content as it goes
+def apply_delta(delta: BinaryIO, base: BinaryIO, base_size: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    if delta.read(len(MAGIC)) != MAGIC:
+        raise DeltaError("Not a delta")
+    while opcode := delta.read(1):
+        if opcode == COPY:
+            offset, length = COPY_HEADER.unpack(read_exactly(delta, COPY_HEADER.size))
+            if length > MAX_INSTRUCTION_LENGTH or offset + length > base_size:
+                raise DeltaError(f"Copy of {length} bytes at {offset} is out of range")
+            base.seek(offset)
+            while length:
+                chunk = base.read(min(length, chunk_size))
+                if not chunk:
+                    raise DeltaError("The current content ended early")
+                length -= len(chunk)
+                yield chunk
+        elif opcode == DATA:
+            (length,) = DATA_HEADER.unpack(read_exactly(delta, DATA_HEADER.size))
+            if length > MAX_INSTRUCTION_LENGTH:
+                raise DeltaError(f"Literal of {length} bytes is too long")
+            while length:
+                chunk = read_exactly(delta, min(length, chunk_size))
+                length -= len(chunk)
+                yield chunk
+        else:
+            raise DeltaError(f"Unknown instruction {opcode!r}")
+
+
+# Reference encoder, it keeps the new content in memory. Adjacent copies are merged.
+def encode_delta(new: bytes, signatures: Iterable[tuple[int, str]], block_size: int) -> Iterator[bytes]:
+    blocks: dict[int, dict[str, int]] = {}
+    for index, (weak, strong) in enumerate(signatures):
+        blocks.setdefault(weak, {}).setdefault(strong, index)
+
+    yield MAGIC
+    literal_start = 0
+    copy = None
+    def flush_copy():
+        if copy is not None:
+            yield COPY + COPY_HEADER.pack(*copy)
+    def flush_literal(end: int):
+        for start in range(literal_start, end, MAX_INSTRUCTION_LENGTH):
+            data = new[start:min(end, start + MAX_INSTRUCTION_LENGTH)]
+            yield DATA + DATA_HEADER.pack(len(data)) + data
+
+    position = 0
+    a = b = None
+    while position + block_size <= len(new):
+        if a is None:
+            checksum = weak_checksum(new[position:position + block_size])
+            a, b = checksum & 0xffff, checksum >> 16
+        match = blocks.get((b << 16) | a)
+        index = match.get(strong_hash(new[position:position + block_size])) if match else None
+        if index is not None:
+            if position > literal_start:
+                yield from flush_copy()
+                copy = None
+                yield from flush_literal(position)
+            offset = index * block_size
+            if copy is not None and copy[0] + copy[1] == offset and copy[1] + block_size <= MAX_INSTRUCTION_LENGTH:
+                copy = (copy[0], copy[1] + block_size)
+            else:
+                yield from flush_copy()
+                copy = (offset, block_size)
+            position += block_size
+            literal_start = position
+            a = None
+            continue
+        # Roll the window one byte forward
+        if position + block_size < len(new):
+            out, inp = new[position], new[position + block_size]
+            a = (a - out + inp) % ADLER_MOD
+            b = (b - block_size * out + a - 1) % ADLER_MOD
+        position += 1
+    yield from flush_copy()
+    yield from flush_literal(len(new))
+
+
+# File-like view of an iterator of byte chunks. Unread data is kept in a
+# buffer read from an offset, it is compacted once half of it was consumed,
+# so small reads don't copy what remains of a large chunk.
+class IterReader(io.RawIOBase):
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) - self.offset < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        end = len(self.buffer) if size < 0 else min(self.offset + size, len(self.buffer))
+        data = bytes(self.buffer[self.offset:end])
+        self.offset = end
+        if self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        return data
+
+
+# File-like view of an async stream for a worker thread started by anyio, such as
+# the request body, so a large delta is never buffered whole
+class ThreadStreamReader(io.RawIOBase):
+    def __init__(self, stream: AsyncIterator[bytes]):
+        self.stream = stream
+        self.reader = IterReader(self.pull())
+
+    async def next_chunk(self) -> bytes | None:
+        try:
+            return await self.stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def pull(self) -> Iterator[bytes]:
+        while (chunk := anyio.from_thread.run(self.next_chunk)) is not None:
+            yield chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self.reader.read(size)
@@ -1,6 +1,22 @@
+import anyio
+from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from app.cache import item_cache, token_cache
+from app.notifier import change_notifier
+from app.config import settings
 from app.database import SessionLocal
 from app.crud.item import ItemDAO
-from app.uploads_manager import UploadsManager
+from app.crud.upload_session import UploadSessionDAO
+from app.crud.job import JobDAO
+from app.crud.change import ChangeDAO
+from app.crud.token import TokenDAO
+from app.security import password_hasher
+from app.uploads_manager import UploadsManager, AsyncUploadsManager
+from app.reclaimer import reclaimer
+from app.pipeline import pipeline
+
+io_limiter = anyio.CapacityLimiter(settings.io_concurrency)
 
 def get_db():
     db = SessionLocal()
@@ -10,7 +26,59 @@ def get_db():
         db.close()
 
 def get_item_dao():
-    return ItemDAO()
+    return ItemDAO(cache=item_cache, notifier=change_notifier)
+
+def get_item_cache():
+    return item_cache
+
+def get_upload_session_dao():
+    return UploadSessionDAO()
+
+def get_job_dao():
+    return JobDAO()
+
+def get_change_dao():
+    return ChangeDAO()
+
+def get_change_notifier():
+    return change_notifier
 
 def get_uploads_manager():
-    return UploadsManager()
\ No newline at end of file
+    return UploadsManager(content_addressed=settings.content_addressed, compress=settings.compress_at_rest, layout=settings.uploads_layout)
+
+def get_async_uploads_manager():
+    return AsyncUploadsManager(get_uploads_manager(), io_limiter)
+
+def get_reclaimer():
+    return reclaimer
+
+def get_pipeline():
+    return pipeline
+
+def get_token_dao():
+    return TokenDAO(cache=token_cache)
+
+def get_password_hasher():
+    return password_hasher
+
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+def read_token(token_dao: TokenDAO, token: str):
+    with SessionLocal() as db:
+        return token_dao.read_token(db, token)
+
+# Id of the user owning the bearer token. A cached token costs a dict lookup,
+# the others are checked against the database in the thread pool.
+async def get_current_user_id(token: str | None = Depends(oauth2_scheme), token_dao: TokenDAO = Depends(get_token_dao)) -> int:
+    info = None
+    if token is not None:
+        info = token_dao.read_cached_token(token) or await run_in_threadpool(read_token, token_dao, token)
+    if info is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return info.user_id
+
+# In front of the routers serving items, a no-op unless auth is required
+async def require_auth(token: str | None = Depends(oauth2_scheme), token_dao: TokenDAO = Depends(get_token_dao)):
+    if settings.auth_required:
+        await get_current_user_id(token, token_dao)
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from app.compression import GZIP, accepts_gzip, iter_decompressed
+from app.models import Item
+
+
+class ItemFileResponse(FileResponse):
+    # Starlette announces multipart range bodies in Content-Range instead of Content-Type
+    async def _handle_multiple_ranges(self, send, ranges, file_size, send_header_only):
+        async def fixed_send(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    (b"content-type", value) if key == b"content-range" else (key, value)
+                    for key, value in message["headers"]
+                    if key != b"content-type"
+                ]
+            await send(message)
+
+        await super()._handle_multiple_ranges(fixed_send, ranges, file_size, send_header_only)
+
+
+# The gzipped representation is a different entity and gets its own validator
+def item_etag(item: Item, encoding: str | None = None) -> str:
+    # Strong validator derived from the stored metadata, no disk access needed
+    base = f"{item.id}:{item.size}:{item.updated_at.isoformat() if item.updated_at else ''}"
+    suffix = f"-{encoding}" if encoding is not None else ""
+    return f'"{hashlib.sha256(base.encode()).hexdigest()[:32]}{suffix}"'
+
+def item_last_modified(item: Item) -> datetime | None:
+    if item.updated_at is None:
+        return None
+    # SQLite drops the timezone, stored dates are always UTC
+    if item.updated_at.tzinfo is None:
+        return item.updated_at.replace(tzinfo=timezone.utc)
+    return item.updated_at
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates only have a one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def build_file_response(request: Request, item: Item, path: str) -> Response:
+    # Gzipped files are sent untouched to clients that accept it, decompressed otherwise
+    compressed = item.encoding == GZIP
+    passthrough = compressed and accepts_gzip(request.headers.get("accept-encoding"))
+    etag = item_etag(item, GZIP if passthrough else None)
+    last_modified = item_last_modified(item)
+    headers = {"etag": etag, "cache-control": "no-cache"}
+    if last_modified is not None:
+        headers["last-modified"] = formatdate(last_modified.timestamp(), usegmt=True)
+    if compressed:
+        headers["vary"] = "Accept-Encoding"
+
+    if request.method in ("GET", "HEAD") and is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    if passthrough:
+        # Ranges then apply to the gzipped bytes, as for any content coding
+        headers["content-encoding"] = GZIP
+    elif compressed:
+        # Offsets into the original content cannot be served without decompressing from the start
+        headers["accept-ranges"] = "none"
+        headers["content-length"] = str(item.size)
+        headers["content-disposition"] = content_disposition(item.name)
+        body = iter_decompressed(path) if request.method != "HEAD" else iter(())
+        return StreamingResponse(body, media_type=item.mimetype, headers=headers)
+
+    # FileResponse handles Range, multipart ranges and If-Range against these validators
+    return ItemFileResponse(path=path, filename=item.name, media_type=item.mimetype, headers=headers)
@@ -1,7 +1,41 @@
-from fastapi import FastAPI
-from app.api import root, items
+import threading
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from app.api import root, auth, items, uploads, changes
+from app.dependencies import require_auth
+from app.database import engine
+from app.config import settings
+from app.metrics import MetricsMiddleware, instrument_engine
+from app import profiler
+from app.reclaimer import reclaimer
+from app.pipeline import pipeline
+from app.security import password_hasher
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume any reclamation interrupted by a restart
+    threading.Thread(target=reclaimer.reclaim_in_background, daemon=True).start()
+    # Also picks up the jobs queued before a restart
+    pipeline.start()
+    yield
+    pipeline.stop(timeout=5)
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+if settings.sql_profiling:
+    app.add_middleware(
+        profiler.ProfilerMiddleware,
+        slow_query_ms=settings.slow_query_ms,
+        n_plus_one_threshold=settings.n_plus_one_threshold,
+        add_header=settings.debug,
+    )
+    profiler.instrument_engine(engine)
 
 app.include_router(root.router)
-app.include_router(items.router)
+app.include_router(auth.router)
+# Only checks a token with LOCAL_CLOUD_AUTH_REQUIRED set
+app.include_router(items.router, dependencies=[Depends(require_auth)])
+app.include_router(uploads.router, dependencies=[Depends(require_auth)])
+app.include_router(changes.router, dependencies=[Depends(require_auth)])
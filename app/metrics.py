@@ -0,0 +1,197 @@
+import bisect
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from cache hits to large transfers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Label values are passed as a tuple in the order of the label names. Updates
+# only take a lock and touch a dict, they are cheap enough for every request.
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}" for labels, value in values]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label values: the count of each bucket (not cumulative, the last one
+        # is +Inf) and the sum of the observations
+        self.values: dict[tuple, tuple[list[int], list[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            values = [(labels, list(counts), total[0]) for labels, (counts, total) in self.values.items()]
+        lines = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    # Prometheus text exposition format
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time until the response body was sent", ("method", "route", "status"),
+)
+http_request_bytes = registry.counter("http_request_bytes_total", "Request body bytes received", ("method", "route"))
+http_response_bytes = registry.counter("http_response_bytes_total", "Response body bytes sent", ("method", "route"))
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ("operation",), QUERY_BUCKETS,
+)
+db_query_errors = registry.counter("db_query_errors_total", "SQL statements that raised", ("operation",))
+storage_bytes_written = registry.counter("storage_bytes_written_total", "Bytes written to the uploads directory, after compression", ("kind",))
+blob_operations = registry.counter("blob_operations_total", "Content addressed blobs placed and removed", ("operation",))
+
+
+# Route templates keep the label cardinality bounded, /uploads/{id} and not every id
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+# Plain ASGI middleware, BaseHTTPMiddleware would buffer streaming responses
+# through an extra task per request
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        received = 0
+        sent = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            method = scope["method"]
+            route = route_label(scope)
+            http_request_duration.observe(time.perf_counter() - start, (method, route, str(status)))
+            if received:
+                http_request_bytes.inc((method, route), received)
+            if sent:
+                http_response_bytes.inc((method, route), sent)
+
+
+def statement_operation(statement: str) -> str:
+    keyword = statement.lstrip()[:8].split(None, 1)
+    return keyword[0].upper() if keyword else "OTHER"
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["metrics_query_start"].pop()
+    db_query_duration.observe(time.perf_counter() - start, (statement_operation(statement),))
+
+def handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_query_start"):
+        conn.info["metrics_query_start"].pop()
+    db_query_errors.inc((statement_operation(exception_context.statement or ""),))
+
+def instrument_engine(engine: Engine):
+    if event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
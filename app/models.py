@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from app.database import Base
 from datetime import datetime, timezone
@@ -12,6 +12,15 @@ class User(Base):
     username: Mapped[str] = mapped_column(unique=True, index=True)
     password: Mapped[str]
 
+# Bearer tokens handed out at login, only their SHA-256 is stored
+class Token(Base):
+    __tablename__ = "tokens"
+    
+    hash: Mapped[str] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
 class Item(Base):
     __tablename__ = "items"
     
@@ -21,12 +30,123 @@ class Item(Base):
     parent_id: Mapped[Optional[str]] = mapped_column(ForeignKey("items.id", ondelete="CASCADE"), nullable=True,)
         
     path: Mapped[str] = mapped_column(unique=True)
-    size: Mapped[Optional[int]] # NULL for directories
+    size: Mapped[Optional[int]] # Total size of the subtree for directories
+    file_count: Mapped[Optional[int]] # Files in the subtree, NULL for files
     mimetype: Mapped[Optional[str]] # NULL for directories
+    blob_hash: Mapped[Optional[str]] = mapped_column(ForeignKey("blobs.hash"), index=True) # NULL unless content addressed
+    encoding: Mapped[Optional[str]] # Content coding of the stored bytes, NULL when stored raw
+    content_hash: Mapped[Optional[str]] # SHA-256 of the content, filled in by the processing pipeline
+    preview: Mapped[Optional[str]] # Beginning of text files
+    processing_status: Mapped[Optional[str]] # pending, done or failed, NULL when never processed
     
-    created_at: Mapped[Optional[datetime]] = mapped_column(default=datetime.now(timezone.utc))
-    updated_at: Mapped[Optional[datetime]] = mapped_column(default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     parent: Mapped[Optional["Item"]] = relationship(back_populates="children", remote_side=[id])
     children: Mapped[list["Item"]] = relationship(back_populates="parent", cascade="all, delete-orphan")
-    
\ No newline at end of file
+    
+    # Serves children listings, the subtree CTE and sibling lookups by name.
+    # Ancestors and descendants are resolved through the unique path index.
+    __table_args__ = (
+        Index("ix_items_parent_id_name", "parent_id", "name"),
+        Index("ix_items_is_dir_size", "is_dir", "size"),
+    )
+
+# Trigram index over names and paths for substring search, kept in sync by triggers.
+# It refers to items by rowid, which a VACUUM may renumber, so it must be rebuilt
+# afterwards with INSERT INTO items_fts(items_fts) VALUES('rebuild').
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE items_fts USING fts5(name, path, content='items', tokenize='trigram')",
+    """CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, name, path) VALUES (new.rowid, new.name, new.path);
+    END""",
+    """CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, path) VALUES ('delete', old.rowid, old.name, old.path);
+    END""",
+    """CREATE TRIGGER items_fts_update AFTER UPDATE OF name, path ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, path) VALUES ('delete', old.rowid, old.name, old.path);
+        INSERT INTO items_fts(rowid, name, path) VALUES (new.rowid, new.name, new.path);
+    END""",
+]
+for statement in SEARCH_INDEX_DDL:
+    event.listen(Item.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Item.__table__, "before_drop", DDL("DROP TABLE IF EXISTS items_fts").execute_if(dialect="sqlite"))
+    
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    hash: Mapped[str] = mapped_column(primary_key=True)
+    size: Mapped[int]
+    ref_count: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc))
+
+# Files of deleted items waiting for the background reclaimer
+class PendingRemoval(Base):
+    __tablename__ = "pending_removals"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    item_id: Mapped[str]
+    created_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc))
+
+# Post-upload processing of one item by one processor. Finished jobs are
+# deleted, failed ones are kept for inspection.
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    item_id: Mapped[str] = mapped_column(index=True)
+    processor: Mapped[str]
+    status: Mapped[str] = mapped_column(default="pending") # pending, running or failed
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[Optional[str]]
+    run_after: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    claimed_at: Mapped[Optional[datetime]]
+    created_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+# Append-only journal of item changes, written in the transaction of the change.
+# Ids only grow, AUTOINCREMENT never hands out the id of a pruned entry again.
+# A moved or deleted directory is a single entry, its descendants are implied.
+class Change(Base):
+    __tablename__ = "changes"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    item_id: Mapped[str]
+    action: Mapped[str] # created, updated, moved or deleted
+    is_dir: Mapped[bool]
+    path: Mapped[str]
+    old_path: Mapped[Optional[str]] # Path before a move
+    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc), index=True)
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id: Mapped[str] = mapped_column(primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    name: Mapped[str]
+    parent_id: Mapped[Optional[str]]
+    size: Mapped[int]
+    chunk_size: Mapped[int]
+    created_at: Mapped[Optional[datetime]] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    
+    chunks: Mapped[list["UploadChunk"]] = relationship(back_populates="session", cascade="all, delete-orphan")
+    
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+    
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+    
+    session_id: Mapped[str] = mapped_column(ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    index: Mapped[int] = mapped_column(primary_key=True)
+    size: Mapped[int]
+    
+    session: Mapped["UploadSession"] = relationship(back_populates="chunks")
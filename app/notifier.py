@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# Wakes the long-polling requests of this process once changes are committed.
+# Commits happen on worker threads, waiters are woken through their own loop.
+class ChangeNotifier:
+    def __init__(self):
+        self.waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.lock = threading.Lock()
+
+    # Subscribe before reading the journal, a commit in between still wakes the waiter
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Event]:
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            self.waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+    def notify(self):
+        with self.lock:
+            waiters = list(self.waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop was closed meanwhile
+                pass
+
+
+change_notifier = ChangeNotifier()
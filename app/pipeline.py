@@ -0,0 +1,124 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from sqlalchemy.orm import Session
+from app.cache import item_cache
+from app.config import settings
+from app.crud.item import ItemDAO
+from app.crud.job import JobDAO
+from app.database import SessionLocal
+from app.processors import PROCESSORS, Processor
+from app.uploads_manager import UploadsManager
+
+logger = logging.getLogger(__name__)
+
+
+# Runs the processors over freshly uploaded files on a pool of worker threads.
+# Jobs live in the database: they survive restarts, are shared by every
+# process and are retried with an exponential backoff.
+class JobPipeline:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        u_manager_factory: Callable[[], UploadsManager] = UploadsManager,
+        item_dao: ItemDAO | None = None,
+        processors: dict[str, Processor] = PROCESSORS,
+        workers: int = 2,
+        max_attempts: int = 5,
+        lease: timedelta = timedelta(minutes=10),
+        poll_interval: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.u_manager_factory = u_manager_factory
+        self.item_dao = item_dao or ItemDAO()
+        self.job_dao = JobDAO()
+        self.processors = processors
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads: list[threading.Thread] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    # Queues every processor for the given file items
+    def enqueue(self, db: Session, item_ids: list[str]):
+        if not self.enabled or not item_ids:
+            return
+        self.job_dao.enqueue(db, item_ids, list(self.processors))
+        self.item_dao.set_processing_status(db, item_ids, "pending")
+        db.commit()
+        self.wakeup.set()
+
+    def retry_at(self, attempts: int) -> datetime | None:
+        if attempts >= self.max_attempts:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=2 ** attempts)
+
+    # Claims and runs a single job, returns False when none is runnable
+    def run_once(self, db: Session, u_manager: UploadsManager) -> bool:
+        job = self.job_dao.claim(db, self.lease)
+        if job is None:
+            return False
+
+        item = self.item_dao.read_item_metadata(db, job.item_id)
+        if item is None:
+            # Deleted meanwhile
+            self.job_dao.complete(db, job.id)
+            db.commit()
+            return True
+
+        try:
+            values = self.processors[job.processor](item, lambda: u_manager.open_item(item))
+            self.job_dao.complete(db, job.id)
+        except Exception as e:
+            logger.warning("Processor %s failed on item %s: %s", job.processor, job.item_id, e)
+            values = {}
+            self.job_dao.fail(db, job.id, f"{type(e).__name__}: {e}", self.retry_at(job.attempts))
+
+        # The job and the item are updated in the same transaction
+        status = self.job_dao.item_status(db, job.item_id)
+        self.item_dao.update_processing_result(db, job.item_id, values, status)
+        return True
+
+    def work(self):
+        u_manager = self.u_manager_factory()
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                with self.session_factory() as db:
+                    while not self.stopping.is_set() and self.run_once(db, u_manager):
+                        pass
+            except Exception:
+                logger.exception("Processing uploads failed")
+            # Retries become due and other processes queue jobs without waking us
+            self.wakeup.wait(self.poll_interval)
+
+    def start(self):
+        if not self.enabled or self.threads:
+            return
+        self.stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+
+pipeline = JobPipeline(
+    item_dao=ItemDAO(cache=item_cache),
+    u_manager_factory=lambda: UploadsManager(layout=settings.uploads_layout),
+    workers=settings.job_workers,
+    max_attempts=settings.job_max_attempts,
+)
@@ -0,0 +1,104 @@
+import codecs
+import hashlib
+from typing import BinaryIO, Callable
+
+CHUNK_SIZE = 1024 * 1024
+SNIFF_SIZE = 512
+PREVIEW_READ_SIZE = 4096
+PREVIEW_LENGTH = 500
+
+# A processor reads the content of an item and returns the item columns it derived
+Processor = Callable[[object, Callable[[], BinaryIO]], dict]
+
+PROCESSORS: dict[str, Processor] = {}
+
+def processor(name: str):
+    def register(func: Processor) -> Processor:
+        PROCESSORS[name] = func
+        return func
+    return register
+
+
+@processor("sha256")
+def content_hash(item, open_content: Callable[[], BinaryIO]) -> dict:
+    # Content addressed items are already named after their SHA-256
+    if item.blob_hash is not None:
+        return {"content_hash": item.blob_hash}
+    digest = hashlib.sha256()
+    with open_content() as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return {"content_hash": digest.hexdigest()}
+
+
+# Leading bytes of common formats, checked in order
+SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"\x28\xb5\x2f\xfd", "application/zstd"),
+    (0, b"OggS", "application/ogg"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"\x7fELF", "application/x-executable"),
+    (0, b"SQLite format 3\x00", "application/vnd.sqlite3"),
+    (0, b"%!PS", "application/postscript"),
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (257, b"ustar", "application/x-tar"),
+]
+
+def sniff_mimetype(head: bytes) -> str | None:
+    for offset, signature, mimetype in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mimetype
+    # RIFF containers name their format at offset 8
+    if head[:4] == b"RIFF":
+        return {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}.get(head[8:12])
+    return None
+
+def decode_text(head: bytes) -> str | None:
+    if b"\x00" in head:
+        return None
+    try:
+        # A multibyte character cut at the end of the sample is not an error
+        return codecs.getincrementaldecoder("utf-8")().decode(head)
+    except UnicodeDecodeError:
+        return None
+
+
+@processor("mimetype")
+def magic_mimetype(item, open_content: Callable[[], BinaryIO]) -> dict:
+    with open_content() as f:
+        head = f.read(SNIFF_SIZE)
+    sniffed = sniff_mimetype(head)
+    if sniffed is None:
+        # Unknown extensions holding plain text
+        if item.mimetype is None and head and decode_text(head) is not None:
+            return {"mimetype": "text/plain"}
+        return {}
+    # Office documents, jars and epubs are zip files, their extension is more precise
+    if sniffed == "application/zip" and item.mimetype is not None:
+        return {}
+    if sniffed != item.mimetype:
+        return {"mimetype": sniffed}
+    return {}
+
+
+@processor("preview")
+def text_preview(item, open_content: Callable[[], BinaryIO]) -> dict:
+    with open_content() as f:
+        head = f.read(PREVIEW_READ_SIZE)
+    if sniff_mimetype(head) is not None:
+        return {}
+    text = decode_text(head)
+    if not text:
+        return {}
+    return {"preview": text[:PREVIEW_LENGTH]}
@@ -0,0 +1,102 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_PARAMETERS = 500
+
+# Expanded IN lists of any length share one shape
+IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    return IN_LIST.sub("(?)", WHITESPACE.sub(" ", statement).strip())
+
+
+# Statements executed on behalf of one request
+class QueryProfile:
+    def __init__(self, slow_query_ms: float, n_plus_one_threshold: int):
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, parameters, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+        if seconds * 1000 >= self.slow_query_ms:
+            logger.warning("Slow query (%.1f ms): %s; parameters: %.*s", seconds * 1000, statement, MAX_LOGGED_PARAMETERS, repr(parameters))
+
+    # Identical statements run over and over are most likely issued from a loop
+    def repeated_shapes(self) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= self.n_plus_one_threshold]
+
+
+# Set for the duration of a profiled request, the thread pool running sync
+# endpoints and dependencies copies it along with the rest of the context
+current_profile: ContextVar[QueryProfile | None] = ContextVar("current_profile", default=None)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None and conn.info.get("profile_query_start"):
+        start = conn.info["profile_query_start"].pop()
+        profile.record(statement, parameters, time.perf_counter() - start)
+
+def handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("profile_query_start"):
+        conn.info["profile_query_start"].pop()
+
+def instrument_engine(engine: Engine):
+    if event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+# Profiles the SQL of every request, logs a summary and the likely N+1 patterns.
+# With add_header the query count so far is sent in X-Query-Count; statements
+# run while a streaming body is sent come after the headers and are only logged.
+class ProfilerMiddleware:
+    def __init__(self, app, slow_query_ms: float = 100, n_plus_one_threshold: int = 10, add_header: bool = False):
+        self.app = app
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.add_header = add_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(self.slow_query_ms, self.n_plus_one_threshold)
+        token = current_profile.set(profile)
+
+        async def profiled_send(message):
+            if self.add_header and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(profile.count).encode()))
+                headers.append((b"x-query-time-ms", f"{profile.seconds * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            current_profile.reset(token)
+            request = f"{scope['method']} {scope['path']}"
+            logger.debug("%s: %d queries in %.1f ms", request, profile.count, profile.seconds * 1000)
+            for shape, count in profile.repeated_shapes():
+                logger.warning("Possible N+1 in %s, %d executions of: %s", request, count, shape)
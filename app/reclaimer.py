@@ -0,0 +1,74 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from sqlalchemy.orm import Session
+from app.crud.blob import BlobDAO
+from app.crud.pending_removal import PendingRemovalDAO
+from app.crud.change import ChangeDAO
+from app.config import settings
+from app.database import SessionLocal
+from app.uploads_manager import UploadsManager
+
+logger = logging.getLogger(__name__)
+
+
+# Removes the files of deleted items in batches, outside of the request.
+# The queue lives in the database and every step is idempotent, so an
+# interrupted run is simply picked up again by the next one. Change journal
+# entries older than the retention are pruned along the way.
+class Reclaimer:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, u_manager_factory: Callable[[], UploadsManager] = UploadsManager, batch_size: int = 500, change_retention: timedelta | None = None):
+        self.session_factory = session_factory
+        self.u_manager_factory = u_manager_factory
+        self.batch_size = batch_size
+        self.change_retention = change_retention
+        self.removal_dao = PendingRemovalDAO()
+        self.blob_dao = BlobDAO()
+        self.change_dao = ChangeDAO()
+        self.lock = threading.Lock()
+        self.pending = threading.Event()
+
+    def reclaim_batch(self, db: Session, u_manager: UploadsManager) -> int:
+        removals = self.removal_dao.read_batch(db, self.batch_size)
+        for removal in removals:
+            try:
+                u_manager.remove_file(removal.item_id)
+            except FileNotFoundError:
+                pass
+        self.removal_dao.delete_batch(db, [removal.id for removal in removals])
+        
+        blobs = self.blob_dao.collect(db, u_manager.remove_blob, self.batch_size)
+        return len(removals) + len(blobs)
+
+    # Only one run per process, a request arriving meanwhile makes it loop once more.
+    # A request arriving between the last check and the release of the lock
+    # fails to acquire it, the pending flag is checked again once released.
+    def reclaim(self) -> int:
+        self.pending.set()
+        reclaimed = 0
+        while self.pending.is_set() and self.lock.acquire(blocking=False):
+            try:
+                u_manager = self.u_manager_factory()
+                while self.pending.is_set():
+                    self.pending.clear()
+                    with self.session_factory() as db:
+                        while count := self.reclaim_batch(db, u_manager):
+                            reclaimed += count
+                        if self.change_retention is not None:
+                            self.change_dao.prune(db, datetime.now(timezone.utc) - self.change_retention)
+            finally:
+                self.lock.release()
+        return reclaimed
+
+    def reclaim_in_background(self):
+        try:
+            self.reclaim()
+        except Exception:
+            logger.exception("Reclaiming deleted files failed")
+
+
+reclaimer = Reclaimer(
+    u_manager_factory=lambda: UploadsManager(layout=settings.uploads_layout),
+    change_retention=timedelta(days=settings.change_retention_days),
+)
@@ -0,0 +1,100 @@
+import argparse
+import logging
+import os
+from typing import Iterator
+from app.config import settings
+from app.uploads_manager import UploadsManager, FLAT, SHARDED, LAYOUTS, layout_path
+
+logger = logging.getLogger(__name__)
+
+ROOTS = ("uploads", "uploads/blobs")
+
+
+# Files stored under the layout that is being migrated away from. Hidden
+# entries are temporary files and upload sessions, they are never moved.
+def source_files(root: str, layout: str) -> Iterator[str]:
+    if not os.path.isdir(root):
+        return
+    if layout == FLAT:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    yield entry.name
+        return
+
+    # Shard directories are exactly two characters long at both levels
+    for first in sorted(os.listdir(root)):
+        first_path = f"{root}/{first}"
+        if len(first) != 2 or first.startswith(".") or not os.path.isdir(first_path):
+            continue
+        for second in sorted(os.listdir(first_path)):
+            second_path = f"{first_path}/{second}"
+            if len(second) != 2 or not os.path.isdir(second_path):
+                continue
+            with os.scandir(second_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        yield entry.name
+
+# Links the file at its new path before unlinking the old one, so it is
+# reachable at every instant. A target that already exists was written by
+# the server after the switch and is newer, the old copy is dropped then.
+def move_file(source: str, target: str) -> bool:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        # Deleted by the reclaimer meanwhile
+        return False
+    try:
+        os.remove(source)
+    except FileNotFoundError:
+        pass
+    return True
+
+def remove_empty_shards(root: str):
+    for first in os.listdir(root):
+        first_path = f"{root}/{first}"
+        if len(first) != 2 or not os.path.isdir(first_path):
+            continue
+        for second in os.listdir(first_path):
+            try:
+                os.rmdir(f"{first_path}/{second}")
+            except OSError:
+                pass
+        try:
+            os.rmdir(first_path)
+        except OSError:
+            pass
+
+# Moves every stored file to the layout of the given manager. The server keeps
+# serving meanwhile, reads fall back to the old layout until a file is moved.
+# Each move is idempotent, an interrupted run is completed by running it again.
+def relayout(u_manager: UploadsManager, log_every: int = 10000) -> int:
+    source_layout = u_manager.other_layout
+    moved = 0
+    for root in ROOTS:
+        for name in source_files(root, source_layout):
+            if move_file(layout_path(root, name, source_layout), layout_path(root, name, u_manager.layout)):
+                moved += 1
+                if moved % log_every == 0:
+                    logger.info("Moved %d files", moved)
+        if source_layout == SHARDED and os.path.isdir(root):
+            remove_empty_shards(root)
+    return moved
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Move stored files to another uploads layout")
+    parser.add_argument("--layout", choices=LAYOUTS, default=settings.uploads_layout,
+                        help="Target layout, the configured one by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    moved = relayout(UploadsManager(layout=args.layout))
+    logger.info("Moved %d files to the %s layout", moved, args.layout)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, AfterValidator
 from typing import Optional, Annotated
 from datetime import datetime
 
 
+# A name is the last segment of the path of an item
+def check_item_name(name: str) -> str:
+    if name in ("", ".", "..") or "/" in name:
+        raise ValueError("Name must not be empty, . or .., nor contain /")
+    return name
+
+ItemName = Annotated[str, AfterValidator(check_item_name)]
+
+
 class UserBase(BaseModel):
     id: Annotated[int, Field(description="Unique identifier of the user")]
     username: Annotated[str, Field(description="Unique name of the user")]
@@ -14,14 +23,30 @@ class UserCreate(BaseModel):
     username: Annotated[str, Field(description="Unique name of the user")]
     password: Annotated[str, Field(description="Password of the user")]
 
+class UserPublic(BaseModel):
+    id: Annotated[int, Field(description="Unique identifier of the user")]
+    username: Annotated[str, Field(description="Unique name of the user")]
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class AccessToken(BaseModel):
+    access_token: Annotated[str, Field(description="Bearer token to send in the Authorization header")]
+    token_type: Annotated[str, Field(default="bearer", description="Always bearer")]
+    expires_at: Annotated[datetime, Field(description="Date after which the token is refused")]
+
 class ItemBase(BaseModel):
     id: Annotated[str, Field(description="Unique identifier of the item")]
     name: Annotated[str, Field(description="Name of the item")]
     is_dir: Annotated[bool, Field(description="Wether an item is a directory or not")]
     parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
     path: Annotated[str, Field(description="Item relative path in the uploads folder")]
-    size: Annotated[int | None, Field(default=None, description="File size in bytes")]
+    size: Annotated[int | None, Field(default=None, description="File size in bytes, total size of the subtree for directories")]
+    file_count: Annotated[int | None, Field(default=None, description="Number of files in the subtree of a directory")]
     mimetype: Annotated[str | None, Field(default=None, description="Mimetype of the file")]
+    blob_hash: Annotated[str | None, Field(default=None, description="SHA-256 of the content when stored deduplicated")]
+    content_hash: Annotated[str | None, Field(default=None, description="SHA-256 of the content once processed")]
+    preview: Annotated[str | None, Field(default=None, description="Beginning of the content of text files")]
+    processing_status: Annotated[str | None, Field(default=None, description="Post-upload processing status: pending, done or failed")]
     created_at: Annotated[datetime, Field(description="Creation date of the item")]
     updated_at: Annotated[datetime, Field(description="Update date of the item")]
     
@@ -30,13 +55,103 @@ class ItemBase(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
-class ItemCreate(BaseModel):
+class ItemSummary(BaseModel):
+    id: Annotated[str, Field(description="Unique identifier of the item")]
     name: Annotated[str, Field(description="Name of the item")]
     is_dir: Annotated[bool, Field(description="Wether an item is a directory or not")]
     parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
+    path: Annotated[str, Field(description="Item relative path in the uploads folder")]
+    size: Annotated[int | None, Field(default=None, description="File size in bytes, total size of the subtree for directories")]
+    file_count: Annotated[int | None, Field(default=None, description="Number of files in the subtree of a directory")]
+    mimetype: Annotated[str | None, Field(default=None, description="Mimetype of the file")]
+    blob_hash: Annotated[str | None, Field(default=None, description="SHA-256 of the content when stored deduplicated")]
+    content_hash: Annotated[str | None, Field(default=None, description="SHA-256 of the content once processed")]
+    preview: Annotated[str | None, Field(default=None, description="Beginning of the content of text files")]
+    processing_status: Annotated[str | None, Field(default=None, description="Post-upload processing status: pending, done or failed")]
+    created_at: Annotated[datetime, Field(description="Creation date of the item")]
+    updated_at: Annotated[datetime, Field(description="Update date of the item")]
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class ItemTree(ItemSummary):
+    children: Annotated[Optional[list['ItemTree']], Field(default=None, description="Children of a directory within the requested depth, NULL otherwise")]
+
+class ItemPage(BaseModel):
+    items: Annotated[list[ItemSummary], Field(description="Items of the page")]
+    next_cursor: Annotated[str | None, Field(default=None, description="Cursor of the next page, NULL on the last page")]
+
+class Usage(BaseModel):
+    id: Annotated[str | None, Field(default=None, description="Unique identifier of the item, NULL for the whole storage")]
+    size: Annotated[int, Field(description="Total size in bytes")]
+    file_count: Annotated[int, Field(description="Number of files")]
+    quota: Annotated[int | None, Field(default=None, description="Storage quota in bytes, NULL when unlimited")]
+
+class JobBase(BaseModel):
+    id: Annotated[int, Field(description="Unique identifier of the job")]
+    item_id: Annotated[str, Field(description="Item being processed")]
+    processor: Annotated[str, Field(description="Name of the processor")]
+    status: Annotated[str, Field(description="pending, running or failed")]
+    attempts: Annotated[int, Field(description="Number of runs so far")]
+    last_error: Annotated[str | None, Field(default=None, description="Error of the last failed run")]
+    run_after: Annotated[datetime, Field(description="Earliest date of the next run")]
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class ChangeBase(BaseModel):
+    id: Annotated[int, Field(description="Position of the change in the journal")]
+    item_id: Annotated[str, Field(description="Unique identifier of the changed item")]
+    action: Annotated[str, Field(description="created, updated, moved or deleted. Moving or deleting a directory applies to its whole subtree.")]
+    is_dir: Annotated[bool, Field(description="Wether the item is a directory")]
+    path: Annotated[str, Field(description="Item path after the change")]
+    old_path: Annotated[str | None, Field(default=None, description="Item path before a move")]
+    created_at: Annotated[datetime, Field(description="Date of the change")]
+    item: Annotated[ItemSummary | None, Field(default=None, description="Current state of the item, NULL once deleted")]
+
+class ChangePage(BaseModel):
+    changes: Annotated[list[ChangeBase], Field(description="Changes in the order they were made")]
+    cursor: Annotated[str, Field(description="Cursor to pass as since on the next call")]
+    has_more: Annotated[bool, Field(description="Wether more changes are available right away")]
+
+class DeltaSignatures(BaseModel):
+    id: Annotated[str, Field(description="Unique identifier of the file")]
+    size: Annotated[int, Field(description="Size of the current content in bytes")]
+    etag: Annotated[str, Field(description="ETag of the current content, to send as If-Match with the delta")]
+    block_size: Annotated[int, Field(description="Size of every block but the last one")]
+    weak: Annotated[list[int], Field(description="Adler-32 checksum of every block")]
+    strong: Annotated[list[str], Field(description="BLAKE2b-128 hex digest of every block")]
+
+class CacheStats(BaseModel):
+    enabled: Annotated[bool, Field(description="Wether the item metadata cache is enabled")]
+    size: Annotated[int, Field(default=0, description="Number of cached items")]
+    maxsize: Annotated[int, Field(default=0, description="Maximum number of cached items")]
+    hits: Annotated[int, Field(default=0, description="Lookups answered from the cache")]
+    misses: Annotated[int, Field(default=0, description="Lookups that went to the database")]
+
+class ItemCreate(BaseModel):
+    name: Annotated[ItemName, Field(description="Name of the item")]
+    is_dir: Annotated[bool, Field(description="Wether an item is a directory or not")]
+    parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
     size: Annotated[int | None, Field(default=None, description="File size in bytes")]
 
 class ItemUpdate(BaseModel):
     id: Annotated[str, Field(description="Unique identifier of the item")]
-    name: Annotated[str | None, Field(default=None, description="Name of the item")]
+    name: Annotated[ItemName | None, Field(default=None, description="Name of the item")]
+    parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
+
+class UploadSessionCreate(BaseModel):
+    name: Annotated[ItemName, Field(description="Name of the file being uploaded")]
     parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
+    size: Annotated[int, Field(ge=0, description="Total file size in bytes")]
+    chunk_size: Annotated[int, Field(default=8 * 1024 * 1024, gt=0, le=64 * 1024 * 1024, description="Size of every chunk but the last one")]
+
+class UploadSessionBase(BaseModel):
+    id: Annotated[str, Field(description="Unique identifier of the upload session")]
+    name: Annotated[str, Field(description="Name of the file being uploaded")]
+    parent_id: Annotated[str | None, Field(default=None, description="Unique identifier of the parent item")]
+    size: Annotated[int, Field(description="Total file size in bytes")]
+    chunk_size: Annotated[int, Field(description="Size of every chunk but the last one")]
+    chunk_count: Annotated[int, Field(description="Number of chunks that make up the file")]
+    received_chunks: Annotated[list[int], Field(default=[], description="Indexes of the chunks already persisted")]
+    created_at: Annotated[datetime, Field(description="Creation date of the session")]
+    
+    model_config = ConfigDict(from_attributes=True)
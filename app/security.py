@@ -0,0 +1,78 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+import anyio
+from app.config import settings
+
+# Passwords are stored as "scrypt$n$r$p$salt$hash", salt and hash in base64,
+# so the cost can be raised later without invalidating the existing hashes
+SCHEME = "scrypt"
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_LENGTH = 16
+HASH_LENGTH = 32
+
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    salt = secrets.token_bytes(SALT_LENGTH)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=HASH_LENGTH)
+    return "$".join((SCHEME, str(n), str(r), str(p), base64.b64encode(salt).decode(), base64.b64encode(digest).decode()))
+
+# False for anything that isn't a hash of ours, such as a password stored as is
+def verify_password(password: str, hashed: str) -> bool:
+    try:
+        scheme, n, r, p, salt, expected = hashed.split("$")
+        if scheme != SCHEME:
+            return False
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+    except ValueError:
+        return False
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected))
+    return hmac.compare_digest(digest, expected)
+
+# Verified against when the user doesn't exist, a login takes as long either
+# way. The hash of a random password that was thrown away.
+DUMMY_HASH = "scrypt$16384$8$1$MfT/ROgqWIaQZyaVi4nKUw==$TXI1mQB/5JIq+s8i47p+gDNF3gVgVTsrduSI0Tyz3AY="
+
+
+# Runs the key derivation in worker processes, off the event loop and without
+# holding up request threads. Calls beyond the number of workers wait their
+# turn on the event loop instead of queueing up in the pool. With no workers,
+# hashing runs in a thread instead.
+class PasswordHasher:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor: ProcessPoolExecutor | None = None
+        self.limiter = anyio.CapacityLimiter(max(workers, 1))
+
+    # Started on first use, spawned workers don't inherit the threads of the server
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    async def run(self, func, *args):
+        async with self.limiter:
+            if self.workers == 0:
+                return await anyio.to_thread.run_sync(func, *args)
+            return await asyncio.wrap_future(self.get_executor().submit(func, *args))
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(verify_password, password, hashed)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers)
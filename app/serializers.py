@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+from typing import Iterable, Sequence
+from fastapi import Response
+from app.crud.item import SUMMARY_FIELDS
+
+# Listings are encoded straight from row tuples of the SUMMARY_COLUMNS, in the
+# same JSON as the ItemSummary and ItemBase models but without validating every
+# row, which dominates the time of large responses.
+
+DATETIME_FIELDS = tuple(index for index, field in enumerate(SUMMARY_FIELDS) if field in ("created_at", "updated_at"))
+ID_INDEX = SUMMARY_FIELDS.index("id")
+PARENT_ID_INDEX = SUMMARY_FIELDS.index("parent_id")
+IS_DIR_INDEX = SUMMARY_FIELDS.index("is_dir")
+PATH_INDEX = SUMMARY_FIELDS.index("path")
+
+
+# Same output as pydantic, which writes UTC as Z
+def encode_datetime(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+def summary(row: Sequence) -> dict:
+    values = list(row)
+    for index in DATETIME_FIELDS:
+        values[index] = encode_datetime(values[index])
+    return dict(zip(SUMMARY_FIELDS, values))
+
+# The compact JSON of FastAPI responses, one encoder for every call
+encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+def dumps(content) -> bytes:
+    return encoder.encode(content).encode()
+
+# Content already encoded is sent as is
+def json_response(content) -> Response:
+    return Response(content if isinstance(content, bytes) else dumps(content), media_type="application/json")
+
+def page(rows: Iterable[Sequence], next_cursor: str | None) -> dict:
+    return {"items": [summary(row) for row in rows], "next_cursor": next_cursor}
+
+def ndjson(rows: Iterable[Sequence]) -> bytes:
+    return b"".join(dumps(summary(row)) + b"\n" for row in rows)
+
+
+# Every item with its whole subtree nested, the JSON of list[ItemBase]. Each
+# item is encoded once, deepest first, and its encoding is reused in its
+# parent's children as well as in the top level list.
+def nested_items(rows: Iterable[Sequence]) -> bytes:
+    rows = list(rows)
+    children = {row[ID_INDEX]: [] for row in rows}
+    for row in rows:
+        siblings = children.get(row[PARENT_ID_INDEX])
+        if siblings is not None:
+            siblings.append(row[ID_INDEX])
+    
+    encoded = {}
+    for row in sorted(rows, key=lambda row: row[PATH_INDEX].count("/"), reverse=True):
+        nested = b",".join(encoded[child] for child in children[row[ID_INDEX]])
+        encoded[row[ID_INDEX]] = dumps(summary(row))[:-1] + b',"children":[' + nested + b"]}"
+    return b"[" + b",".join(encoded[row[ID_INDEX]] for row in rows) + b"]"
+
+# Rows ordered by path, parents first, down to a depth limit. Directories
+# within the limit list their children, the ones at the limit and the files
+# have children set to null.
+def tree(rows: Iterable[Sequence], parent_id: str | None, depth: int) -> list[dict]:
+    roots = []
+    levels = {parent_id: 0}
+    by_id = {}
+    for row in rows:
+        level = levels.get(row[PARENT_ID_INDEX])
+        if level is None:
+            continue
+        item = summary(row)
+        item["children"] = [] if row[IS_DIR_INDEX] and level + 1 < depth else None
+        if level == 0:
+            roots.append(item)
+        else:
+            by_id[row[PARENT_ID_INDEX]]["children"].append(item)
+        if item["children"] is not None:
+            levels[row[ID_INDEX]] = level + 1
+            by_id[row[ID_INDEX]] = item
+    return roots
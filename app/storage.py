@@ -0,0 +1,150 @@
+import logging
+import tarfile
+from typing import BinaryIO, NamedTuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Item
+from app.crud.item import ItemDAO
+from app.uploads_manager import UploadsManager
+from app.delta import DeltaError, IterReader, apply_delta
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class StagedFile(NamedTuple):
+    tmp_path: str
+    size: int
+    blob_hash: str | None
+    encoding: str | None
+
+
+# Stores the content of a freshly created file item. With content addressing
+# the reference is committed before the blob is renamed into place, so a
+# concurrent collection of the same blob can never leave the item dangling.
+def store_item_file(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, db_item: Item, stream: BinaryIO) -> Item:
+    hash_name = "sha256" if u_manager.content_addressed else None
+    tmp_path, size, blob_hash, encoding = u_manager.write_temp(stream, hash_name=hash_name, allow_compression=True, mimetype=db_item.mimetype)
+    try:
+        if u_manager.content_addressed:
+            item_dao.attach_blob(db, db_item, blob_hash, size, encoding)
+            u_manager.place_blob(tmp_path, blob_hash, encoding)
+        else:
+            item_dao.update_file_size(db, db_item, size, encoding)
+            u_manager.place_file(tmp_path, db_item.id)
+    except BaseException:
+        u_manager.remove_temp(tmp_path)
+        raise
+    return db_item
+
+# Replaces the content of an existing file item. The new version is complete
+# on disk and checked against what the client announced before it is swapped in.
+def replace_item_file(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, db_item: Item, stream: BinaryIO, expected_size: int | None = None, expected_sha256: str | None = None) -> Item:
+    tmp_path, size, digest, encoding = u_manager.write_temp(stream, hash_name="sha256", allow_compression=True, mimetype=db_item.mimetype)
+    try:
+        if expected_size is not None and size != expected_size:
+            raise DeltaError(f"The new content is {size} bytes long, {expected_size} were expected")
+        if expected_sha256 is not None and digest != expected_sha256.lower():
+            raise DeltaError("The new content does not match the expected SHA-256")
+        if u_manager.content_addressed:
+            item_dao.attach_blob(db, db_item, digest, size, encoding, replaces_file=True)
+            u_manager.place_blob(tmp_path, digest, encoding)
+        else:
+            item_dao.update_file_size(db, db_item, size, encoding, touch=True)
+            u_manager.place_file(tmp_path, db_item.id)
+    except BaseException:
+        u_manager.remove_temp(tmp_path)
+        raise
+    return db_item
+
+# Rebuilds the file from its current content and a delta, see app.delta
+def apply_item_delta(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, db_item: Item, delta: BinaryIO, expected_size: int | None = None, expected_sha256: str | None = None) -> Item:
+    with u_manager.open_item_seekable(db_item) as base:
+        content = IterReader(apply_delta(delta, base, db_item.size or 0))
+        return replace_item_file(db, item_dao, u_manager, db_item, content, expected_size, expected_sha256)
+
+# Same as store_item_file for a file already assembled by an upload session
+def store_session_file(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, db_item: Item, session_id: str) -> Item:
+    if not u_manager.content_addressed:
+        u_manager.commit_session_file(session_id, db_item.id)
+        return db_item
+    
+    session_path = u_manager.session_path(session_id)
+    blob_hash = u_manager.hash_file(session_path)
+    item_dao.attach_blob(db, db_item, blob_hash, db_item.size)
+    u_manager.place_blob(session_path, blob_hash)
+    return db_item
+
+# Uses the rolled up sizes of the top level items, no subtree is scanned
+def exceeds_quota(db: Session, item_dao: ItemDAO, size: int | None) -> bool:
+    if settings.storage_quota is None:
+        return False
+    used, _ = item_dao.read_usage(db)
+    return used + (size or 0) > settings.storage_quota
+
+# Rejects absolute paths, parent references and empty segments
+def normalize_relative_path(path: str) -> str:
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or path.startswith("/"):
+        raise ValueError(f"Invalid relative path: {path}")
+    return "/".join(parts)
+
+def stage_file(u_manager: UploadsManager, stream: BinaryIO, mimetype: str | None = None) -> StagedFile:
+    hash_name = "sha256" if u_manager.content_addressed else None
+    return StagedFile(*u_manager.write_temp(stream, hash_name=hash_name, allow_compression=True, mimetype=mimetype))
+
+# Creates all the rows in one transaction, then moves the staged files into place.
+# Raises QuotaExceeded when the staged files don't fit, they are removed.
+def import_entries(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, parent_id: str | None, entries: list[tuple[str, StagedFile | None]]) -> list[dict]:
+    staged = [staged_file for _, staged_file in entries if staged_file is not None]
+    try:
+        if exceeds_quota(db, item_dao, sum(staged_file.size for staged_file in staged)):
+            raise QuotaExceeded("Storage quota exceeded")
+        rows = item_dao.create_items_bulk(db, parent_id, [
+            (path, None, None, None) if staged_file is None else (path, staged_file.size, staged_file.blob_hash, staged_file.encoding)
+            for path, staged_file in entries
+        ])
+    except BaseException:
+        for staged_file in staged:
+            u_manager.remove_temp(staged_file.tmp_path)
+        raise
+    
+    # File rows come in the same order as their entries
+    file_rows = [row for row in rows if not row["is_dir"]]
+    for row, staged_file in zip(file_rows, staged):
+        if staged_file.blob_hash is not None:
+            u_manager.place_blob(staged_file.tmp_path, staged_file.blob_hash, staged_file.encoding)
+        else:
+            u_manager.place_file(staged_file.tmp_path, row["id"])
+    return rows
+
+# Reads a tar stream member by member, only one file is being copied at a time.
+# Stops as soon as the files read so far exceed the quota.
+def import_tar(db: Session, item_dao: ItemDAO, u_manager: UploadsManager, parent_id: str | None, stream: BinaryIO) -> list[dict]:
+    entries = []
+    staged_size = 0
+    try:
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                try:
+                    path = normalize_relative_path(member.name)
+                except ValueError:
+                    logger.warning("Skipping unsafe archive member %s", member.name)
+                    continue
+                if member.isdir():
+                    entries.append((path, None))
+                elif member.isfile():
+                    staged_file = stage_file(u_manager, archive.extractfile(member), item_dao.get_mimetype(path))
+                    entries.append((path, staged_file))
+                    staged_size += staged_file.size
+                    if exceeds_quota(db, item_dao, staged_size):
+                        raise QuotaExceeded("Storage quota exceeded")
+    except BaseException:
+        for _, staged_file in entries:
+            if staged_file is not None:
+                u_manager.remove_temp(staged_file.tmp_path)
+        raise
+    return import_entries(db, item_dao, u_manager, parent_id, entries)
@@ -1,18 +1,241 @@
+import anyio
+import hashlib
+import io
 import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, NamedTuple
+from app.compression import GZIP, should_compress, open_compressed, open_decompressed
+from app.metrics import storage_bytes_written, blob_operations
+
+CHUNK_SIZE = 1024 * 1024
+
+FLAT = "flat"
+SHARDED = "sharded"
+LAYOUTS = (FLAT, SHARDED)
+
+# The sharded layout fans files out over two levels of directories named after
+# the first characters of their name, uploads/ab/cd/abcd... instead of uploads/abcd...
+def layout_path(root: str, name: str, layout: str) -> str:
+    if layout == SHARDED:
+        return f"{root}/{name[:2]}/{name[2:4]}/{name}"
+    return f"{root}/{name}"
+
+
+class TempFile(NamedTuple):
+    path: str
+    size: int
+    digest: str | None
+    encoding: str | None
 
 
 class UploadsManager:
-    def __init__(self):
+    def __init__(self, content_addressed: bool = False, compress: bool = False, layout: str = FLAT):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown uploads layout: {layout}")
+        self.content_addressed = content_addressed
+        self.compress = compress
+        self.layout = layout
+        self.other_layout = SHARDED if layout == FLAT else FLAT
         try:
             os.mkdir("uploads/")
         except FileExistsError:
             pass
     
     def create_or_update_file(self, filename: str, content: bytes):
-        with open(f"uploads/{filename}", 'wb') as f:
-            f.write(content)
+        self.write_stream(filename, io.BytesIO(content))
+
+    # Copies the stream to a temporary file in bounded chunks, hashing it along the way.
+    # When the caller can record the encoding, compressible content is gzipped on the fly;
+    # the size and digest always describe the original bytes.
+    def write_temp(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, hash_name: str | None = None, allow_compression: bool = False, mimetype: str | None = None) -> TempFile:
+        digest = hashlib.new(hash_name) if hash_name is not None else None
+        size = 0
+        encoding = None
+        
+        fd, tmp_path = tempfile.mkstemp(dir="uploads/", prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                chunk = stream.read(chunk_size)
+                target = f
+                if allow_compression and self.compress and should_compress(mimetype, chunk):
+                    encoding = GZIP
+                    target = open_compressed(f)
+                while chunk:
+                    target.write(chunk)
+                    size += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    chunk = stream.read(chunk_size)
+                if target is not f:
+                    target.close()
+                f.flush()
+                os.fsync(f.fileno())
+                storage_bytes_written.inc(("file",), f.tell())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        return TempFile(tmp_path, size, None if digest is None else digest.hexdigest(), encoding)
+
+    # Copies the stream to disk in bounded chunks, then renames it into place
+    def write_stream(self, filename: str, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, hash_name: str | None = None) -> tuple[int, str | None]:
+        tmp_path, size, digest, _ = self.write_temp(stream, chunk_size, hash_name)
+        try:
+            self.place_file(tmp_path, filename)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return size, digest
+
+    def remove_temp(self, tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def file_path(self, filename: str, layout: str | None = None) -> str:
+        return layout_path("uploads", filename, layout or self.layout)
+
+    # Files the layout migration has not moved yet are still found under the other
+    # layout. A file moved between both checks is at the preferred path by then.
+    def resolve(self, preferred: str, fallback: str) -> str:
+        if os.path.exists(preferred) or not os.path.exists(fallback):
+            return preferred
+        return fallback
+
+    # Removes the file under both layouts, the other one first so that a
+    # concurrent migration can never recreate the preferred one afterwards
+    def remove_all(self, paths: list[str]):
+        removed = False
+        for path in paths:
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        if not removed:
+            raise FileNotFoundError(paths[-1])
+
+    def place(self, tmp_path: str, path: str):
+        if self.layout == SHARDED:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def place_file(self, tmp_path: str, filename: str):
+        self.place(tmp_path, self.file_path(filename))
+
+    def hash_file(self, path: str, chunk_size: int = CHUNK_SIZE) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The same content may be stored both raw and gzipped, each under its own name
+    def blob_path(self, blob_hash: str, encoding: str | None = None, layout: str | None = None) -> str:
+        name = f"{blob_hash}.gz" if encoding == GZIP else blob_hash
+        return layout_path("uploads/blobs", name, layout or self.layout)
+
+    # Identical content is simply renamed over the existing blob
+    def place_blob(self, tmp_path: str, blob_hash: str, encoding: str | None = None):
+        os.makedirs("uploads/blobs/", exist_ok=True)
+        self.place(tmp_path, self.blob_path(blob_hash, encoding))
+        blob_operations.inc(("place",))
+
+    def remove_blob(self, blob_hash: str):
+        self.remove_all([
+            self.blob_path(blob_hash, encoding, layout)
+            for layout in (self.other_layout, self.layout)
+            for encoding in (None, GZIP)
+        ])
+        blob_operations.inc(("remove",))
+
+    # Path of the stored bytes, gzipped when item.encoding says so
+    def item_path(self, item) -> str:
+        if item.blob_hash is not None:
+            return self.resolve(
+                self.blob_path(item.blob_hash, item.encoding),
+                self.blob_path(item.blob_hash, item.encoding, self.other_layout),
+            )
+        return self.resolve(self.file_path(item.id), self.file_path(item.id, self.other_layout))
+
+    # Always yields the original content
+    def open_item(self, item) -> BinaryIO:
+        if item.encoding == GZIP:
+            return open_decompressed(self.item_path(item))
+        return open(self.item_path(item), 'rb')
+
+    # Random access to the original content. Seeking backwards in a gzip stream
+    # decompresses it again from the start, so it is decompressed to a temporary file once.
+    @contextmanager
+    def open_item_seekable(self, item) -> Iterator[BinaryIO]:
+        if item.encoding != GZIP:
+            with open(self.item_path(item), 'rb') as f:
+                yield f
+            return
+        with tempfile.TemporaryFile(dir="uploads/", prefix=".", suffix=".part") as copy:
+            with open_decompressed(self.item_path(item)) as f:
+                shutil.copyfileobj(f, copy, CHUNK_SIZE)
+            yield copy
 
     def remove_file(self, filename: str):
-        os.remove(f"uploads/{filename}")
-        
\ No newline at end of file
+        self.remove_all([self.file_path(filename, self.other_layout), self.file_path(filename)])
+
+    def session_path(self, session_id: str) -> str:
+        return f"uploads/.sessions/{session_id}"
+
+    # Resumable uploads are assembled in place inside a preallocated session file
+    def create_session_file(self, session_id: str, size: int):
+        os.makedirs("uploads/.sessions/", exist_ok=True)
+        with open(self.session_path(session_id), 'wb') as f:
+            f.truncate(size)
+
+    def write_chunk(self, session_id: str, offset: int, content: bytes):
+        with open(self.session_path(session_id), 'r+b') as f:
+            f.seek(offset)
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        storage_bytes_written.inc(("chunk",), len(content))
+
+    # Moves the assembled file into place without copying its data
+    def commit_session_file(self, session_id: str, filename: str):
+        self.place(self.session_path(session_id), self.file_path(filename))
+
+    def remove_session_file(self, session_id: str):
+        try:
+            os.remove(self.session_path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+# Runs the blocking disk work of an UploadsManager on a bounded thread pool,
+# so large writes and fsyncs never stall the event loop
+class AsyncUploadsManager:
+    def __init__(self, u_manager: UploadsManager, limiter: anyio.CapacityLimiter):
+        self.sync = u_manager
+        self.limiter = limiter
+
+    async def run(self, func: Callable, *args):
+        return await anyio.to_thread.run_sync(func, *args, limiter=self.limiter)
+
+    async def write_stream(self, filename: str, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, hash_name: str | None = None) -> tuple[int, str | None]:
+        return await self.run(self.sync.write_stream, filename, stream, chunk_size, hash_name)
+
+    async def write_temp(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, hash_name: str | None = None, allow_compression: bool = False, mimetype: str | None = None) -> TempFile:
+        return await self.run(self.sync.write_temp, stream, chunk_size, hash_name, allow_compression, mimetype)
+
+    async def place_blob(self, tmp_path: str, blob_hash: str, encoding: str | None = None):
+        await self.run(self.sync.place_blob, tmp_path, blob_hash, encoding)
+
+    async def remove_file(self, filename: str):
+        await self.run(self.sync.remove_file, filename)
+
+    async def remove_blob(self, blob_hash: str):
+        await self.run(self.sync.remove_blob, blob_hash)
+
+    async def write_chunk(self, session_id: str, offset: int, content: bytes):
+        await self.run(self.sync.write_chunk, session_id, offset, content)
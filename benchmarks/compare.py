@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def load_results(path: str) -> dict[str, dict]:
+    report = json.loads(Path(path).read_text())
+    return {result["name"]: result for result in report["results"]}
+
+# Benchmarks slower than the tolerated fraction or issuing more queries per operation
+def find_regressions(baseline: dict[str, dict], current: dict[str, dict], threshold: float) -> list[str]:
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None or not before["ops_per_sec"] or not result["ops_per_sec"]:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(f"{name}: {before['ops_per_sec']} -> {result['ops_per_sec']} ops/sec ({change:+.1%})")
+        if result["queries_per_op"] > before["queries_per_op"]:
+            regressions.append(f"{name}: {before['queries_per_op']} -> {result['queries_per_op']} queries/op")
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Tolerated ops/sec slowdown as a fraction")
+    args = parser.parse_args(argv)
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    for name, result in current.items():
+        before = baseline.get(name, {})
+        print(f"{name:24} {before.get('ops_per_sec')!s:>12} {result['ops_per_sec']!s:>12} ops/sec"
+              f" {before.get('queries_per_op')!s:>6} {result['queries_per_op']!s:>6} queries/op")
+
+    regressions = find_regressions(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
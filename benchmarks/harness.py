@@ -0,0 +1,63 @@
+import math
+import time
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Counts the statements sent to the database, executemany counts once
+class QueryCounter:
+    def __init__(self, engine: Engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Benchmark:
+    def __init__(self, queries: QueryCounter):
+        self.queries = queries
+        self.results: list[dict] = []
+
+    # Runs the operation ops times and records its latencies. The operation
+    # receives the iteration number and may return the bytes it transferred
+    # as an int, any other return value is ignored.
+    def measure(self, name: str, operation: Callable[[int], int | None], ops: int) -> dict:
+        latencies = []
+        transferred = 0
+        queries = self.queries.count
+        for i in range(ops):
+            start = time.perf_counter()
+            returned = operation(i)
+            if type(returned) is int:
+                transferred += returned
+            latencies.append(time.perf_counter() - start)
+        queries = self.queries.count - queries
+
+        latencies.sort()
+        seconds = sum(latencies)
+        result = {
+            "name": name,
+            "ops": ops,
+            "seconds": round(seconds, 6),
+            "ops_per_sec": round(ops / seconds, 2) if seconds else None,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 0.50) * 1000, 3),
+                "p90": round(percentile(latencies, 0.90) * 1000, 3),
+                "p99": round(percentile(latencies, 0.99) * 1000, 3),
+                "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            },
+            "queries_per_op": round(queries / ops, 2) if ops else 0.0,
+        }
+        if transferred:
+            result["bytes_per_sec"] = round(transferred / seconds) if seconds else None
+        self.results.append(result)
+        return result
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, sessionmaker
+from app.crud.item import ItemDAO
+from app.database import Base, create_db_engine
+from app.models import Item
+from app.schemas import ItemCreate, ItemUpdate
+from benchmarks.harness import Benchmark, QueryCounter
+from benchmarks.tree import build_tree
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def random_file_ids(db: Session, root: Item, count: int, rng: random.Random) -> list[str]:
+    stmt = select(Item.id).where(Item.is_dir.is_(False), Item.path.like(f"{root.path}/%")).order_by(Item.id)
+    ids = db.execute(stmt).scalars().all()
+    return rng.sample(ids, min(count, len(ids)))
+
+def run_dao_benchmarks(bench: Benchmark, db: Session, root: Item, levels: dict[int, list[str]], ops: int, rng: random.Random):
+    dao = ItemDAO()
+    root_id = root.id
+    deepest = levels[max(levels)]
+    file_ids = random_file_ids(db, root, ops, rng)
+
+    # Nothing is served from the identity map, every lookup reaches the database
+    def fresh(operation):
+        def run(i: int):
+            db.expunge_all()
+            return operation(i)
+        return run
+
+    bench.measure("dao.create_file", lambda i: dao.create_item(db, ItemCreate(
+        name=f"new_{i}.txt", is_dir=False, parent_id=rng.choice(deepest), size=1024,
+    )), ops)
+    bench.measure("dao.read_item", fresh(lambda i: dao.read_item(db, file_ids[i % len(file_ids)])), ops)
+    bench.measure("dao.read_children", fresh(lambda i: dao.read_children(db, rng.choice(deepest))), ops)
+
+    cursor = None
+    def read_page(i: int):
+        nonlocal cursor
+        _, cursor = dao.read_items_page(db, 100, cursor)
+    bench.measure("dao.read_items_page", fresh(read_page), ops)
+    bench.measure("dao.read_descendants", fresh(lambda i: dao.read_descendants(db, dao.read_item(db, rng.choice(levels[1])), 100)), ops)
+    bench.measure("dao.search", fresh(lambda i: dao.search_items(db, f"f{rng.randrange(10)}.txt", 50)), ops)
+    bench.measure("dao.rename", fresh(lambda i: dao.update_item(db, ItemUpdate(id=file_ids[i % len(file_ids)], name=f"renamed_{i}.txt"))), ops)
+
+    # Subtrees one level above the files move between the top level
+    # directories, the root is always a valid target
+    movable = levels[max(levels) - 1] if max(levels) > 2 else deepest
+    targets = levels[1] + [root_id]
+    def move(i: int):
+        item_id = movable[i % len(movable)]
+        item = dao.read_item(db, item_id)
+        candidates = [target for target in targets if not dao.read_item(db, target).path.startswith(f"{item.path}/") and target != item_id]
+        dao.update_item(db, ItemUpdate(id=item_id, name=f"moved_{i}", parent_id=rng.choice(candidates)))
+    bench.measure("dao.move_subtree", fresh(move), min(ops, len(movable)))
+
+    doomed = rng.sample(deepest, min(ops, len(deepest)))
+    bench.measure("dao.delete_subtree", fresh(lambda i: dao.delete_item(db, doomed[i])), len(doomed))
+
+def run_api_benchmarks(bench: Benchmark, session_factory, ops: int, file_size: int):
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("fastapi.testclient needs httpx, skipping the API benchmarks", file=sys.stderr)
+        return
+    from app.dependencies import get_db
+    from app.main import app
+
+    def get_bench_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_bench_db
+    try:
+        client = TestClient(app)
+        content = os.urandom(file_size)
+        folder = client.post("/items", data={"name": "api"}).json()
+        ids = []
+
+        def upload(i: int) -> int:
+            response = client.post("/items", data={"name": f"upload_{i}.bin", "parent_id": folder["id"]}, files={"file": ("upload.bin", content)})
+            response.raise_for_status()
+            ids.append(response.json()["id"])
+            return file_size
+        bench.measure("api.upload", upload, ops)
+
+        def download(i: int) -> int:
+            response = client.get(f"/items{ids[i % len(ids)]}")
+            response.raise_for_status()
+            return len(response.content)
+        bench.measure("api.download", download, ops)
+
+        bench.measure("api.read_by_path", lambda i: client.get("/items/by-path", params={"path": f"uploads/api/upload_{i % len(ids)}.bin"}).raise_for_status(), ops)
+        bench.measure("api.read_page", lambda i: client.get("/items/page", params={"limit": 100}).raise_for_status(), ops)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark the item DAO and the HTTP API on a synthetic tree")
+    parser.add_argument("--items", type=int, default=10000, help="Approximate number of items in the tree")
+    parser.add_argument("--depth", type=int, default=3, help="Directory levels below the root")
+    parser.add_argument("--fanout", type=int, default=10, help="Subdirectories per directory")
+    parser.add_argument("--ops", type=int, default=200, help="Operations per benchmark")
+    parser.add_argument("--file-size", type=int, default=1024 * 1024, help="Bytes per uploaded file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-api", action="store_true", help="Only run the DAO benchmarks")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory with its database")
+    args = parser.parse_args(argv)
+
+    output = Path(args.output).resolve() if args.output else None
+    workdir = tempfile.mkdtemp(prefix="local-cloud-bench-")
+    previous_dir = os.getcwd()
+    # uploads/ and the database live in the working directory
+    os.chdir(workdir)
+    try:
+        engine = create_db_engine(f"sqlite:///{workdir}/bench.db")
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        bench = Benchmark(QueryCounter(engine))
+        rng = random.Random(args.seed)
+
+        with session_factory() as db:
+            root, levels = build_tree(db, ItemDAO(), args.items, args.depth, args.fanout, seed=args.seed)
+            tree_items = db.execute(select(func.count()).where(Item.path.like(f"{root.path}/%"))).scalar()
+            run_dao_benchmarks(bench, db, root, levels, args.ops, rng)
+        if not args.skip_api:
+            run_api_benchmarks(bench, session_factory, args.ops, args.file_size)
+        engine.dispose()
+    finally:
+        os.chdir(previous_dir)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "tree_items": tree_items,
+            "params": vars(args),
+        },
+        "results": bench.results,
+    }
+    if args.keep:
+        report["meta"]["workdir"] = workdir
+    text = json.dumps(report, indent=2)
+    if output is None:
+        print(text)
+    else:
+        output.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import math
+import random
+from typing import Iterator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.crud.item import ItemDAO
+from app.models import Item
+from app.schemas import ItemCreate
+
+ROOT_NAME = "bench"
+
+
+# Directories fan out `fanout` times over `depth` levels and the files are
+# spread over the deepest ones, until the tree holds about `items` items
+def tree_files(items: int, depth: int, fanout: int) -> Iterator[str]:
+    dirs = sum(fanout ** level for level in range(1, depth + 1))
+    leaves = fanout ** depth
+    files_per_leaf = max(1, math.ceil((items - dirs) / leaves))
+    remaining = max(items - dirs, leaves)
+
+    def walk(prefix: str, level: int) -> Iterator[str]:
+        nonlocal remaining
+        if level == depth:
+            for index in range(min(files_per_leaf, remaining)):
+                remaining -= 1
+                yield f"{prefix}/f{index}.txt"
+            return
+        for index in range(fanout):
+            yield from walk(f"{prefix}/d{index}" if prefix else f"d{index}", level + 1)
+
+    yield from walk("", 0)
+
+# Inserts the tree below a new root directory with bulk statements, the files
+# only exist as metadata. Returns the root and the directories by depth.
+def build_tree(db: Session, item_dao: ItemDAO, items: int, depth: int, fanout: int, batch_size: int = 10000, seed: int = 0) -> tuple[Item, dict[int, list[str]]]:
+    rng = random.Random(seed)
+    root = item_dao.create_item(db, ItemCreate(name=ROOT_NAME, is_dir=True))
+    batch = []
+    for path in tree_files(items, depth, fanout):
+        batch.append((path, rng.randint(1, 1024 * 1024), None, None))
+        if len(batch) >= batch_size:
+            item_dao.create_items_bulk(db, root.id, batch)
+            batch = []
+    if batch:
+        item_dao.create_items_bulk(db, root.id, batch)
+
+    levels: dict[int, list[str]] = {}
+    stmt = select(Item.id, Item.path).where(Item.is_dir.is_(True), Item.path.like(f"{root.path}/%"))
+    for id, path in db.execute(stmt):
+        levels.setdefault(path.count("/") - root.path.count("/"), []).append(id)
+    for ids in levels.values():
+        ids.sort()
+    return root, levels
@@ -0,0 +1,65 @@
+import io
+import os
+import tarfile
+import zipfile
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app.archive import zip_stream, tar_stream, is_compressed_mimetype
+
+
+CONTENTS = {
+    "f1": os.urandom(300_000),
+    "f2": b"hello " * 1000,
+}
+
+@pytest.fixture
+def entries():
+    updated_at = datetime(2025, 5, 18, tzinfo=timezone.utc)
+    return [
+        ("dir", SimpleNamespace(id="d1", is_dir=True, size=0, mimetype=None, updated_at=updated_at)),
+        ("dir/photo.jpg", SimpleNamespace(id="f1", is_dir=False, size=len(CONTENTS["f1"]), mimetype="image/jpeg", updated_at=updated_at)),
+        ("dir/sub", SimpleNamespace(id="d2", is_dir=True, size=0, mimetype=None, updated_at=updated_at)),
+        ("dir/sub/notes.txt", SimpleNamespace(id="f2", is_dir=False, size=len(CONTENTS["f2"]), mimetype="text/plain", updated_at=updated_at)),
+        ("dir/sub/missing.txt", SimpleNamespace(id="f3", is_dir=False, size=10, mimetype="text/plain", updated_at=updated_at)),
+    ]
+
+def open_file(item):
+    if item.id not in CONTENTS:
+        raise FileNotFoundError(item.id)
+    return io.BytesIO(CONTENTS[item.id])
+
+def test_is_compressed_mimetype():
+    assert is_compressed_mimetype("image/jpeg")
+    assert is_compressed_mimetype("application/zip")
+    assert not is_compressed_mimetype("image/svg+xml")
+    assert not is_compressed_mimetype("text/plain")
+    assert not is_compressed_mimetype(None)
+
+def test_zip_stream(entries):
+    chunks = list(zip_stream(entries, open_file))
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    
+    assert archive.namelist() == ["dir/", "dir/photo.jpg", "dir/sub/", "dir/sub/notes.txt"]
+    assert archive.read("dir/photo.jpg") == CONTENTS["f1"]
+    assert archive.read("dir/sub/notes.txt") == CONTENTS["f2"]
+    assert archive.getinfo("dir/photo.jpg").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("dir/sub/notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+def test_zip_stream_memory_is_bounded(entries):
+    assert max(len(chunk) for chunk in zip_stream(entries, open_file)) < 300_000
+
+def test_tar_stream(entries):
+    data = b"".join(tar_stream(entries, open_file))
+    archive = tarfile.open(fileobj=io.BytesIO(data))
+    
+    assert archive.getnames() == ["dir", "dir/photo.jpg", "dir/sub", "dir/sub/notes.txt"]
+    assert archive.getmember("dir/sub").isdir()
+    assert archive.extractfile("dir/photo.jpg").read() == CONTENTS["f1"]
+    assert archive.extractfile("dir/sub/notes.txt").read() == CONTENTS["f2"]
+
+def test_tar_stream_pads_short_files():
+    item = SimpleNamespace(id="short", is_dir=False, size=10, mimetype=None, updated_at=None)
+    data = b"".join(tar_stream([("short.bin", item)], lambda item: io.BytesIO(b"abc")))
+    archive = tarfile.open(fileobj=io.BytesIO(data))
+    assert archive.extractfile("short.bin").read() == b"abc" + b"\0" * 7
@@ -0,0 +1,30 @@
+import json
+from benchmarks import compare, run
+
+
+def test_run_writes_a_report(tmp_path):
+    output = tmp_path / "report.json"
+    run.main(["--items", "200", "--depth", "2", "--fanout", "3", "--ops", "5", "--skip-api", "--output", str(output)])
+
+    report = json.loads(output.read_text())
+    assert report["meta"]["tree_items"] >= 200
+    results = {result["name"]: result for result in report["results"]}
+    assert {"dao.create_file", "dao.read_children", "dao.move_subtree", "dao.delete_subtree"} <= set(results)
+    assert results["dao.read_item"]["ops"] == 5
+    assert results["dao.read_item"]["queries_per_op"] == 1.0
+    assert results["dao.read_item"]["latency_ms"]["p50"] <= results["dao.read_item"]["latency_ms"]["max"]
+
+def test_compare_flags_slowdowns_and_extra_queries():
+    baseline = {
+        "a": {"ops_per_sec": 100.0, "queries_per_op": 1.0},
+        "b": {"ops_per_sec": 100.0, "queries_per_op": 1.0},
+        "c": {"ops_per_sec": 100.0, "queries_per_op": 1.0},
+    }
+    current = {
+        "a": {"ops_per_sec": 90.0, "queries_per_op": 1.0},
+        "b": {"ops_per_sec": 50.0, "queries_per_op": 1.0},
+        "c": {"ops_per_sec": 100.0, "queries_per_op": 3.0},
+        "new": {"ops_per_sec": 1.0, "queries_per_op": 9.0},
+    }
+    regressions = compare.find_regressions(baseline, current, threshold=0.2)
+    assert [regression.split(":")[0] for regression in regressions] == ["b", "c"]
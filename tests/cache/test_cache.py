@@ -0,0 +1,55 @@
+from app.cache import LRUCache, ItemCache
+from app.crud.item import ItemMetadata
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def metadata(id: str, path: str) -> ItemMetadata:
+    return ItemMetadata(id, path.rsplit("/", 1)[-1], False, None, path, 1, None, None, None, None)
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4
+    assert cache.get("a") == 1
+    clock.now = 6
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "maxsize": 10, "hits": 1, "misses": 1}
+
+def test_set_after_invalidation_is_dropped():
+    cache = LRUCache(maxsize=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate(["a"])
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+
+def test_item_cache_invalidates_paths_and_subtrees():
+    cache = ItemCache(maxsize=10, ttl=60)
+    for id, path in [("1", "uploads/a"), ("2", "uploads/a/b"), ("3", "uploads/a/b/c"), ("4", "uploads/ab")]:
+        cache.set(id, metadata(id, path))
+    
+    cache.invalidate_paths(["uploads/a"])
+    assert cache.get("1") is None
+    assert cache.get("2") is not None
+    
+    cache.invalidate_subtree("uploads/a/b")
+    assert cache.get("2") is None
+    assert cache.get("3") is None
+    assert cache.get("4") is not None
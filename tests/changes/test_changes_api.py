@@ -0,0 +1,72 @@
+import anyio
+import pytest
+import time
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from app.api import changes
+from app.database import Base
+from app.models import Change
+from app.schemas import ItemCreate
+from app.config import settings
+from app.crud.change import ChangeDAO
+from app.crud.item import ItemDAO
+from app.notifier import ChangeNotifier
+
+change_dao = ChangeDAO()
+
+# The endpoint opens its own sessions from the thread pool, they need a shared database
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/changes.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(changes, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+def test_waiting_request_is_woken_by_a_commit(session_factory, monkeypatch):
+    # Only the notification can end the wait early
+    monkeypatch.setattr(settings, "change_poll_interval", 30)
+    notifier = ChangeNotifier()
+    item_dao = ItemDAO(notifier=notifier)
+    
+    def create_item():
+        with session_factory() as db:
+            item_dao.create_item(db, ItemCreate(name="new.txt", is_dir=False, size=1))
+    
+    async def main():
+        cursor = (await changes.read_changes(None, 100, 0, change_dao, notifier)).cursor
+        async with anyio.create_task_group() as tg:
+            async def commit_later():
+                await anyio.sleep(0.1)
+                await anyio.to_thread.run_sync(create_item)
+            tg.start_soon(commit_later)
+            start = time.monotonic()
+            page = await changes.read_changes(cursor, 100, 20, change_dao, notifier)
+        return page, time.monotonic() - start
+    
+    page, elapsed = anyio.run(main)
+    assert [(change.action, change.path) for change in page.changes] == [("created", "uploads/new.txt")]
+    assert page.cursor == str(page.changes[-1].id)
+    assert elapsed < 10
+
+def test_pruned_cursor_is_gone(session_factory):
+    item_dao = ItemDAO()
+    with session_factory() as db:
+        for name in ("a.txt", "b.txt", "c.txt"):
+            item_dao.create_item(db, ItemCreate(name=name, is_dir=False, size=1))
+        db.execute(update(Change).values(created_at=datetime.now(timezone.utc) - timedelta(days=2)))
+        change_dao.prune(db, datetime.now(timezone.utc) - timedelta(days=1))
+    
+    async def read(since: str):
+        return await changes.read_changes(since, 100, 0, change_dao, ChangeNotifier())
+    
+    with pytest.raises(HTTPException) as error:
+        anyio.run(read, "0")
+    assert error.value.status_code == 410
+    with pytest.raises(HTTPException) as error:
+        anyio.run(read, "not a cursor")
+    assert error.value.status_code == 400
+    assert anyio.run(read, "3").changes == []
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import Base
+from app.models import Blob, Item
+from app.schemas import ItemCreate
+from app.crud.blob import BlobDAO
+from app.crud.item import ItemDAO
+
+dao = BlobDAO()
+item_dao = ItemDAO()
+
+@pytest.fixture(autouse=True)
+def clear_tables(test_db):
+    test_db.execute(delete(Item))
+    test_db.execute(delete(Blob))
+    test_db.commit()
+
+def create_file(db: Session, name: str, blob_hash: str, parent_id: str | None = None) -> Item:
+    item = item_dao.create_item(db, ItemCreate(name=name, is_dir=False, parent_id=parent_id, size=3))
+    return item_dao.attach_blob(db, item, blob_hash, 3)
+
+def test_add_reference_counts(test_db: Session):
+    dao.add_reference(test_db, "aaa", 3)
+    dao.add_reference(test_db, "aaa", 3)
+    test_db.commit()
+    assert dao.read_blob(test_db, "aaa").ref_count == 2
+
+def test_attach_blob_deduplicates(test_db: Session):
+    first = create_file(test_db, "a.txt", "aaa")
+    second = create_file(test_db, "b.txt", "aaa")
+    assert first.blob_hash == second.blob_hash == "aaa"
+    assert dao.read_blob(test_db, "aaa").ref_count == 2
+
+def test_delete_item_releases_reference(test_db: Session):
+    first = create_file(test_db, "a.txt", "aaa")
+    create_file(test_db, "b.txt", "aaa")
+    item_dao.delete_item(test_db, first.id)
+    assert dao.read_blob(test_db, "aaa").ref_count == 1
+
+def test_delete_directory_releases_subtree(test_db: Session):
+    parent = item_dao.create_item(test_db, ItemCreate(name="dir", is_dir=True))
+    create_file(test_db, "a.txt", "aaa", parent.id)
+    create_file(test_db, "b.txt", "aaa", parent.id)
+    create_file(test_db, "c.txt", "ccc")
+    item_dao.delete_item(test_db, parent.id)
+    assert dao.read_blob(test_db, "aaa").ref_count == 0
+    assert dao.read_blob(test_db, "ccc").ref_count == 1
+
+def test_collect_removes_only_unreferenced(test_db: Session):
+    item = create_file(test_db, "a.txt", "aaa")
+    create_file(test_db, "c.txt", "ccc")
+    item_dao.delete_item(test_db, item.id)
+    
+    removed = []
+    collected = dao.collect(test_db, removed.append)
+    
+    assert collected == ["aaa"] and removed == ["aaa"]
+    assert dao.read_blob(test_db, "aaa") is None
+    assert dao.read_blob(test_db, "ccc") is not None
+
+def test_collect_ignores_missing_files(test_db: Session):
+    dao.add_reference(test_db, "aaa", 3)
+    dao.release_references(test_db, ["aaa"])
+    test_db.commit()
+    
+    def missing(blob_hash):
+        raise FileNotFoundError(blob_hash)
+    
+    assert dao.collect(test_db, missing) == ["aaa"]
+
+# An upload and the reclaimer work in their own sessions on a shared database
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/blobs.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+def test_add_reference_after_a_concurrent_collect(session_factory):
+    with session_factory() as upload, session_factory() as reclaimer:
+        dao.add_reference(upload, "aaa", 3)
+        dao.release_references(upload, ["aaa"])
+        upload.commit()
+        # The upload has loaded the unreferenced row when the reclaimer drops it
+        seen = dao.read_blob(upload, "aaa")
+        assert seen.ref_count == 0
+        assert dao.collect(reclaimer, lambda blob_hash: None) == ["aaa"]
+        
+        blob = dao.add_reference(upload, "aaa", 3)
+        upload.commit()
+        assert blob.ref_count == 1
+        assert dao.read_blob(reclaimer, "aaa").ref_count == 1
+
+def test_collect_after_a_concurrent_add_reference(session_factory):
+    with session_factory() as upload, session_factory() as reclaimer:
+        dao.add_reference(upload, "aaa", 3)
+        dao.release_references(upload, ["aaa"])
+        upload.commit()
+        assert dao.unreferenced_blobs(reclaimer) == ["aaa"]
+        
+        dao.add_reference(upload, "aaa", 3, 2)
+        upload.commit()
+        assert dao.collect(reclaimer, lambda blob_hash: None) == []
+        assert dao.read_blob(reclaimer, "aaa").ref_count == 2
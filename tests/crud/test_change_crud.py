@@ -0,0 +1,95 @@
+import anyio
+import pytest
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Change, Item
+from app.schemas import ItemCreate, ItemUpdate
+from app.crud.change import ChangeDAO
+from app.crud.item import ItemDAO
+from app.notifier import ChangeNotifier
+
+dao = ChangeDAO()
+item_dao = ItemDAO()
+
+@pytest.fixture(autouse=True)
+def clear_tables(test_db):
+    test_db.execute(delete(Item))
+    test_db.execute(delete(Change))
+    test_db.commit()
+
+def journal(db: Session, since: int = 0) -> list[tuple]:
+    return [(change.action, change.path, change.old_path) for change, _ in dao.read_changes(db, since, 100)]
+
+def test_item_writes_are_journaled(test_db: Session):
+    since = dao.latest_id(test_db)
+    folder = item_dao.create_item(test_db, ItemCreate(name="folder", is_dir=True))
+    other = item_dao.create_item(test_db, ItemCreate(name="other", is_dir=True))
+    file = item_dao.create_item(test_db, ItemCreate(name="a.txt", is_dir=False, parent_id=folder.id, size=1))
+    item_dao.update_file_size(test_db, file, 5)
+    item_dao.update_item(test_db, ItemUpdate(id=folder.id, parent_id=other.id))
+    item_dao.update_item(test_db, ItemUpdate(id=folder.id, name="renamed"))
+    item_dao.delete_item(test_db, other.id)
+    
+    assert journal(test_db, since) == [
+        ("created", "uploads/folder", None),
+        ("created", "uploads/other", None),
+        ("created", "uploads/folder/a.txt", None),
+        ("updated", "uploads/folder/a.txt", None),
+        ("moved", "uploads/other/folder", "uploads/folder"),
+        ("moved", "uploads/other/renamed", "uploads/other/folder"),
+        ("deleted", "uploads/other", None),
+    ]
+
+def test_changes_come_with_the_current_item(test_db: Session):
+    kept = item_dao.create_item(test_db, ItemCreate(name="kept.txt", is_dir=False, size=1))
+    gone = item_dao.create_item(test_db, ItemCreate(name="gone.txt", is_dir=False, size=1))
+    item_dao.delete_item(test_db, gone.id)
+    
+    rows = dao.read_changes(test_db, 0, 100)
+    items = {change.item_id: item for change, item in rows}
+    assert items[kept.id].name == "kept.txt"
+    assert items[gone.id] is None
+
+def test_bulk_creation_is_journaled(test_db: Session):
+    since = dao.latest_id(test_db)
+    item_dao.create_items_bulk(test_db, None, [("docs/a.txt", 1, None, None), ("docs/b.txt", 2, None, None)])
+    assert sorted(journal(test_db, since)) == [
+        ("created", "uploads/docs", None),
+        ("created", "uploads/docs/a.txt", None),
+        ("created", "uploads/docs/b.txt", None),
+    ]
+
+def test_failed_writes_leave_no_entry(test_db: Session):
+    item_dao.create_item(test_db, ItemCreate(name="a.txt", is_dir=False, size=1))
+    since = dao.latest_id(test_db)
+    with pytest.raises(IntegrityError):
+        item_dao.create_item(test_db, ItemCreate(name="a.txt", is_dir=False, size=1))
+    assert dao.latest_id(test_db) == since
+
+def test_prune_keeps_the_latest_entry(test_db: Session):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        item_dao.create_item(test_db, ItemCreate(name=name, is_dir=False, size=1))
+    latest = dao.latest_id(test_db)
+    test_db.execute(update(Change).values(created_at=datetime.now(timezone.utc) - timedelta(days=60)))
+    test_db.commit()
+    
+    assert dao.prune(test_db, datetime.now(timezone.utc) - timedelta(days=30)) == 2
+    assert dao.oldest_id(test_db) == latest
+    assert dao.is_expired(test_db, latest - 3)
+    assert not dao.is_expired(test_db, latest - 1)
+    assert not dao.is_expired(test_db, latest)
+
+def test_notifier_wakes_waiters_from_other_threads():
+    notifier = ChangeNotifier()
+    
+    async def wait_for_change():
+        with notifier.subscribe() as changed:
+            threading.Timer(0.05, notifier.notify).start()
+            with anyio.fail_after(5):
+                await changed.wait()
+        assert not notifier.waiters
+    
+    anyio.run(wait_for_change)
@@ -1,10 +1,11 @@
 import pytest
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.models import Item
+from app.models import Item, PendingRemoval
 from app.schemas import ItemCreate, ItemUpdate
-from app.crud.item import ItemDAO
+from app.crud.item import ItemDAO, SUMMARY_COLUMNS
+from app.cache import ItemCache
 
 dao = ItemDAO()
 
@@ -68,7 +69,7 @@ def test_update_item_name(test_db: Session):
     update_data = ItemUpdate(id=item.id, name="new.txt")
     updated = dao.update_item(test_db, update_data)
     assert updated.name == "new.txt"
-    assert updated.path == "uploads/old.txt"
+    assert updated.path == "uploads/new.txt"
 
 def test_update_item_parent(test_db: Session):
     parent = create_item_helper(test_db, name="dir", is_dir=True, path="uploads/dir")
@@ -138,3 +139,359 @@ def test_read_children_with_none_parent(test_db: Session):
 
 
 
+def test_read_items_page_walks_all_items(test_db: Session):
+    created = {create_item_helper(test_db, name=f"file{i}.txt", is_dir=False, path=f"uploads/file{i}.txt").id for i in range(7)}
+    
+    seen = []
+    items, cursor = dao.read_items_page(test_db, limit=3)
+    seen += [item.id for item in items]
+    while cursor is not None:
+        items, cursor = dao.read_items_page(test_db, limit=3, after=cursor)
+        seen += [item.id for item in items]
+    
+    assert len(seen) == 7
+    assert set(seen) == created
+    assert seen == sorted(seen)
+
+def test_read_items_page_last_page_has_no_cursor(test_db: Session):
+    create_item_helper(test_db, name="file.txt", is_dir=False, path="uploads/file.txt")
+    items, cursor = dao.read_items_page(test_db, limit=1)
+    assert len(items) == 1
+    assert cursor is None
+
+def test_read_items_page_filters(test_db: Session):
+    parent = create_item_helper(test_db, name="dir", is_dir=True, path="uploads/dir")
+    child = create_item_helper(test_db, name="child.txt", is_dir=False, path="uploads/dir/child.txt", parent_id=parent.id)
+    create_item_helper(test_db, name="root.txt", is_dir=False, path="uploads/root.txt")
+    
+    items, _ = dao.read_items_page(test_db, limit=10, parent_id=parent.id)
+    assert [item.id for item in items] == [child.id]
+    items, _ = dao.read_items_page(test_db, limit=10, is_dir=True)
+    assert [item.id for item in items] == [parent.id]
+
+def test_stream_items(test_db: Session):
+    for i in range(5):
+        create_item_helper(test_db, name=f"file{i}.txt", is_dir=False, path=f"uploads/file{i}.txt")
+    rows = list(dao.stream_items(test_db, is_dir=False, batch_size=2))
+    assert len(rows) == 5
+    assert rows[0]["path"].startswith("uploads/file")
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+def test_update_directory_moves_whole_subtree(test_db: Session):
+    old_dir = create_item_helper(test_db, name="old_dir", is_dir=True, path="uploads/old_dir")
+    sub_dir = create_item_helper(test_db, name="sub", is_dir=True, path="uploads/old_dir/sub", parent_id=old_dir.id)
+    deep = create_item_helper(test_db, name="deep.txt", is_dir=False, path="uploads/old_dir/sub/deep.txt", parent_id=sub_dir.id)
+    sibling = create_item_helper(test_db, name="old_dir2", is_dir=True, path="uploads/old_dir2")
+    new_parent = create_item_helper(test_db, name="new_dir", is_dir=True, path="uploads/new_dir")
+    
+    dao.update_item(test_db, ItemUpdate(id=old_dir.id, parent_id=new_parent.id))
+    
+    test_db.refresh(sub_dir)
+    test_db.refresh(deep)
+    test_db.refresh(sibling)
+    assert sub_dir.path == "uploads/new_dir/old_dir/sub"
+    assert deep.path == "uploads/new_dir/old_dir/sub/deep.txt"
+    assert sibling.path == "uploads/old_dir2"
+
+def test_update_directory_into_itself(test_db: Session):
+    parent = create_item_helper(test_db, name="dir", is_dir=True, path="uploads/dir")
+    child = create_item_helper(test_db, name="sub", is_dir=True, path="uploads/dir/sub", parent_id=parent.id)
+    with pytest.raises(ValueError):
+        dao.update_item(test_db, ItemUpdate(id=parent.id, parent_id=child.id))
+    with pytest.raises(ValueError):
+        dao.update_item(test_db, ItemUpdate(id=parent.id, parent_id=parent.id))
+
+def test_update_directory_conflict_is_atomic(test_db: Session):
+    old_dir = create_item_helper(test_db, name="dir", is_dir=True, path="uploads/a/dir")
+    child = create_item_helper(test_db, name="child.txt", is_dir=False, path="uploads/a/dir/child.txt", parent_id=old_dir.id)
+    new_parent = create_item_helper(test_db, name="b", is_dir=True, path="uploads/b")
+    create_item_helper(test_db, name="dir", is_dir=True, path="uploads/b/dir")
+    
+    with pytest.raises(IntegrityError):
+        dao.update_item(test_db, ItemUpdate(id=old_dir.id, parent_id=new_parent.id))
+    
+    test_db.refresh(old_dir)
+    test_db.refresh(child)
+    assert old_dir.path == "uploads/a/dir"
+    assert child.path == "uploads/a/dir/child.txt"
+
+def test_delete_directory_removes_subtree(test_db: Session):
+    test_db.execute(delete(PendingRemoval))
+    parent = create_item_helper(test_db, name="dir", is_dir=True, path="uploads/dir")
+    sub_dir = create_item_helper(test_db, name="sub", is_dir=True, path="uploads/dir/sub", parent_id=parent.id)
+    child = create_item_helper(test_db, name="child.txt", is_dir=False, path="uploads/dir/child.txt", parent_id=parent.id)
+    deep = create_item_helper(test_db, name="deep.txt", is_dir=False, path="uploads/dir/sub/deep.txt", parent_id=sub_dir.id)
+    other = create_item_helper(test_db, name="other.txt", is_dir=False, path="uploads/other.txt")
+    expected_queue = {child.id, deep.id}
+    
+    deleted = dao.delete_item(test_db, parent.id)
+    
+    assert deleted.id == parent.id
+    assert deleted.children == []
+    remaining = {item.id for item in dao.read_all_items(test_db)}
+    assert remaining == {other.id}
+    queued = {removal.item_id for removal in test_db.execute(select(PendingRemoval)).scalars()}
+    assert queued == expected_queue
+
+@pytest.fixture
+def sample_tree(test_db: Session):
+    root = create_item_helper(test_db, name="root", is_dir=True, path="uploads/root")
+    sub = create_item_helper(test_db, name="sub", is_dir=True, path="uploads/root/sub", parent_id=root.id)
+    leaf = create_item_helper(test_db, name="leaf.txt", is_dir=False, path="uploads/root/sub/leaf.txt", parent_id=sub.id)
+    top = create_item_helper(test_db, name="top.txt", is_dir=False, path="uploads/root/top.txt", parent_id=root.id)
+    create_item_helper(test_db, name="root2", is_dir=True, path="uploads/root2")
+    return root, sub, leaf, top
+
+def test_read_item_by_path(test_db: Session, sample_tree):
+    _, _, leaf, _ = sample_tree
+    assert dao.read_item_by_path(test_db, "uploads/root/sub/leaf.txt").id == leaf.id
+    assert dao.read_item_by_path(test_db, "uploads/root/missing") is None
+
+def test_read_ancestors(test_db: Session, sample_tree):
+    root, sub, leaf, _ = sample_tree
+    assert [item.id for item in dao.read_ancestors(test_db, leaf)] == [root.id, sub.id]
+    assert dao.read_ancestors(test_db, root) == []
+
+def test_read_descendants(test_db: Session, sample_tree):
+    root, sub, leaf, top = sample_tree
+    items, cursor = dao.read_descendants(test_db, root, limit=10)
+    assert [item.id for item in items] == [sub.id, leaf.id, top.id]
+    assert cursor is None
+
+def test_read_descendants_paginated(test_db: Session, sample_tree):
+    root, sub, leaf, top = sample_tree
+    items, cursor = dao.read_descendants(test_db, root, limit=2)
+    assert [item.id for item in items] == [sub.id, leaf.id]
+    items, cursor = dao.read_descendants(test_db, root, limit=2, after=cursor)
+    assert [item.id for item in items] == [top.id]
+    assert cursor is None
+
+def test_read_descendants_max_depth(test_db: Session, sample_tree):
+    root, sub, _, top = sample_tree
+    items, _ = dao.read_descendants(test_db, root, limit=10, max_depth=1)
+    assert [item.id for item in items] == [sub.id, top.id]
+
+def test_read_tree(test_db: Session, sample_tree):
+    root, sub, leaf, top = sample_tree
+    rows = dao.read_tree(test_db, None, 2, SUMMARY_COLUMNS)
+    assert [row.path for row in rows] == ["uploads/root", "uploads/root/sub", "uploads/root/top.txt", "uploads/root2"]
+    rows = dao.read_tree(test_db, root, 2, SUMMARY_COLUMNS)
+    assert [row.id for row in rows] == [sub.id, leaf.id, top.id]
+
+def create_dir(db: Session, name: str, parent_id: str | None = None) -> Item:
+    return dao.create_item(db, ItemCreate(name=name, is_dir=True, parent_id=parent_id))
+
+def create_file(db: Session, name: str, size: int, parent_id: str | None = None) -> Item:
+    return dao.create_item(db, ItemCreate(name=name, is_dir=False, parent_id=parent_id, size=size))
+
+def test_create_item_rolls_up_directory_usage(test_db: Session):
+    root = create_dir(test_db, "root")
+    sub = create_dir(test_db, "sub", root.id)
+    create_file(test_db, "a.txt", 10, sub.id)
+    create_file(test_db, "b.txt", 5, root.id)
+    
+    assert dao.read_usage(test_db, root.id) == (15, 2)
+    assert dao.read_usage(test_db, sub.id) == (10, 1)
+    assert dao.read_usage(test_db) == (15, 2)
+
+def test_move_updates_both_ancestries(test_db: Session):
+    source = create_dir(test_db, "source")
+    sub = create_dir(test_db, "sub", source.id)
+    create_file(test_db, "a.txt", 10, sub.id)
+    create_file(test_db, "b.txt", 3, source.id)
+    target = create_dir(test_db, "target")
+    
+    dao.update_item(test_db, ItemUpdate(id=sub.id, parent_id=target.id))
+    
+    assert dao.read_usage(test_db, source.id) == (3, 1)
+    assert dao.read_usage(test_db, target.id) == (10, 1)
+    assert dao.read_usage(test_db) == (13, 2)
+
+def test_rename_directory_rewrites_subtree_paths(test_db: Session):
+    root = create_dir(test_db, "root")
+    folder = create_dir(test_db, "folder", root.id)
+    sub = create_dir(test_db, "sub", folder.id)
+    leaf = create_file(test_db, "a.txt", 10, sub.id)
+    
+    renamed = dao.update_item(test_db, ItemUpdate(id=folder.id, name="renamed"))
+    
+    assert renamed.path == "uploads/root/renamed"
+    assert dao.read_item_by_path(test_db, "uploads/root/renamed/sub").id == sub.id
+    assert dao.read_item_by_path(test_db, "uploads/root/renamed/sub/a.txt").id == leaf.id
+    assert dao.read_item_by_path(test_db, "uploads/root/folder") is None
+    assert dao.read_usage(test_db, root.id) == (10, 1)
+    assert dao.read_usage(test_db, folder.id) == (10, 1)
+
+def test_delete_updates_ancestors_usage(test_db: Session):
+    root = create_dir(test_db, "root")
+    sub = create_dir(test_db, "sub", root.id)
+    create_file(test_db, "a.txt", 10, sub.id)
+    create_file(test_db, "b.txt", 5, root.id)
+    
+    dao.delete_item(test_db, sub.id)
+    
+    assert dao.read_usage(test_db, root.id) == (5, 1)
+
+def test_update_file_size_applies_delta(test_db: Session):
+    root = create_dir(test_db, "root")
+    item = create_file(test_db, "a.txt", 10, root.id)
+    
+    dao.update_file_size(test_db, item, 25)
+    
+    assert item.size == 25
+    assert dao.read_usage(test_db, root.id) == (25, 1)
+
+def test_read_usage_not_found(test_db: Session):
+    assert dao.read_usage(test_db, "non-existent-id") is None
+
+def test_read_largest_dirs(test_db: Session):
+    small = create_dir(test_db, "small")
+    big = create_dir(test_db, "big")
+    create_file(test_db, "a.txt", 1, small.id)
+    create_file(test_db, "b.txt", 100, big.id)
+    
+    assert [item.id for item in dao.read_largest_dirs(test_db, 2)] == [big.id, small.id]
+
+def test_create_items_bulk_builds_tree(test_db: Session):
+    rows = dao.create_items_bulk(test_db, None, [
+        ("album/2024/a.jpg", 10, None, None),
+        ("album/2024/b.jpg", 20, None, None),
+        ("album/cover.png", 5, None, None),
+        ("album/empty", None, None, None),
+    ])
+    
+    paths = sorted(row["path"] for row in rows)
+    assert paths == [
+        "uploads/album", "uploads/album/2024", "uploads/album/2024/a.jpg",
+        "uploads/album/2024/b.jpg", "uploads/album/cover.png", "uploads/album/empty",
+    ]
+    album = dao.read_item_by_path(test_db, "uploads/album")
+    year = dao.read_item_by_path(test_db, "uploads/album/2024")
+    assert year.parent_id == album.id
+    assert dao.read_item_by_path(test_db, "uploads/album/2024/a.jpg").parent_id == year.id
+    assert dao.read_usage(test_db, album.id) == (35, 3)
+    assert dao.read_usage(test_db, year.id) == (30, 2)
+
+def test_create_items_bulk_reuses_existing_directories(test_db: Session):
+    root = create_dir(test_db, "root")
+    existing = create_dir(test_db, "existing", root.id)
+    
+    rows = dao.create_items_bulk(test_db, root.id, [("existing/new.txt", 7, None, None)])
+    
+    assert [row["parent_id"] for row in rows] == [existing.id]
+    assert dao.read_usage(test_db, existing.id) == (7, 1)
+    assert dao.read_usage(test_db, root.id) == (7, 1)
+
+def test_create_items_bulk_is_atomic(test_db: Session):
+    create_file(test_db, "taken.txt", 1)
+    with pytest.raises(IntegrityError):
+        dao.create_items_bulk(test_db, None, [("fresh.txt", 1, None, None), ("taken.txt", 1, None, None)])
+    assert dao.read_item_by_path(test_db, "uploads/fresh.txt") is None
+
+def test_create_items_bulk_rejects_file_as_directory(test_db: Session):
+    create_file(test_db, "file.txt", 1)
+    with pytest.raises(ValueError):
+        dao.create_items_bulk(test_db, None, [("file.txt/inner.txt", 1, None, None)])
+
+def test_create_items_bulk_invalid_parent(test_db: Session):
+    with pytest.raises(ValueError):
+        dao.create_items_bulk(test_db, "invalid-id", [("a.txt", 1, None, None)])
+
+@pytest.fixture
+def cached_dao():
+    return ItemDAO(cache=ItemCache(maxsize=100, ttl=60))
+
+def test_read_item_metadata_is_cached(test_db: Session, cached_dao):
+    file = create_file(test_db, "a.txt", 10)
+    
+    first = cached_dao.read_item_metadata(test_db, file.id)
+    second = cached_dao.read_item_metadata(test_db, file.id)
+    assert first == second
+    assert first.path == "uploads/a.txt"
+    assert cached_dao.cache.stats()["hits"] == 1
+    assert cached_dao.read_item_metadata(test_db, "invalid-id") is None
+
+def test_cache_invalidated_on_ancestor_usage_change(test_db: Session, cached_dao):
+    root = create_dir(test_db, "root")
+    assert cached_dao.read_item_metadata(test_db, root.id).size == 0
+    
+    cached_dao.create_item(test_db, ItemCreate(name="a.txt", is_dir=False, parent_id=root.id, size=10))
+    assert cached_dao.read_item_metadata(test_db, root.id).size == 10
+
+def test_cache_invalidated_on_move(test_db: Session, cached_dao):
+    root = create_dir(test_db, "root")
+    sub = create_dir(test_db, "sub", root.id)
+    file = create_file(test_db, "a.txt", 10, sub.id)
+    target = create_dir(test_db, "target")
+    for id in (root.id, sub.id, file.id, target.id):
+        cached_dao.read_item_metadata(test_db, id)
+    
+    cached_dao.update_item(test_db, ItemUpdate(id=sub.id, parent_id=target.id))
+    assert cached_dao.read_item_metadata(test_db, file.id).path == "uploads/target/sub/a.txt"
+    assert cached_dao.read_item_metadata(test_db, root.id).size == 0
+    assert cached_dao.read_item_metadata(test_db, target.id).size == 10
+
+def test_cache_invalidated_on_delete(test_db: Session, cached_dao):
+    root = create_dir(test_db, "root")
+    file = create_file(test_db, "a.txt", 10, root.id)
+    file_id = file.id
+    cached_dao.read_item_metadata(test_db, file_id)
+    
+    cached_dao.delete_item(test_db, root.id)
+    assert cached_dao.read_item_metadata(test_db, file_id) is None
+
+@pytest.fixture
+def search_tree(test_db: Session):
+    reports = create_dir(test_db, "reports")
+    for name in ("annual_report.pdf", "report-2024.txt", "notes.md"):
+        create_file(test_db, name, 1, reports.id)
+    archive = create_dir(test_db, "archive")
+    create_file(test_db, "old_report.txt", 1, archive.id)
+    return reports, archive
+
+def test_search_items_substring(test_db: Session, search_tree):
+    items, next_cursor = dao.search_items(test_db, "report", 10)
+    assert sorted(item.name for item in items) == ["annual_report.pdf", "old_report.txt", "report-2024.txt", "reports"]
+    assert next_cursor is None
+
+def test_search_items_prefix_and_filters(test_db: Session, search_tree):
+    reports, _ = search_tree
+    items, _ = dao.search_items(test_db, "report", 10, prefix=True)
+    assert sorted(item.name for item in items) == ["report-2024.txt", "reports"]
+    items, _ = dao.search_items(test_db, "report", 10, mimetype="text/*")
+    assert sorted(item.name for item in items) == ["old_report.txt", "report-2024.txt"]
+    items, _ = dao.search_items(test_db, "report", 10, folder=reports)
+    assert sorted(item.name for item in items) == ["annual_report.pdf", "report-2024.txt"]
+
+def test_search_items_short_terms(test_db: Session, search_tree):
+    items, _ = dao.search_items(test_db, "no", 10)
+    assert [item.name for item in items] == ["notes.md"]
+
+def test_search_items_pagination(test_db: Session, search_tree):
+    first, cursor = dao.search_items(test_db, "report", 3)
+    second, last_cursor = dao.search_items(test_db, "report", 3, int(cursor))
+    assert len(first) == 3 and len(second) == 1
+    assert last_cursor is None
+    assert not {item.id for item in first} & {item.id for item in second}
+
+def test_search_index_follows_moves_and_deletes(test_db: Session, search_tree):
+    reports, archive = search_tree
+    dao.update_item(test_db, ItemUpdate(id=reports.id, parent_id=archive.id))
+    items, _ = dao.search_items(test_db, "archive/reports/", 10, field="path", prefix=True)
+    assert len(items) == 3
+    
+    dao.delete_item(test_db, archive.id)
+    assert dao.search_items(test_db, "report", 10) == ([], None)
+
+def test_read_all_items_fills_children_without_lazy_loads(test_db: Session):
+    root = dao.create_item(test_db, ItemCreate(name="root", is_dir=True))
+    folder = dao.create_item(test_db, ItemCreate(name="folder", is_dir=True, parent_id=root.id))
+    dao.create_item(test_db, ItemCreate(name="file.txt", is_dir=False, parent_id=folder.id, size=1))
+    test_db.expunge_all()
+    
+    items = {item.name: item for item in dao.read_all_items(test_db)}
+    # Detached, any lazy load would raise
+    test_db.expunge_all()
+    assert [child.name for child in items["root"].children] == ["folder"]
+    assert [child.name for child in items["folder"].children] == ["file.txt"]
+    assert items["file.txt"].children == []
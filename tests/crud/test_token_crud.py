@@ -0,0 +1,56 @@
+import pytest
+from datetime import timedelta
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.models import Token, User
+from app.crud.token import TokenDAO, token_hash
+from app.crud.user import create_user
+from app.cache import LRUCache
+
+@pytest.fixture(autouse=True)
+def clear_tables(test_db):
+    test_db.execute(delete(Token))
+    test_db.execute(delete(User))
+    test_db.commit()
+
+@pytest.fixture
+def user(test_db: Session) -> User:
+    return create_user(test_db, "token_user", "hashed")
+
+def test_create_and_read_token(test_db: Session, user):
+    dao = TokenDAO()
+    token, expires_at = dao.create_token(test_db, user.id, timedelta(hours=1))
+    # Only the hash is stored
+    assert test_db.get(Token, token) is None
+    assert test_db.get(Token, token_hash(token)) is not None
+    
+    info = dao.read_token(test_db, token)
+    assert info.user_id == user.id
+    assert info.expires_at == expires_at
+    assert dao.read_token(test_db, "unknown") is None
+
+def test_expired_token(test_db: Session, user):
+    dao = TokenDAO(cache=LRUCache(10, 60))
+    token, _ = dao.create_token(test_db, user.id, timedelta(seconds=-1))
+    assert dao.read_token(test_db, token) is None
+    assert dao.prune_expired(test_db) == 1
+
+def test_cached_token_skips_the_database(test_db: Session, user):
+    dao = TokenDAO(cache=LRUCache(10, 60))
+    token, _ = dao.create_token(test_db, user.id, timedelta(hours=1))
+    assert dao.read_cached_token(token) is None
+    assert dao.read_token(test_db, token).user_id == user.id
+    
+    test_db.execute(delete(Token))
+    test_db.commit()
+    assert dao.read_cached_token(token).user_id == user.id
+    assert dao.read_token(test_db, token).user_id == user.id
+
+def test_delete_token_invalidates_cache(test_db: Session, user):
+    dao = TokenDAO(cache=LRUCache(10, 60))
+    token, _ = dao.create_token(test_db, user.id, timedelta(hours=1))
+    dao.read_token(test_db, token)
+    assert dao.delete_token(test_db, token)
+    assert dao.read_cached_token(token) is None
+    assert dao.read_token(test_db, token) is None
+    assert not dao.delete_token(test_db, token)
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.models import UploadSession, UploadChunk
+from app.schemas import UploadSessionCreate
+from app.crud.upload_session import UploadSessionDAO
+
+dao = UploadSessionDAO()
+
+@pytest.fixture
+def sample_session_data():
+    return UploadSessionCreate(
+        name="big_file.bin",
+        parent_id=None,
+        size=2500,
+        chunk_size=1000,
+    )
+
+@pytest.fixture(autouse=True)
+def clear_sessions_tables(test_db):
+    test_db.execute(delete(UploadChunk))
+    test_db.execute(delete(UploadSession))
+    test_db.commit()
+
+def test_create_session(test_db: Session, sample_session_data):
+    upload_session = dao.create_session(test_db, sample_session_data)
+    assert upload_session.id is not None
+    assert upload_session.chunk_count == 3
+    assert upload_session.chunk_length(0) == 1000
+    assert upload_session.chunk_length(2) == 500
+
+def test_empty_file_has_one_chunk(test_db: Session):
+    upload_session = dao.create_session(test_db, UploadSessionCreate(name="empty", size=0, chunk_size=1000))
+    assert upload_session.chunk_count == 1
+    assert upload_session.chunk_length(0) == 0
+
+def test_record_chunk_is_idempotent(test_db: Session, sample_session_data):
+    upload_session = dao.create_session(test_db, sample_session_data)
+    dao.record_chunk(test_db, upload_session.id, 2, 500)
+    dao.record_chunk(test_db, upload_session.id, 0, 1000)
+    dao.record_chunk(test_db, upload_session.id, 2, 500)
+    assert dao.received_chunks(test_db, upload_session.id) == [0, 2]
+
+def test_read_session_not_found(test_db: Session):
+    assert dao.read_session(test_db, "non-existent-id") is None
+
+def test_delete_session_removes_chunks(test_db: Session, sample_session_data):
+    upload_session = dao.create_session(test_db, sample_session_data)
+    dao.record_chunk(test_db, upload_session.id, 0, 1000)
+    deleted = dao.delete_session(test_db, upload_session.id)
+    assert deleted is not None
+    assert dao.read_session(test_db, upload_session.id) is None
+    assert dao.received_chunks(test_db, upload_session.id) == []
+
+def test_delete_nonexistent_session(test_db: Session):
+    assert dao.delete_session(test_db, "non-existent-id") is None
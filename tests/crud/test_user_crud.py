@@ -98,4 +98,9 @@ def test_delete_removes_user_from_db(test_db):
 
     # Confirm user no longer exists
     fetched = read_user(test_db, user.id)
-    assert fetched is None
\ No newline at end of file
+    assert fetched is None
+
+def test_read_user_by_username(test_db):
+    user = create_user(test_db, "carol", "hashedpw")
+    assert read_user_by_username(test_db, "carol").id == user.id
+    assert read_user_by_username(test_db, "nobody") is None
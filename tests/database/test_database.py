@@ -0,0 +1,40 @@
+import threading
+from sqlalchemy import text
+from app.database import create_db_engine, is_memory_database
+
+
+def test_is_memory_database():
+    assert is_memory_database("sqlite://")
+    assert is_memory_database("sqlite:///:memory:")
+    assert not is_memory_database("sqlite:///./cloud.db")
+
+def test_file_engine_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == -64 * 1024
+    engine.dispose()
+
+def test_readers_are_not_blocked_by_writer(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+    
+    with engine.connect() as writer:
+        writer.execute(text("BEGIN IMMEDIATE"))
+        writer.execute(text("INSERT INTO t VALUES (2)"))
+        
+        result = []
+        def read():
+            with engine.connect() as reader:
+                result.append(reader.execute(text("SELECT count(*) FROM t")).scalar())
+        
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(timeout=2)
+        assert result == [1]
+        writer.execute(text("ROLLBACK"))
+    engine.dispose()
@@ -0,0 +1,80 @@
+import anyio
+import io
+import random
+import zlib
+import pytest
+from app.delta import MAGIC, DeltaError, IterReader, ThreadStreamReader, apply_delta, block_signatures, encode_delta
+
+BLOCK_SIZE = 1024
+
+def random_bytes(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+def roundtrip(old: bytes, new: bytes) -> bytes:
+    signatures = list(block_signatures(io.BytesIO(old), BLOCK_SIZE))
+    delta = b"".join(encode_delta(new, signatures, BLOCK_SIZE))
+    assert b"".join(apply_delta(io.BytesIO(delta), io.BytesIO(old), len(old))) == new
+    return delta
+
+def test_signatures_cover_every_block():
+    signatures = list(block_signatures(io.BytesIO(b"a" * 2500), BLOCK_SIZE))
+    assert len(signatures) == 3
+    assert signatures[0] == signatures[1] != signatures[2]
+    assert signatures[2][0] == zlib.adler32(b"a" * 452)
+
+def test_unchanged_content_is_one_copy():
+    old = random_bytes(10 * BLOCK_SIZE)
+    assert len(roundtrip(old, old)) == len(MAGIC) + 13
+
+def test_shifted_content_is_found_by_rolling():
+    old = random_bytes(20 * BLOCK_SIZE)
+    new = old[:3000] + b"inserted" + old[3000:15000] + old[17000:] + b"appended"
+    delta = roundtrip(old, new)
+    # Only the blocks around the edits travel as literals
+    assert len(delta) < 4 * BLOCK_SIZE
+
+def test_unrelated_content_is_all_literal():
+    old = random_bytes(5 * BLOCK_SIZE, seed=1)
+    new = random_bytes(5 * BLOCK_SIZE, seed=2)
+    assert len(roundtrip(old, new)) == len(MAGIC) + 5 + len(new)
+
+def test_empty_versions():
+    assert roundtrip(b"", b"new") == MAGIC + b"D\x00\x00\x00\x03new"
+    assert roundtrip(random_bytes(BLOCK_SIZE), b"") == MAGIC
+
+@pytest.mark.parametrize("delta", [
+    b"nope",
+    MAGIC + b"X",
+    MAGIC + b"C\x00\x00",
+    MAGIC + b"C" + (90).to_bytes(8, "big") + (20).to_bytes(4, "big"),
+    MAGIC + b"D\x00\x00\x00\x05abc",
+])
+def test_invalid_deltas(delta: bytes):
+    with pytest.raises(DeltaError):
+        b"".join(apply_delta(io.BytesIO(delta), io.BytesIO(b"x" * 100), 100))
+
+def test_iter_reader():
+    reader = IterReader(iter([b"ab", b"", b"cde", b"f"]))
+    assert reader.read(3) == b"abc"
+    assert reader.read(1) == b"d"
+    assert reader.read() == b"ef"
+    assert reader.read(2) == b""
+
+def test_iter_reader_small_reads_of_a_large_chunk():
+    data = random_bytes(100_000)
+    reader = IterReader(iter([data[:70_000], data[70_000:]]))
+    parts = []
+    while part := reader.read(7):
+        parts.append(part)
+    assert b"".join(parts) == data
+
+def test_thread_stream_reader():
+    async def body():
+        for chunk in (b"first ", b"second"):
+            yield chunk
+
+    async def main():
+        reader = ThreadStreamReader(body())
+        return await anyio.to_thread.run_sync(lambda: (reader.read(3), reader.read()))
+
+    assert anyio.run(main) == (b"fir", b"st second")
@@ -0,0 +1,105 @@
+import anyio
+import gzip
+import pytest
+from datetime import datetime, timezone
+from starlette.requests import Request
+from app.models import Item
+from app.compression import accepts_gzip
+from app.downloads import item_etag, item_last_modified, etag_matches, is_not_modified, build_file_response
+
+
+def make_request(headers: dict) -> Request:
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw_headers})
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+@pytest.fixture
+def sample_item():
+    return Item(
+        id="abc",
+        name="file.txt",
+        is_dir=False,
+        path="uploads/file.txt",
+        size=10,
+        updated_at=datetime(2025, 5, 18, 16, 0, 0, 500, tzinfo=timezone.utc),
+    )
+
+def test_item_etag_is_strong_and_stable(sample_item):
+    etag = item_etag(sample_item)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == item_etag(sample_item)
+
+def test_item_etag_changes_with_metadata(sample_item):
+    etag = item_etag(sample_item)
+    sample_item.size = 11
+    assert item_etag(sample_item) != etag
+
+def test_item_last_modified_is_utc(sample_item):
+    sample_item.updated_at = datetime(2025, 5, 18, 16, 0, 0)
+    assert item_last_modified(sample_item).tzinfo == timezone.utc
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"a"', '"b"')
+
+def test_not_modified_if_none_match(sample_item):
+    etag = item_etag(sample_item)
+    assert is_not_modified(make_request({"If-None-Match": etag}), etag, None)
+    assert not is_not_modified(make_request({"If-None-Match": '"other"'}), etag, None)
+
+def test_not_modified_if_modified_since(sample_item):
+    last_modified = item_last_modified(sample_item)
+    etag = item_etag(sample_item)
+    request = make_request({"If-Modified-Since": "Sun, 18 May 2025 16:00:00 GMT"})
+    assert is_not_modified(request, etag, last_modified)
+    request = make_request({"If-Modified-Since": "Sun, 18 May 2025 15:59:59 GMT"})
+    assert not is_not_modified(request, etag, last_modified)
+
+def test_if_none_match_takes_precedence(sample_item):
+    request = make_request({"If-None-Match": '"other"', "If-Modified-Since": "Sun, 18 May 2030 16:00:00 GMT"})
+    assert not is_not_modified(request, item_etag(sample_item), item_last_modified(sample_item))
+
+def test_accepts_gzip():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip(None)
+    assert not accepts_gzip("br")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("*, gzip;q=0")
+
+@pytest.fixture
+def compressed_item(sample_item, tmp_path):
+    content = b"compressible text\n" * 100
+    path = tmp_path / "stored"
+    path.write_bytes(gzip.compress(content))
+    sample_item.size = len(content)
+    sample_item.encoding = "gzip"
+    return sample_item, str(path), content
+
+def test_compressed_file_passes_through(compressed_item):
+    item, path, _ = compressed_item
+    response = build_file_response(make_request({"Accept-Encoding": "gzip"}), item, path)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == item_etag(item, "gzip")
+    assert response.headers["etag"] != item_etag(item)
+
+def test_compressed_file_is_decompressed_for_other_clients(compressed_item):
+    item, path, content = compressed_item
+    response = build_file_response(make_request({"Accept-Encoding": "br"}), item, path)
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(content))
+    assert response.headers["etag"] == item_etag(item)
+    assert anyio.run(read_body, response) == content
+
+def test_compressed_representations_validate_separately(compressed_item):
+    item, path, _ = compressed_item
+    request = make_request({"Accept-Encoding": "gzip", "If-None-Match": item_etag(item)})
+    assert build_file_response(request, item, path).status_code == 200
+    request = make_request({"Accept-Encoding": "gzip", "If-None-Match": item_etag(item, "gzip")})
+    assert build_file_response(request, item, path).status_code == 304
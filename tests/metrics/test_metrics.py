@@ -0,0 +1,78 @@
+import anyio
+from fastapi import FastAPI, Request
+from sqlalchemy import create_engine, text
+from app.metrics import Registry, MetricsMiddleware, instrument_engine, statement_operation, http_request_duration, http_request_bytes, http_response_bytes, db_query_duration
+
+
+def test_counter_renders_labels():
+    registry = Registry()
+    counter = registry.counter("things_total", "Things", ("kind",))
+    counter.inc(("a",))
+    counter.inc(("a",), 2)
+    counter.inc(('say "hi"',))
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP things_total Things", "# TYPE things_total counter"]
+    assert 'things_total{kind="a"} 3' in lines
+    assert 'things_total{kind="say \\"hi\\""} 1' in lines
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+
+def test_statement_operation():
+    assert statement_operation("  select 1") == "SELECT"
+    assert statement_operation("INSERT INTO items VALUES (?)") == "INSERT"
+    assert statement_operation("") == "OTHER"
+
+def test_engine_queries_are_timed():
+    engine = create_engine("sqlite:///:memory:")
+    instrument_engine(engine)
+    # Instrumenting twice does not count twice
+    instrument_engine(engine)
+    before = db_query_duration.values.get(("SELECT",), ([0], [0.0]))[0]
+    before = sum(before)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert sum(db_query_duration.values[("SELECT",)][0]) == before + 2
+
+def call(app, method: str, path: str, body: bytes = b"") -> list[dict]:
+    messages = []
+    scope = {"type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"", "headers": [], "root_path": ""}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    anyio.run(app, scope, receive, send)
+    return messages
+
+def test_middleware_records_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.post("/things/{id}")
+    async def echo(id: str, request: Request):
+        return {"id": id, "size": len(await request.body())}
+
+    call(app, "POST", "/things/1", b"12345")
+    call(app, "POST", "/things/2")
+    call(app, "GET", "/missing")
+
+    counts = http_request_duration.values[("POST", "/things/{id}", "200")][0]
+    assert sum(counts) == 2
+    assert sum(http_request_duration.values[("GET", "unmatched", "404")][0]) >= 1
+    assert http_request_bytes.values[("POST", "/things/{id}")] >= 5
+    assert http_response_bytes.values[("POST", "/things/{id}")] >= len(b'{"id":"1","size":5}') * 2
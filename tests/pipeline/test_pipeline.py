@@ -0,0 +1,116 @@
+import hashlib
+import os
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.models import Item, Job
+from app.schemas import ItemCreate
+from app.crud.item import ItemDAO
+from app.pipeline import JobPipeline
+from app.processors import PROCESSORS, sniff_mimetype
+from app.uploads_manager import UploadsManager
+
+item_dao = ItemDAO()
+
+
+@pytest.fixture(autouse=True)
+def clear_tables(test_db):
+    test_db.execute(delete(Job))
+    test_db.execute(delete(Item))
+    test_db.commit()
+
+def make_pipeline(processors: dict = PROCESSORS, max_attempts: int = 3) -> JobPipeline:
+    return JobPipeline(processors=processors, max_attempts=max_attempts)
+
+def create_stored_file(db: Session, name: str, content: bytes) -> Item:
+    item = item_dao.create_item(db, ItemCreate(name=name, is_dir=False, size=len(content)))
+    UploadsManager().create_or_update_file(item.id, content)
+    return item
+
+def run_all(pipeline: JobPipeline, db: Session) -> int:
+    runs = 0
+    while pipeline.run_once(db, UploadsManager()):
+        runs += 1
+    return runs
+
+def test_sniff_mimetype():
+    assert sniff_mimetype(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert sniff_mimetype(b"%PDF-1.7") == "application/pdf"
+    assert sniff_mimetype(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_mimetype(b"\x00\x00\x00\x18ftypisom") == "video/mp4"
+    assert sniff_mimetype(b"plain text") is None
+
+def test_pipeline_enriches_items(test_db: Session):
+    content = "Meeting notes\nDécisions prises\n".encode()
+    item = create_stored_file(test_db, "notes", content)
+    image = create_stored_file(test_db, "photo.txt", b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+    pipeline = make_pipeline()
+    
+    pipeline.enqueue(test_db, [item.id, image.id])
+    test_db.refresh(item)
+    assert item.processing_status == "pending"
+    assert run_all(pipeline, test_db) == 6
+    
+    test_db.refresh(item)
+    test_db.refresh(image)
+    assert item.processing_status == "done"
+    assert item.content_hash == hashlib.sha256(content).hexdigest()
+    assert item.mimetype == "text/plain"
+    assert item.preview == content.decode()
+    assert image.mimetype == "image/png"
+    assert image.preview is None
+    assert test_db.execute(select(Job)).first() is None
+    
+    for stored in (item, image):
+        os.remove(f"uploads/{stored.id}")
+
+def test_failed_jobs_are_retried_then_kept(test_db: Session):
+    item = create_stored_file(test_db, "flaky.txt", b"content")
+    calls = []
+    
+    def flaky(item, open_content):
+        calls.append(item.id)
+        raise RuntimeError("temporary failure")
+    
+    pipeline = make_pipeline({"flaky": flaky}, max_attempts=2)
+    pipeline.enqueue(test_db, [item.id])
+    
+    assert pipeline.run_once(test_db, UploadsManager())
+    job = test_db.execute(select(Job)).scalar_one()
+    test_db.refresh(job)
+    assert job.status == "pending" and job.attempts == 1
+    assert "temporary failure" in job.last_error
+    
+    # Make the retry due now
+    test_db.execute(update(Job).values(run_after=datetime(2000, 1, 1, tzinfo=timezone.utc)))
+    test_db.commit()
+    assert pipeline.run_once(test_db, UploadsManager())
+    test_db.refresh(job)
+    test_db.refresh(item)
+    assert job.status == "failed" and job.attempts == 2
+    assert item.processing_status == "failed"
+    assert not pipeline.run_once(test_db, UploadsManager())
+    assert len(calls) == 2
+    
+    os.remove(f"uploads/{item.id}")
+
+def test_jobs_of_deleted_items_are_dropped(test_db: Session):
+    item = create_stored_file(test_db, "gone.txt", b"content")
+    pipeline = make_pipeline()
+    pipeline.enqueue(test_db, [item.id])
+    
+    item_dao.delete_item(test_db, item.id)
+    assert test_db.execute(select(Job)).first() is None
+    assert not pipeline.run_once(test_db, UploadsManager())
+    # Nothing reclaims the removal here
+    os.remove(f"uploads/{item.id}")
+
+def test_disabled_pipeline_queues_nothing(test_db: Session):
+    item = create_stored_file(test_db, "plain.txt", b"content")
+    JobPipeline(workers=0).enqueue(test_db, [item.id])
+    
+    test_db.refresh(item)
+    assert item.processing_status is None
+    assert test_db.execute(select(Job)).first() is None
+    os.remove(f"uploads/{item.id}")
@@ -0,0 +1,64 @@
+import anyio
+import logging
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from app.profiler import QueryProfile, ProfilerMiddleware, current_profile, instrument_engine, statement_shape
+
+
+def test_statement_shape_collapses_in_lists():
+    assert statement_shape("SELECT *\n  FROM items WHERE id IN (?, ?, ?)") == "SELECT * FROM items WHERE id IN (?)"
+    assert statement_shape("SELECT * FROM items WHERE id IN (?)") == "SELECT * FROM items WHERE id IN (?)"
+
+def test_repeated_shapes_and_slow_queries(caplog):
+    profile = QueryProfile(slow_query_ms=50, n_plus_one_threshold=3)
+    for i in range(3):
+        profile.record("SELECT * FROM items WHERE parent_id = ?", (str(i),), 0.001)
+    profile.record("UPDATE items SET size = ?", (1,), 0.001)
+    with caplog.at_level(logging.WARNING, logger="app.profiler"):
+        profile.record("SELECT count(*) FROM items", (), 0.2)
+
+    assert profile.count == 5
+    assert profile.repeated_shapes() == [("SELECT * FROM items WHERE parent_id = ?", 3)]
+    assert "Slow query (200.0 ms): SELECT count(*) FROM items" in caplog.text
+
+def test_queries_outside_a_request_are_ignored():
+    engine = create_engine("sqlite:///:memory:")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert current_profile.get() is None
+
+def call(app, path: str) -> list[dict]:
+    messages = []
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"", "headers": [], "root_path": ""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    anyio.run(app, scope, receive, send)
+    return messages
+
+def test_middleware_counts_queries_of_sync_endpoints(caplog):
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, n_plus_one_threshold=3, add_header=True)
+
+    # Runs in the thread pool
+    @app.get("/loop")
+    def loop():
+        with engine.connect() as conn:
+            for i in range(4):
+                conn.execute(text("SELECT :i"), {"i": i})
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger="app.profiler"):
+        messages = call(app, "/loop")
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"x-query-count"] == b"4"
+    assert b"x-query-time-ms" in headers
+    assert "Possible N+1 in GET /loop, 4 executions of: SELECT ?" in caplog.text
@@ -0,0 +1,73 @@
+import os
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.models import Blob, Item, PendingRemoval
+from app.reclaimer import Reclaimer
+from app.uploads_manager import UploadsManager
+
+
+@pytest.fixture(autouse=True)
+def clear_tables(test_db):
+    test_db.execute(delete(PendingRemoval))
+    test_db.execute(delete(Blob))
+    test_db.commit()
+
+def make_reclaimer(db: Session, batch_size: int = 2) -> Reclaimer:
+    return Reclaimer(session_factory=lambda: db, batch_size=batch_size)
+
+def test_reclaim_removes_queued_files(test_db: Session):
+    uploads_manager = UploadsManager()
+    for i in range(5):
+        uploads_manager.create_or_update_file(f"reclaim_{i}", b"data")
+        test_db.add(PendingRemoval(item_id=f"reclaim_{i}"))
+    test_db.commit()
+    
+    reclaimed = make_reclaimer(test_db).reclaim()
+    
+    assert reclaimed == 5
+    assert not any(os.path.exists(f"uploads/reclaim_{i}") for i in range(5))
+    assert test_db.execute(select(PendingRemoval)).first() is None
+
+def test_reclaim_tolerates_already_removed_files(test_db: Session):
+    test_db.add(PendingRemoval(item_id="never_written"))
+    test_db.commit()
+    
+    assert make_reclaimer(test_db).reclaim() == 1
+    assert test_db.execute(select(PendingRemoval)).first() is None
+
+def test_reclaim_collects_unreferenced_blobs(test_db: Session):
+    uploads_manager = UploadsManager(content_addressed=True)
+    with open(__file__, "rb") as f:
+        tmp_path, size, blob_hash, _ = uploads_manager.write_temp(f, hash_name="sha256")
+    uploads_manager.place_blob(tmp_path, blob_hash)
+    test_db.add(Blob(hash=blob_hash, size=size, ref_count=0))
+    test_db.commit()
+    
+    make_reclaimer(test_db).reclaim()
+    
+    assert not os.path.exists(uploads_manager.blob_path(blob_hash))
+    assert test_db.get(Blob, blob_hash) is None
+
+def test_request_arriving_before_release_is_not_lost(test_db: Session):
+    reclaimer = make_reclaimer(test_db)
+    lock = reclaimer.lock
+    requests = []
+    
+    # Another delete comes in after the last check, while the lock is still held
+    class RacingLock:
+        def acquire(self, blocking: bool = True) -> bool:
+            return lock.acquire(blocking)
+        
+        def release(self):
+            if not requests:
+                test_db.add(PendingRemoval(item_id="late"))
+                test_db.commit()
+                requests.append(reclaimer.reclaim())
+            lock.release()
+    
+    reclaimer.lock = RacingLock()
+    reclaimer.reclaim()
+    
+    assert requests == [0]
+    assert test_db.execute(select(PendingRemoval)).first() is None
@@ -0,0 +1,67 @@
+import io
+import os
+import pytest
+from app.models import Item
+from app.relayout import relayout
+from app.uploads_manager import UploadsManager
+
+
+@pytest.fixture(autouse=True)
+def isolated_uploads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def test_relayout_moves_files_and_blobs():
+    flat = UploadsManager(content_addressed=True)
+    flat.create_or_update_file("0a1b2c3d-file", b"file content")
+    tmp_path, _, blob_hash, _ = flat.write_temp(io.BytesIO(b"blob content"), hash_name="sha256")
+    flat.place_blob(tmp_path, blob_hash)
+    os.makedirs("uploads/.sessions")
+    
+    sharded = UploadsManager(content_addressed=True, layout="sharded")
+    assert relayout(sharded) == 2
+    
+    assert os.path.exists("uploads/0a/1b/0a1b2c3d-file")
+    assert os.path.exists(f"uploads/blobs/{blob_hash[:2]}/{blob_hash[2:4]}/{blob_hash}")
+    assert not os.path.exists("uploads/0a1b2c3d-file")
+    assert os.path.isdir("uploads/.sessions")
+    # Resuming a finished migration finds nothing left to move
+    assert relayout(sharded) == 0
+
+def test_reads_fall_back_to_the_old_layout():
+    UploadsManager().create_or_update_file("0a1b2c3d-file", b"old layout")
+    sharded = UploadsManager(layout="sharded")
+    item = Item(id="0a1b2c3d-file")
+    
+    assert sharded.item_path(item) == "uploads/0a1b2c3d-file"
+    relayout(sharded)
+    assert sharded.item_path(item) == "uploads/0a/1b/0a1b2c3d-file"
+    with sharded.open_item(item) as f:
+        assert f.read() == b"old layout"
+
+def test_relayout_keeps_newer_copy():
+    UploadsManager().create_or_update_file("0a1b2c3d-file", b"stale")
+    sharded = UploadsManager(layout="sharded")
+    sharded.create_or_update_file("0a1b2c3d-file", b"rewritten")
+    
+    relayout(sharded)
+    with open("uploads/0a/1b/0a1b2c3d-file", "rb") as f:
+        assert f.read() == b"rewritten"
+    assert not os.path.exists("uploads/0a1b2c3d-file")
+
+def test_relayout_back_to_flat():
+    UploadsManager(layout="sharded").create_or_update_file("0a1b2c3d-file", b"content")
+    
+    assert relayout(UploadsManager()) == 1
+    assert os.path.exists("uploads/0a1b2c3d-file")
+    assert not os.path.exists("uploads/0a")
+
+def test_remove_file_under_both_layouts():
+    UploadsManager().create_or_update_file("0a1b2c3d-file", b"stale")
+    sharded = UploadsManager(layout="sharded")
+    sharded.create_or_update_file("0a1b2c3d-file", b"rewritten")
+    
+    sharded.remove_file("0a1b2c3d-file")
+    assert not os.path.exists("uploads/0a1b2c3d-file")
+    assert not os.path.exists("uploads/0a/1b/0a1b2c3d-file")
+    with pytest.raises(FileNotFoundError):
+        sharded.remove_file("0a1b2c3d-file")
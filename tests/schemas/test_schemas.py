@@ -0,0 +1,18 @@
+import pytest
+from pydantic import ValidationError
+from app.schemas import ItemCreate, ItemUpdate, UploadSessionCreate
+
+@pytest.mark.parametrize("name", ["", ".", "..", "a/b", "/", "folder/"])
+def test_invalid_names_are_rejected(name: str):
+    with pytest.raises(ValidationError):
+        ItemCreate(name=name, is_dir=True)
+    with pytest.raises(ValidationError):
+        ItemUpdate(id="id", name=name)
+    with pytest.raises(ValidationError):
+        UploadSessionCreate(name=name, size=1)
+
+def test_valid_names_are_kept():
+    assert ItemCreate(name=".hidden", is_dir=False, size=1).name == ".hidden"
+    assert ItemCreate(name="a..b", is_dir=True).name == "a..b"
+    assert ItemUpdate(id="id").name is None
+    assert UploadSessionCreate(name="file name.txt", size=1).name == "file name.txt"
@@ -0,0 +1,39 @@
+import anyio
+from app.security import PasswordHasher, hash_password, verify_password, DUMMY_HASH
+
+# Cheap parameters, the cost is part of the stored hash
+def fast_hash(password: str) -> str:
+    return hash_password(password, n=2 ** 4)
+
+def test_verify_password():
+    hashed = fast_hash("correct horse")
+    assert hashed.startswith("scrypt$16$8$1$")
+    assert verify_password("correct horse", hashed)
+    assert not verify_password("wrong horse", hashed)
+
+def test_hashes_are_salted():
+    assert fast_hash("password") != fast_hash("password")
+
+def test_verify_rejects_other_formats():
+    assert not verify_password("password", "password")
+    assert not verify_password("password", "bcrypt$1$2$3$abc$def")
+    assert not verify_password("password", "scrypt$x$8$1$abc$def")
+    assert not verify_password("password", DUMMY_HASH)
+
+def test_hasher_in_worker_processes():
+    hasher = PasswordHasher(workers=1)
+    async def main():
+        hashed = await hasher.hash("secret")
+        return await hasher.verify("secret", hashed), await hasher.verify("other", hashed)
+    try:
+        assert anyio.run(main) == (True, False)
+    finally:
+        hasher.shutdown()
+    assert hasher.executor is None
+
+def test_hasher_without_workers_uses_a_thread():
+    hasher = PasswordHasher(workers=0)
+    async def main():
+        return await hasher.verify("secret", await hasher.hash("secret"))
+    assert anyio.run(main)
+    assert hasher.executor is None
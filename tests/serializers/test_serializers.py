@@ -0,0 +1,59 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.models import Item
+from app.schemas import ItemBase, ItemPage
+from app.crud.item import ItemDAO, SUMMARY_COLUMNS
+from app import serializers
+
+dao = ItemDAO()
+
+@pytest.fixture(autouse=True)
+def clear_items_table(test_db):
+    test_db.execute(delete(Item))
+    test_db.commit()
+
+@pytest.fixture
+def sample_tree(test_db: Session):
+    dao.create_items_bulk(test_db, None, [
+        ("album/2024/a.jpg", 10, None, None),
+        ("album/2024/b.jpg", 20, None, None),
+        ("album/notes é.txt", 5, None, None),
+        ("other/c.txt", 1, None, None),
+    ])
+    return dao.read_item_by_path(test_db, "uploads/album")
+
+def test_encode_datetime():
+    assert serializers.encode_datetime(datetime(2024, 1, 2, 3, 4, 5, 6)) == "2024-01-02T03:04:05.000006"
+    assert serializers.encode_datetime(datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)) == "2024-01-02T03:04:05Z"
+    assert serializers.encode_datetime(None) is None
+
+def test_nested_items_matches_models(test_db: Session, sample_tree):
+    expected = [ItemBase.model_validate(item).model_dump(mode="json") for item in dao.read_all_items(test_db)]
+    encoded = serializers.nested_items(dao.read_all_items(test_db, SUMMARY_COLUMNS))
+    assert json.loads(encoded) == expected
+
+def test_page_matches_models(test_db: Session, sample_tree):
+    items, cursor = dao.read_items_page(test_db, 3)
+    rows, row_cursor = dao.read_items_page(test_db, 3, columns=SUMMARY_COLUMNS)
+    assert row_cursor == cursor
+    expected = ItemPage(items=items, next_cursor=cursor).model_dump_json().encode()
+    assert serializers.dumps(serializers.page(rows, row_cursor)) == expected
+
+def test_tree_depth(test_db: Session, sample_tree):
+    rows = dao.read_tree(test_db, None, 2, SUMMARY_COLUMNS)
+    tree = serializers.tree(rows, None, 2)
+    assert [item["name"] for item in tree] == ["album", "other"]
+    album = tree[0]
+    assert [item["name"] for item in album["children"]] == ["2024", "notes é.txt"]
+    # The directories at the depth limit and the files are not expanded
+    assert [item["children"] for item in album["children"]] == [None, None]
+
+def test_tree_of_directory(test_db: Session, sample_tree):
+    rows = dao.read_tree(test_db, sample_tree, 3, SUMMARY_COLUMNS)
+    tree = serializers.tree(rows, sample_tree.id, 3)
+    year = tree[0]
+    assert [item["name"] for item in year["children"]] == ["a.jpg", "b.jpg"]
+    assert year["children"][0]["children"] is None
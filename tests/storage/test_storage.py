@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+import tarfile
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Blob, Item, PendingRemoval
+from app.crud.item import ItemDAO
+from app.schemas import ItemCreate
+from app.delta import MAGIC, DeltaError
+from app.storage import QuotaExceeded, normalize_relative_path, import_tar, store_item_file, replace_item_file, apply_item_delta
+from app.config import settings
+from app.uploads_manager import UploadsManager
+
+dao = ItemDAO()
+
+@pytest.fixture(autouse=True)
+def clear_items_table(test_db):
+    test_db.execute(delete(Item))
+    test_db.commit()
+
+def make_tar(members: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                archive.addfile(info)
+            else:
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+    buffer.seek(0)
+    return buffer
+
+def test_normalize_relative_path():
+    assert normalize_relative_path("a//b/./c.txt") == "a/b/c.txt"
+    for path in ("", "/etc/passwd", "../up.txt", "a/../../b"):
+        with pytest.raises(ValueError):
+            normalize_relative_path(path)
+
+def test_import_tar(test_db: Session):
+    archive = make_tar({
+        "import_dir": None,
+        "import_dir/a.txt": b"first",
+        "import_dir/sub/b.txt": b"second",
+        "../escape.txt": b"nope",
+    })
+    
+    rows = import_tar(test_db, dao, UploadsManager(), None, archive)
+    
+    files = {row["path"]: row for row in rows if not row["is_dir"]}
+    assert set(files) == {"uploads/import_dir/a.txt", "uploads/import_dir/sub/b.txt"}
+    with open(f"uploads/{files['uploads/import_dir/sub/b.txt']['id']}", "rb") as f:
+        assert f.read() == b"second"
+    assert dao.read_usage(test_db, dao.read_item_by_path(test_db, "uploads/import_dir").id) == (11, 2)
+    
+    for row in files.values():
+        os.remove(f"uploads/{row['id']}")
+
+def test_import_tar_conflict_removes_staged_files(test_db: Session):
+    import_tar(test_db, dao, UploadsManager(), None, make_tar({"conflict.txt": b"one"}))
+    before = set(os.listdir("uploads"))
+    
+    with pytest.raises(IntegrityError):
+        import_tar(test_db, dao, UploadsManager(), None, make_tar({"conflict.txt": b"two"}))
+    
+    assert set(os.listdir("uploads")) == before
+    os.remove(f"uploads/{dao.read_item_by_path(test_db, 'uploads/conflict.txt').id}")
+
+def test_import_tar_over_quota_removes_staged_files(test_db: Session, monkeypatch):
+    monkeypatch.setattr(settings, "storage_quota", 8)
+    os.makedirs("uploads", exist_ok=True)
+    before = set(os.listdir("uploads"))
+    
+    with pytest.raises(QuotaExceeded):
+        import_tar(test_db, dao, UploadsManager(), None, make_tar({"big/a.txt": b"12345", "big/b.txt": b"67890"}))
+    
+    assert set(os.listdir("uploads")) == before
+    assert dao.read_item_by_path(test_db, "uploads/big") is None
+
+@pytest.mark.parametrize("content_addressed", [False, True])
+def test_apply_item_delta(test_db: Session, content_addressed: bool, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    u_manager = UploadsManager(content_addressed=content_addressed)
+    db_item = dao.create_item(test_db, ItemCreate(name="delta.bin", is_dir=False))
+    store_item_file(test_db, dao, u_manager, db_item, io.BytesIO(b"0123456789"))
+    updated_at = db_item.updated_at
+    
+    # Same size, new content
+    delta = MAGIC + b"C" + (0).to_bytes(8, "big") + (5).to_bytes(4, "big") + b"D" + (5).to_bytes(4, "big") + b"abcde"
+    apply_item_delta(test_db, dao, u_manager, db_item, io.BytesIO(delta), 10, hashlib.sha256(b"01234abcde").hexdigest())
+    
+    assert db_item.size == 10
+    assert db_item.updated_at != updated_at
+    with u_manager.open_item(db_item) as f:
+        assert f.read() == b"01234abcde"
+    
+    with pytest.raises(DeltaError):
+        apply_item_delta(test_db, dao, u_manager, db_item, io.BytesIO(MAGIC + b"D" + (1).to_bytes(4, "big") + b"x"), 2)
+    with u_manager.open_item(db_item) as f:
+        assert f.read() == b"01234abcde"
+    assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+
+def test_replace_blob_with_flat_file(test_db: Session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_item = dao.create_item(test_db, ItemCreate(name="to_flat.bin", is_dir=False))
+    store_item_file(test_db, dao, UploadsManager(content_addressed=True), db_item, io.BytesIO(b"blob version"))
+    blob_hash = db_item.blob_hash
+    
+    flat = UploadsManager()
+    replace_item_file(test_db, dao, flat, db_item, io.BytesIO(b"flat version, longer"))
+    
+    assert db_item.blob_hash is None
+    assert db_item.size == 20
+    assert test_db.get(Blob, blob_hash).ref_count == 0
+    with flat.open_item(db_item) as f:
+        assert f.read() == b"flat version, longer"
+
+def test_replace_flat_file_with_blob(test_db: Session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    test_db.execute(delete(PendingRemoval))
+    db_item = dao.create_item(test_db, ItemCreate(name="to_blob.bin", is_dir=False))
+    store_item_file(test_db, dao, UploadsManager(), db_item, io.BytesIO(b"flat version"))
+    
+    content_addressed = UploadsManager(content_addressed=True)
+    replace_item_file(test_db, dao, content_addressed, db_item, io.BytesIO(b"blob version"))
+    
+    assert db_item.blob_hash == hashlib.sha256(b"blob version").hexdigest()
+    # The flat file is left to the reclaimer
+    assert test_db.execute(select(PendingRemoval.item_id)).scalars().all() == [db_item.id]
+    with content_addressed.open_item(db_item) as f:
+        assert f.read() == b"blob version"
@@ -0,0 +1,63 @@
+import anyio
+import io
+import os
+import threading
+import time
+from app.uploads_manager import UploadsManager, AsyncUploadsManager
+
+
+def test_write_stream_off_the_event_loop():
+    async_manager = AsyncUploadsManager(UploadsManager(), anyio.CapacityLimiter(2))
+    
+    async def main():
+        return await async_manager.write_stream("async_test", io.BytesIO(b"async content"))
+    
+    size, _ = anyio.run(main)
+    
+    with open("uploads/async_test", "rb") as f:
+        assert f.read() == b"async content"
+    assert size == len(b"async content")
+    
+    anyio.run(async_manager.remove_file, "async_test")
+    assert not os.path.exists("uploads/async_test")
+
+def test_concurrency_is_bounded():
+    async_manager = AsyncUploadsManager(UploadsManager(), anyio.CapacityLimiter(2))
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+    
+    def blocking_work():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+    
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for _ in range(6):
+                tg.start_soon(async_manager.run, blocking_work)
+    
+    anyio.run(main)
+    assert peak == 2
+
+def test_event_loop_stays_responsive():
+    async_manager = AsyncUploadsManager(UploadsManager(), anyio.CapacityLimiter(1))
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await anyio.sleep(0.01)
+            ticks += 1
+    
+    async def main():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(ticker)
+            await async_manager.run(time.sleep, 0.2)
+    
+    anyio.run(main)
+    assert ticks == 5
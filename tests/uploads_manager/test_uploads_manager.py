@@ -1,6 +1,9 @@
 import pytest
 import os
+import io
+import hashlib
 from pathlib import Path
+from app.models import Item
 from app.uploads_manager import UploadsManager
 
 
@@ -31,4 +34,119 @@ def test_remove_file():
     uploads_manager.remove_file("new_dir")
     
     assert os.path.exists("uploads/new_dir") == False
-    
\ No newline at end of file
+
+def test_write_stream():
+    uploads_manager = UploadsManager()
+    content = os.urandom(10_000)
+    
+    size, digest = uploads_manager.write_stream("stream_test", io.BytesIO(content), chunk_size=1024, hash_name="sha256")
+    
+    with open("uploads/stream_test", "rb") as f:
+        data = f.read()
+    
+    assert data == content
+    assert size == len(content)
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+    
+    os.remove("uploads/stream_test")
+
+def test_write_stream_failure_keeps_previous_file():
+    uploads_manager = UploadsManager()
+    uploads_manager.create_or_update_file("stream_fail", b"original")
+    
+    class BrokenStream(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("connection dropped")
+    
+    with pytest.raises(OSError):
+        uploads_manager.write_stream("stream_fail", BrokenStream())
+    
+    with open("uploads/stream_fail", "rb") as f:
+        assert f.read() == b"original"
+    assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+    
+    os.remove("uploads/stream_fail")
+
+def test_session_file_assembly():
+    uploads_manager = UploadsManager()
+    uploads_manager.create_session_file("session_test", 10)
+    
+    uploads_manager.write_chunk("session_test", 6, b"6789")
+    uploads_manager.write_chunk("session_test", 0, b"012345")
+    uploads_manager.commit_session_file("session_test", "assembled_test")
+    
+    with open("uploads/assembled_test", "rb") as f:
+        assert f.read() == b"0123456789"
+    assert not os.path.exists("uploads/.sessions/session_test")
+    
+    os.remove("uploads/assembled_test")
+
+def test_remove_session_file():
+    uploads_manager = UploadsManager()
+    uploads_manager.create_session_file("session_remove", 10)
+    uploads_manager.remove_session_file("session_remove")
+    uploads_manager.remove_session_file("session_remove")
+    
+    assert not os.path.exists("uploads/.sessions/session_remove")
+
+def test_place_blob_deduplicates():
+    uploads_manager = UploadsManager(content_addressed=True)
+    content = b"same content"
+    
+    first_tmp, size, first_hash, _ = uploads_manager.write_temp(io.BytesIO(content), hash_name="sha256")
+    second_tmp, _, second_hash, _ = uploads_manager.write_temp(io.BytesIO(content), hash_name="sha256")
+    uploads_manager.place_blob(first_tmp, first_hash)
+    uploads_manager.place_blob(second_tmp, second_hash)
+    
+    assert first_hash == second_hash == hashlib.sha256(content).hexdigest()
+    assert size == len(content)
+    with open(uploads_manager.blob_path(first_hash), "rb") as f:
+        assert f.read() == content
+    assert not os.path.exists(first_tmp) and not os.path.exists(second_tmp)
+    
+    uploads_manager.remove_blob(first_hash)
+    assert not os.path.exists(uploads_manager.blob_path(first_hash))
+
+def test_write_temp_compresses_compressible_content():
+    uploads_manager = UploadsManager(compress=True)
+    content = b"2025-05-18 INFO request served\n" * 2000
+    
+    tmp_path, size, _, encoding = uploads_manager.write_temp(io.BytesIO(content), allow_compression=True, mimetype="text/plain")
+    uploads_manager.place_file(tmp_path, "compressed")
+    
+    assert encoding == "gzip"
+    assert size == len(content)
+    assert os.path.getsize("uploads/compressed") < len(content)
+    item = Item(id="compressed", encoding=encoding)
+    with uploads_manager.open_item(item) as f:
+        assert f.read() == content
+    
+    os.remove("uploads/compressed")
+
+def test_write_temp_keeps_incompressible_content_raw():
+    uploads_manager = UploadsManager(compress=True)
+    content = os.urandom(64 * 1024)
+    
+    tmp_path, _, _, encoding = uploads_manager.write_temp(io.BytesIO(content), allow_compression=True)
+    assert encoding is None
+    with open(tmp_path, "rb") as f:
+        assert f.read() == content
+    os.remove(tmp_path)
+    
+    text = b"a" * 4096
+    tmp_path, _, _, encoding = uploads_manager.write_temp(io.BytesIO(text), allow_compression=True, mimetype="image/png")
+    assert encoding is None
+    os.remove(tmp_path)
+
+def test_compressed_blob_variant():
+    uploads_manager = UploadsManager(content_addressed=True, compress=True)
+    content = b"{\"key\": \"value\"}\n" * 1000
+    
+    tmp_path, _, blob_hash, encoding = uploads_manager.write_temp(io.BytesIO(content), hash_name="sha256", allow_compression=True, mimetype="application/json")
+    uploads_manager.place_blob(tmp_path, blob_hash, encoding)
+    
+    assert blob_hash == hashlib.sha256(content).hexdigest()
+    assert uploads_manager.item_path(Item(blob_hash=blob_hash, encoding=encoding)).endswith(".gz")
+    uploads_manager.remove_blob(blob_hash)
+    assert not os.path.exists(uploads_manager.blob_path(blob_hash, encoding))